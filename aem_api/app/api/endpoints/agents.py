@@ -1,82 +1,219 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from ...api.dependencies import get_db
-from ...db import models
-from ...schemas.pydantic_models import AgentResponse, SettleRequest
-from ...core.market_logic import calculate_reward, shared_amm
+from ...api.dependencies import get_async_db, get_db
+from ...db import ledger, models, wallets
+from ...schemas.pydantic_models import AgentResponse, SettleRequest, BatchSettleRequest
+from ...core.market_logic import calculate_reward, shared_amm, current_usage
+from ...core.wallet_cache import wallet_cache
 
 router = APIRouter()
 
+# Math constants
+T_BASE = 25.0
+ALPHA, BETA, GAMMA = 0.5, 0.3, 0.2
+C_MAX = 20.0
+L_MAX = 6.0
+P_FAIL = 15.0
+
+# Initial state for agents auto-created on their first settlement
+DEFAULT_WALLET = 35.0
+DEFAULT_SKILL_LEVEL = 3.0
+DEFAULT_COMPLEXITY = 5.0
+
+def _ensure_agent(db: Session, agent_id: str) -> bool:
+    # Auto-create agent for testing purposes if it doesn't exist
+    created = wallets.ensure_agent(db, agent_id, DEFAULT_WALLET, DEFAULT_SKILL_LEVEL, DEFAULT_COMPLEXITY)
+    if created:
+        ledger.append(db, ledger.opening_row(agent_id, DEFAULT_WALLET, DEFAULT_SKILL_LEVEL, DEFAULT_COMPLEXITY))
+    return created
+
+async def _ensure_agent_async(db: AsyncSession, agent_id: str) -> bool:
+    created = await wallets.ensure_agent_async(db, agent_id, DEFAULT_WALLET, DEFAULT_SKILL_LEVEL, DEFAULT_COMPLEXITY)
+    if created:
+        await ledger.append_async(db, ledger.opening_row(agent_id, DEFAULT_WALLET, DEFAULT_SKILL_LEVEL, DEFAULT_COMPLEXITY))
+    return created
+
+def _price_settlement(request: SettleRequest):
+    """Returns (cost, reward, cost_paid, net_profit) for a settle request at the current AMM price."""
+    cost = shared_amm.get_price(request.resource_used)
+    reward = calculate_reward(
+        t_base=T_BASE, alpha=ALPHA, beta=BETA, gamma=GAMMA,
+        q=request.task_quality_q, c_real=request.c_real, c_max=C_MAX,
+        l_real=request.l_real, l_max=L_MAX, p_fail=P_FAIL, is_failure=request.is_failure
+    )
+    cost_paid = cost if not request.is_failure else 0.0
+    return cost, reward, cost_paid, reward - cost_paid
+
+def _ledger_row(agent_id: str, request: SettleRequest, cost_paid: float, reward: float, net_profit: float) -> dict:
+    return {
+        "agent_id": agent_id,
+        "resource_used": request.resource_used,
+        "cost_paid": cost_paid,
+        "reward_earned": reward,
+        "net_profit": net_profit,
+        "task_result": "FAILURE" if request.is_failure else "SUCCESS",
+        "latency": request.l_real
+    }
+
+def _cached_agent_or_create(agent_id: str):
+    """Wallet cache lookup with the same auto-create rule as the database path."""
+    agent = wallet_cache.load(agent_id)
+    if agent is None:
+        agent, _ = wallet_cache.create(agent_id, DEFAULT_WALLET, DEFAULT_SKILL_LEVEL, DEFAULT_COMPLEXITY)
+    return agent
+
 @router.get("/{agent_id}/wallet", response_model=AgentResponse)
 def get_wallet(agent_id: str, db: Session = Depends(get_db)):
     """
     Returns the wallet balance and stats of the agent.
     """
-    agent = db.query(models.AgentRecord).filter(models.AgentRecord.id == agent_id).first()
+    if wallet_cache is not None:
+        agent = wallet_cache.load(agent_id)
+        if not agent:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Agent not found")
+        return agent
+    agent = wallets.get_agent(db, agent_id)
     if not agent:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Agent not found")
     return agent
 @router.post("/{agent_id}/topup")
 def topup_agent(agent_id: str, amount: float = 100.0, db: Session = Depends(get_db)):
     """Add funds to a specific agent from the UI."""
-    agent = db.query(models.AgentRecord).filter(models.AgentRecord.id == agent_id).first()
-    if not agent:
+    if wallet_cache is not None:
+        agent = wallet_cache.load(agent_id)
+        if not agent:
+            raise HTTPException(status_code=404, detail="Agent not found")
+        with agent.lock:
+            agent.wallet_balance += amount
+            wallet_cache.commit(agent, ledger.topup_row(agent_id, amount))
+            new_balance = agent.wallet_balance
+        return {"new_balance": new_balance}
+    row = wallets.apply_delta(db, agent_id, amount)
+    if row is None:
         raise HTTPException(status_code=404, detail="Agent not found")
-    agent.wallet_balance += amount
+    ledger.append(db, dict(ledger.topup_row(agent_id, amount), epoch=row.epoch))
     db.commit()
-    return {"new_balance": agent.wallet_balance}
+    return {"new_balance": row.wallet_balance}
 
 @router.post("/{agent_id}/settle")
-def settle_transaction(agent_id: str, request: SettleRequest, db: Session = Depends(get_db)):
-    """Calculates reward, updates wallet, and inserts ledger transaction."""
-    agent = db.query(models.AgentRecord).filter(models.AgentRecord.id == agent_id).first()
-    if not agent:
-        # Auto-create agent for testing purposes if it doesn't exist
-        agent = models.AgentRecord(id=agent_id, wallet_balance=35.0, skill_level=3.0, complexity=5.0)
-        db.add(agent)
-        db.commit()
-        db.refresh(agent)
+async def settle_transaction(agent_id: str, request: SettleRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Calculates reward, updates wallet, and inserts ledger transaction.
+    Runs on the event loop with the async engine: a settlement waiting on the
+    database holds no threadpool thread.
+    """
+    if wallet_cache is not None:
+        # A cache miss loads the agent with a sync session
+        return await run_in_threadpool(_settle_cached, agent_id, request)
+
+    await _ensure_agent_async(db, agent_id)
     
     # Get the price from the shared AMM
-    cost = shared_amm.get_price(request.resource_used)
-    
-    if agent.wallet_balance < cost and not request.is_failure:
-         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds")
-
-    # Math constants
-    T_BASE = 25.0
-    ALPHA, BETA, GAMMA = 0.5, 0.3, 0.2
-    C_MAX = 20.0
-    L_MAX = 6.0
-    P_FAIL = 15.0
-    
-    reward = calculate_reward(
-        t_base=T_BASE, alpha=ALPHA, beta=BETA, gamma=GAMMA,
-        q=request.task_quality_q, c_real=request.c_real, c_max=C_MAX,
-        l_real=request.l_real, l_max=L_MAX, p_fail=P_FAIL, is_failure=request.is_failure
-    )
-    
-    cost_paid = cost if not request.is_failure else 0.0
-    net_profit = reward - cost_paid
-    agent.wallet_balance += net_profit
+    cost, reward, cost_paid, net_profit = _price_settlement(request)
     
-    transaction = models.LedgerTransaction(
-        agent_id=agent.id,
-        resource_used=request.resource_used,
-        cost_paid=cost_paid,
-        reward_earned=reward,
-        net_profit=net_profit,
-        task_result="FAILURE" if request.is_failure else "SUCCESS"
-    )
+    # Funds check and balance update in one statement (failures skip the check)
+    row = await wallets.apply_delta_async(db, agent_id, net_profit, min_balance=None if request.is_failure else cost)
+    if row is None:
+        await db.commit()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds")
     
-    db.add(transaction)
-    db.commit()
-    db.refresh(agent)
+    await ledger.append_async(db, dict(_ledger_row(agent_id, request, cost_paid, reward, net_profit), epoch=row.epoch))
+    await db.commit()
+    current_usage.record(request.resource_used)
     
     return {
         "message": "Transaction settled",
         "reward": reward,
         "cost_paid": cost_paid,
         "net_profit": net_profit,
-        "wallet_balance": agent.wallet_balance
+        "wallet_balance": row.wallet_balance
+    }
+
+def _settle_cached(agent_id: str, request: SettleRequest) -> dict:
+    """Settlement against the in-memory wallet cache; persisted by the write-behind flush."""
+    agent = _cached_agent_or_create(agent_id)
+    cost, reward, cost_paid, net_profit = _price_settlement(request)
+
+    with agent.lock:
+        if agent.wallet_balance < cost and not request.is_failure:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds")
+        agent.wallet_balance += net_profit
+        wallet_cache.commit(agent, _ledger_row(agent.id, request, cost_paid, reward, net_profit))
+        wallet_balance = agent.wallet_balance
+
+    current_usage.record(request.resource_used)
+    return {
+        "message": "Transaction settled",
+        "reward": reward,
+        "cost_paid": cost_paid,
+        "net_profit": net_profit,
+        "wallet_balance": wallet_balance
+    }
+
+@router.post("/settle/batch")
+def settle_batch(batch: BatchSettleRequest, db: Session = Depends(get_db)):
+    """
+    Settles many tasks (for one or more agents) in a single transaction.
+    Items are applied in order, each with an atomic conditional update of
+    the agent's balance; the ledger rows are bulk inserted and the whole
+    batch commits once.
+    """
+    if wallet_cache is not None:
+        results = []
+        for item in batch.items:
+            try:
+                results.append(dict(_settle_cached(item.agent_id, item), agent_id=item.agent_id, settled=True))
+            except HTTPException as exc:
+                results.append({
+                    "agent_id": item.agent_id,
+                    "settled": False,
+                    "detail": exc.detail,
+                    "wallet_balance": wallet_cache.load(item.agent_id).wallet_balance
+                })
+        settled = sum(1 for r in results if r["settled"])
+        return {"message": "Batch settled", "settled": settled, "rejected": len(results) - settled, "results": results}
+
+    for agent_id in sorted({item.agent_id for item in batch.items}):
+        _ensure_agent(db, agent_id)
+
+    settled_items = []
+    results = []
+    ledger_rows = []
+    for item in batch.items:
+        cost, reward, cost_paid, net_profit = _price_settlement(item)
+        row = wallets.apply_delta(db, item.agent_id, net_profit, min_balance=None if item.is_failure else cost)
+
+        if row is None:
+            results.append({
+                "agent_id": item.agent_id,
+                "settled": False,
+                "detail": "Insufficient funds",
+                "wallet_balance": db.get(models.AgentRecord, item.agent_id).wallet_balance
+            })
+            continue
+
+        settled_items.append(item)
+        ledger_rows.append(dict(_ledger_row(item.agent_id, item, cost_paid, reward, net_profit), epoch=row.epoch))
+        results.append({
+            "agent_id": item.agent_id,
+            "settled": True,
+            "reward": reward,
+            "cost_paid": cost_paid,
+            "net_profit": net_profit,
+            "wallet_balance": row.wallet_balance
+        })
+
+    ledger.append_many(db, ledger_rows)
+    db.commit()
+
+    for item in settled_items:
+        current_usage.record(item.resource_used)
+
+    return {
+        "message": "Batch settled",
+        "settled": len(ledger_rows),
+        "rejected": len(results) - len(ledger_rows),
+        "results": results
     }
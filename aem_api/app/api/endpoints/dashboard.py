@@ -1,41 +1,113 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
-from ...api.dependencies import get_db
+import base64
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import TypeAdapter
+from sqlalchemy import String, select, tuple_, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ...api.dependencies import get_async_db
 from ...db import models
+from ...db.epochs import current_epoch
 from ...schemas.pydantic_models import LedgerTransactionResponse
+from ...core import kpis
+from ...core.response_cache import PROCESS_TOKEN, response_cache
 
 router = APIRouter()
 
+_ledger_adapter = TypeAdapter(List[LedgerTransactionResponse])
+
 @router.get("/macro")
-def get_macro_kpis(db: Session = Depends(get_db)):
+async def get_macro_kpis(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Devuelve KPIs (promedio de éxito, latencia promedio del sistema, balance total en circulación).
+    Los contadores viven en la fila kpi_counters de la época, que cada escritura del ledger
+    actualiza en su transacción: todos los workers leen los mismos totales con una búsqueda por clave.
+    La respuesta se cachea por (época, generación) de los contadores y responde 304 a `If-None-Match`.
     """
-    total_txs = db.query(models.LedgerTransaction).count()
-    successful_txs = db.query(models.LedgerTransaction).filter(models.LedgerTransaction.task_result == "SUCCESS").count()
-    success_rate = (successful_txs / total_txs * 100) if total_txs > 0 else 0.0
-    
-    avg_latency = 1.25 # Simulated for demo
-
-    total_balance = db.query(func.sum(models.AgentRecord.wallet_balance)).scalar() or 0.0
-    
-    return {
-        "global_success_rate": round(success_rate, 2),
-        "avg_system_latency_ms": avg_latency,
-        "daily_usd_burn_rate": round(total_balance, 2)
-    }
+    version, snapshot = await kpis.versioned_snapshot_async(db)
+    return response_cache.respond(
+        request, ("macro", PROCESS_TOKEN, version),
+        lambda: (json.dumps(snapshot).encode(), {})
+    )
+
+def _timestamp_key(db: AsyncSession):
+    # SQLite guarda los timestamps como texto y CURRENT_TIMESTAMP no lleva microsegundos:
+    # se compara el texto almacenado tal cual para que el keyset sea exacto (y use el índice).
+    if db.get_bind().dialect.name == "sqlite":
+        return type_coerce(models.LedgerTransaction.timestamp, String)
+    return models.LedgerTransaction.timestamp
+
+def _encode_cursor(timestamp, tx_id: int) -> str:
+    ts = timestamp.isoformat() if isinstance(timestamp, datetime) else str(timestamp)
+    return base64.urlsafe_b64encode(f"{ts}|{tx_id}".encode()).decode()
+
+def _decode_cursor(cursor: str, db: AsyncSession):
+    try:
+        ts, tx_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        if db.get_bind().dialect.name != "sqlite":
+            ts = datetime.fromisoformat(ts)
+        return ts, int(tx_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
 
 @router.get("/ledger", response_model=List[LedgerTransactionResponse])
-def get_ledger(db: Session = Depends(get_db)):
+async def get_ledger(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    resource_used: Optional[str] = None,
+    task_result: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Devuelve las últimas 50 transacciones ordenadas por fecha descendente.
+    Devuelve las transacciones ordenadas por (timestamp, id) descendente, paginadas por keyset.
+    Sin parámetros equivale a las últimas 50. La siguiente página se pide con el valor
+    de la cabecera `X-Next-Cursor`; los filtros usan los índices compuestos del ledger.
+
+    Solo se listan las transacciones de la época actual del mercado (las anteriores
+    a un reset se purgan en segundo plano).
+
+    La página serializada se cachea por la marca de agua del ledger (id y timestamp
+    de la última fila de la época, una búsqueda en el índice (epoch, id)) junto con los parámetros:
+    mientras no entren transacciones nuevas, las consultas repetidas no tocan la
+    página y un `If-None-Match` vigente recibe 304.
     """
-    transactions = (
-        db.query(models.LedgerTransaction)
-        .order_by(models.LedgerTransaction.timestamp.desc())
-        .limit(50)
-        .all()
+    tx = models.LedgerTransaction
+    ts_key = _timestamp_key(db)
+    # El timestamp distingue un id reutilizado si la purga vacía la tabla
+    high_water = (await db.execute(
+        select(tx.id, ts_key.label("sort_ts")).where(tx.epoch == current_epoch()).order_by(tx.id.desc()).limit(1)
+    )).first()
+    key = ("ledger", tuple(high_water) if high_water else None, limit, cursor, agent_id, resource_used, task_result)
+    return await response_cache.respond_async(
+        request, key,
+        lambda: _ledger_page(db, limit, cursor, agent_id, resource_used, task_result)
     )
-    return transactions
+
+async def _ledger_page(db: AsyncSession, limit: int, cursor: Optional[str], agent_id: Optional[str],
+                       resource_used: Optional[str], task_result: Optional[str]):
+    tx = models.LedgerTransaction
+    ts_key = _timestamp_key(db)
+    # Etiquetado: sin etiqueta select() no distingue la clave de la columna timestamp de la entidad
+    query = select(tx, ts_key.label("sort_ts")).where(tx.epoch == current_epoch())
+
+    if agent_id is not None:
+        query = query.where(tx.agent_id == agent_id)
+    if resource_used is not None:
+        query = query.where(tx.resource_used == resource_used)
+    if task_result is not None:
+        query = query.where(tx.task_result == task_result)
+    if cursor:
+        cursor_ts, cursor_id = _decode_cursor(cursor, db)
+        query = query.where(tuple_(ts_key, tx.id) < tuple_(cursor_ts, cursor_id))
+
+    rows = (await db.execute(query.order_by(ts_key.desc(), tx.id.desc()).limit(limit + 1))).all()
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_tx, last_ts = rows[-1]
+        headers["X-Next-Cursor"] = _encode_cursor(last_ts, last_tx.id)
+    return _ledger_adapter.dump_json(_ledger_adapter.validate_python([row[0] for row in rows])), headers
@@ -1,51 +1,83 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ...api.dependencies import get_db
-from ...db import models
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...api.dependencies import get_async_db
+from ...db import ledger, wallets
 from ...schemas.pydantic_models import RefactorRequest
 from ...core.market_logic import shared_amm, current_usage
+from ...core.wallet_cache import wallet_cache
 
 router = APIRouter()
 
+def _apply_refactor(agent, premium_cost: float) -> None:
+    agent.wallet_balance -= premium_cost
+    agent.complexity = max(agent.complexity - 1.5, 1.0)
+    agent.skill_level += 1.0
+
+def _refactor_ledger_row(agent_id: str, resource: str, premium_cost: float, skill_level: float, complexity: float) -> dict:
+    return {
+        "agent_id": agent_id,
+        "resource_used": resource,
+        "cost_paid": premium_cost,
+        "reward_earned": 0.0,
+        "net_profit": -premium_cost,
+        "task_result": "REFACTOR_SUCCESS",
+        "skill_level": skill_level,
+        "complexity": complexity
+    }
+
+def _refactor_cached(req: RefactorRequest) -> dict:
+    """Refactor against the in-memory wallet cache; persisted by the write-behind flush."""
+    agent = wallet_cache.load(req.agent_id)
+    if not agent:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Agent not found")
+
+    resource = "Refactor_DevOps_Resource"
+    premium_cost = shared_amm.get_price(resource)
+
+    with agent.lock:
+        if agent.wallet_balance < premium_cost:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds for Refactor")
+        _apply_refactor(agent, premium_cost)
+        wallet_cache.commit(agent, _refactor_ledger_row(agent.id, resource, premium_cost, agent.skill_level, agent.complexity))
+        result = {
+            "message": "Refactor successful",
+            "new_complexity": agent.complexity,
+            "new_skill_level": agent.skill_level,
+            "new_balance": agent.wallet_balance
+        }
+
+    current_usage.record(resource)
+    return result
+
 @router.post("/refactor")
-def refactor_agent(req: RefactorRequest, db: Session = Depends(get_db)):
+async def refactor_agent(req: RefactorRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Refactors the agent reducing its complexity and increasing skills 
     in exchange for premium market cost.
     """
-    agent = db.query(models.AgentRecord).filter(models.AgentRecord.id == req.agent_id).first()
-    if not agent:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Agent not found")
-        
+    if wallet_cache is not None:
+        return await run_in_threadpool(_refactor_cached, req)
+
     resource = "Refactor_DevOps_Resource"
     premium_cost = shared_amm.get_price(resource)
     
-    if agent.wallet_balance < premium_cost:
+    # Funds check, charge and skill/complexity update in one conditional UPDATE
+    row = await wallets.apply_refactor_async(db, req.agent_id, premium_cost)
+    if row is None:
+        if not await wallets.agent_exists_async(db, req.agent_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Agent not found")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds for Refactor")
-        
-    agent.wallet_balance -= premium_cost
-    agent.complexity = max(agent.complexity - 1.5, 1.0)
-    agent.skill_level += 1.0
-    
-    if resource in current_usage:
-        current_usage[resource] += 1.0
-    
-    transaction = models.LedgerTransaction(
-        agent_id=agent.id,
-        resource_used=resource,
-        cost_paid=premium_cost,
-        reward_earned=0.0,
-        net_profit=-premium_cost,
-        task_result="REFACTOR_SUCCESS"
-    )
     
-    db.add(transaction)
-    db.commit()
-    db.refresh(agent)
+    await ledger.append_async(db, dict(
+        _refactor_ledger_row(req.agent_id, resource, premium_cost, row.skill_level, row.complexity), epoch=row.epoch
+    ))
+    await db.commit()
+    current_usage.record(resource)
     
     return {
         "message": "Refactor successful",
-        "new_complexity": agent.complexity,
-        "new_skill_level": agent.skill_level,
-        "new_balance": agent.wallet_balance
+        "new_complexity": row.complexity,
+        "new_skill_level": row.skill_level,
+        "new_balance": row.wallet_balance
     }
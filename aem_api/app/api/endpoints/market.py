@@ -1,24 +1,155 @@
-from fastapi import APIRouter, Depends
-from typing import List
+import asyncio
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from ...api.dependencies import get_db
-from ...db import models
-from ...schemas.pydantic_models import MarketTickerResponse
-from ...core.market_logic import shared_amm
+from ...db import epochs, models
+from ...schemas.pydantic_models import MarketTickerResponse, PriceHistoryPoint
+from ...core.market_logic import shared_amm, current_usage
+from ...core import kpis
+from ...core.ticker_stream import ticker_broadcaster, ticker_message, sse_event
+from ...core.price_history import RESOLUTIONS
+from ...core.wallet_cache import wallet_cache
+from ...core.amm_backend import amm_backend
+from ...core.event_store import write_genesis
+from ...core.response_cache import response_cache
+
+# Seconds without a tick before the SSE stream sends a keep-alive comment
+SSE_KEEPALIVE_SECONDS = 15.0
 
 router = APIRouter()
 
 @router.get("/ticker", response_model=List[MarketTickerResponse])
-def get_ticker():
-    """Returns the current dynamic prices calculated by the shared AMM."""
-    return shared_amm.get_prices()
+async def get_ticker(request: Request):
+    """
+    Returns the last ticker snapshot published by the shared AMM.
+    The body is serialized once per snapshot and served as-is, skipping
+    per-request validation of thousands of rows. The ETag follows the
+    snapshot (version and publish time), so a poll that sends it back via
+    If-None-Match gets a 304 until the next tick. It never blocks, so it runs
+    on the event loop instead of a threadpool thread.
+    """
+    snapshot = shared_amm.snapshot
+    return response_cache.respond(
+        request, ("ticker", snapshot.version, snapshot.timestamp),
+        lambda: (snapshot.ticker_json, {})
+    )
+
+@router.get("/ticker/stream")
+async def stream_ticker():
+    """
+    Server-Sent Events stream of ticker snapshots.
+    Sends the current snapshot on connect and then one event per AMM tick;
+    the event id is the snapshot's monotonically increasing sequence number.
+    """
+    queue = ticker_broadcaster.subscribe()
+
+    async def events():
+        try:
+            yield sse_event(shared_amm.snapshot)
+            while True:
+                try:
+                    snapshot = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_event(snapshot)
+        finally:
+            ticker_broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.websocket("/ticker/ws")
+async def websocket_ticker(websocket: WebSocket):
+    """WebSocket variant of the ticker stream (same message format as the SSE data)."""
+    await websocket.accept()
+    queue = ticker_broadcaster.subscribe()
+    try:
+        await websocket.send_json(ticker_message(shared_amm.snapshot))
+        while True:
+            snapshot = await queue.get()
+            await websocket.send_json(ticker_message(snapshot))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        ticker_broadcaster.unsubscribe(queue)
+
+def _utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+@router.get("/history", response_model=List[PriceHistoryPoint])
+def get_price_history(
+    resource: str,
+    resolution: str = "1m",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """
+    Returns OHLC price bars for a resource between `start` and `end` (UTC).
+    Bars are read from the pre-aggregated rollups (1s, 1m, 1h), so long
+    windows never scan the raw per-tick market_logs.
+    """
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"resolution must be one of {sorted(RESOLUTIONS)}"
+        )
+    end = _utc_naive(end) if end else datetime.now(timezone.utc).replace(tzinfo=None)
+    start = _utc_naive(start) if start else end - timedelta(seconds=RESOLUTIONS[resolution] * limit)
+
+    rollup = models.MarketLogRollup
+    bars = (
+        db.query(rollup)
+        .filter(
+            rollup.resource_name == resource,
+            rollup.resolution == resolution,
+            rollup.bucket_start >= start,
+            rollup.bucket_start <= end
+        )
+        .order_by(rollup.bucket_start)
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "resource_name": bar.resource_name,
+            "bucket_start": bar.bucket_start,
+            "open": bar.open,
+            "high": bar.high,
+            "low": bar.low,
+            "close": bar.close,
+            "avg_demand": bar.demand_sum / bar.samples if bar.samples else 0.0,
+            "samples": bar.samples
+        }
+        for bar in bars
+    ]
 
 @router.post("/reset")
 def reset_market(db: Session = Depends(get_db)):
-    """Resets the AMM prices and clears the ledger."""
-    db.query(models.LedgerTransaction).delete()
+    """
+    Resets the AMM prices and starts a new market epoch: an empty ledger and
+    wallets that restart from their defaults on next use. Starting the epoch
+    is a single insert; the previous epoch's rows are dropped in the
+    background in bounded chunks, so live traffic never waits on the reset.
+    """
+    if wallet_cache is not None:
+        # Pending write-behind rows belong to the epoch being closed
+        wallet_cache.flush()
+    epoch = epochs.begin_epoch(db)
+    write_genesis(db, epoch, shared_amm.base_prices)
+    kpis.start_epoch(db, epoch)
     db.commit()
-    
-    shared_amm.current_prices = shared_amm.base_prices.copy()
-    
-    return {"message": "Market reset successfully"}
+    if wallet_cache is not None:
+        wallet_cache.reset_epoch(epoch)
+    # Usage accumulated in the previous epoch does not carry into the new prices
+    current_usage.swap_vector()
+
+    ticker_broadcaster.publish(amm_backend.reset() if amm_backend is not None else shared_amm.reset())
+
+    return {"message": "Market reset successfully", "epoch": epoch}
@@ -0,0 +1,33 @@
+from typing import Optional
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+from ...core.metrics import PROFILER_ENABLED, registry, profiler
+
+router = APIRouter()
+
+@router.get("", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text exposition of route latencies, DB timings, AMM ticks and ticker staleness."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+# Opt-in (AEM_PROFILER_ENABLED=1): the sampler can be started and its stacks read without auth
+if PROFILER_ENABLED:
+    @router.get("/profiler")
+    def profiler_status():
+        return profiler.status()
+
+    @router.post("/profiler/start")
+    def start_profiler(duration: Optional[float] = Query(None, gt=0, description="Seconds to sample (capped by AEM_PROFILER_MAX_SECONDS)")):
+        """Starts the sampling profiler at runtime; it stops by itself after `duration`."""
+        profiler.start(duration)
+        return profiler.status()
+
+    @router.post("/profiler/stop")
+    def stop_profiler():
+        profiler.stop()
+        return profiler.status()
+
+    @router.get("/profiler/stacks", response_class=PlainTextResponse)
+    def profiler_stacks(limit: Optional[int] = Query(None, ge=1)):
+        """Collapsed stacks (`frame;frame;frame count`) for flamegraph tools."""
+        return PlainTextResponse(profiler.folded(limit))
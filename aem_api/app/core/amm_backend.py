@@ -0,0 +1,172 @@
+import os
+import socket
+import time
+import uuid
+from typing import Dict, Optional
+from sqlalchemy import or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, sessionmaker
+from ..db import models
+from ..db.database import SessionLocal
+from .market_logic import AutomatedMarketMaker, TickerSnapshot, shared_amm
+
+# "local": each process owns its price book (single worker). "db": all workers share
+# one versioned price book stored in the database, ticked by a single lease holder.
+AMM_BACKEND = os.getenv("AEM_AMM_BACKEND", "local")
+# How often each worker pushes its usage and pulls the shared ticker
+SYNC_INTERVAL_SECONDS = float(os.getenv("AEM_AMM_SYNC_INTERVAL_SECONDS", "0.5"))
+LEASE_NAME = "amm_tick"
+
+def _dialect_insert(db: Session):
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+class DatabaseAMMBackend:
+    """
+    Shares one AMM across uvicorn workers through three small tables:
+
+    - `amm_state`: the current price book, stamped with a monotonically
+      increasing version and the publish time of the tick that produced it;
+    - `amm_usage`: usage counters every worker adds its local usage into;
+    - `amm_leases`: a time-bounded lease; only its holder runs the tick.
+
+    Request handlers keep reading prices from the in-process `shared_amm`;
+    `sync` replaces its snapshot whenever the stored version moves ahead,
+    so every worker serves the same versioned ticker (at most one sync
+    interval late). If the leader dies its lease expires and another
+    worker takes over the tick cadence from the stored publish time.
+    """
+    def __init__(self, session_factory: sessionmaker, amm: AutomatedMarketMaker,
+                 lease_ttl: Optional[float] = None, worker_id: Optional[str] = None):
+        self.session_factory = session_factory
+        self.amm = amm
+        self.lease_ttl = lease_ttl
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def start(self) -> Optional[TickerSnapshot]:
+        """Seeds the shared book with the base prices (first worker wins) and adopts it."""
+        now = time.time()
+        with self.session_factory() as db:
+            dialect_insert = _dialect_insert(db)
+            db.execute(dialect_insert(models.AMMState).on_conflict_do_nothing(index_elements=["resource_name"]), [
+                {"resource_name": r, "price": p, "demand": 0.0, "version": 0, "published_at": now}
+                for r, p in self.amm.base_prices.items()
+            ])
+            db.execute(dialect_insert(models.AMMLease).on_conflict_do_nothing(index_elements=["name"]),
+                       [{"name": LEASE_NAME, "owner": "", "expires_at": 0.0}])
+            db.commit()
+        return self.sync(force=True)
+
+    # ---- every worker ----
+
+    def report_usage(self, usage: Dict[str, float]) -> None:
+        """Adds this worker's usage since the last report into the shared counters."""
+        rows = [{"resource_name": r, "amount": amount} for r, amount in usage.items() if amount]
+        if not rows:
+            return
+        with self.session_factory() as db:
+            stmt = _dialect_insert(db)(models.AMMUsage)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["resource_name"],
+                set_={"amount": models.AMMUsage.amount + stmt.excluded.amount}
+            ), rows)
+            db.commit()
+
+    def sync(self, force: bool = False) -> Optional[TickerSnapshot]:
+        """Adopts the shared snapshot if it is newer than the local one; returns it, else None."""
+        with self.session_factory() as db:
+            snapshot = self._read_snapshot(db)
+        if snapshot is None or (not force and snapshot.version <= self.amm.snapshot.version):
+            return None
+        self.amm.load_snapshot(snapshot)
+        return snapshot
+
+    def tick_due(self, interval: float) -> bool:
+        return time.time() - self.amm.snapshot.timestamp >= interval
+
+    # ---- lease holder ----
+
+    def tick(self, interval: float) -> Optional[TickerSnapshot]:
+        """
+        Renews (or takes) the lease and, in the same transaction, drains the
+        shared usage, prices it from the stored book and writes the next version.
+        Returns None if another worker holds the lease.
+        """
+        now = time.time()
+        ttl = self.lease_ttl or 3 * interval
+        lease = models.AMMLease
+        with self.session_factory() as db:
+            # First statement is a write, so SQLite takes the write lock before the reads below
+            renewed = db.execute(
+                update(lease)
+                .where(lease.name == LEASE_NAME, or_(lease.owner == self.worker_id, lease.expires_at < now))
+                .values(owner=self.worker_id, expires_at=now + ttl)
+            ).rowcount
+            if not renewed:
+                db.rollback()
+                return None
+
+            current = self._read_snapshot(db, for_update=True)
+            if current is None or now - current.timestamp < interval:
+                # Another leader ticked since our last sync
+                db.commit()
+                return None
+            usage = {r: 0.0 for r in self.amm.base_prices}
+            for row in db.execute(select(models.AMMUsage).with_for_update()).scalars():
+                usage[row.resource_name] = row.amount
+            db.execute(update(models.AMMUsage).values(amount=0.0))
+
+            self.amm.load_snapshot(current)
+            self.amm.update_prices(usage)
+            snapshot = self.amm.publish(demand=usage)
+            self._write_snapshot(db, snapshot)
+            db.commit()
+        return snapshot
+
+    def reset(self) -> TickerSnapshot:
+        """Restores base prices for every worker and clears pending usage."""
+        with self.session_factory() as db:
+            db.execute(update(models.AMMUsage).values(amount=0.0))
+            current = self._read_snapshot(db, for_update=True)
+            if current is not None:
+                self.amm.load_snapshot(current)
+            snapshot = self.amm.reset()
+            self._write_snapshot(db, snapshot)
+            db.commit()
+        return snapshot
+
+    # ---- storage ----
+
+    @staticmethod
+    def _read_snapshot(db: Session, for_update: bool = False) -> Optional[TickerSnapshot]:
+        stmt = select(models.AMMState)
+        if for_update:
+            stmt = stmt.with_for_update()
+        rows = db.execute(stmt).scalars().all()
+        if not rows:
+            return None
+        return TickerSnapshot(
+            version=max(row.version for row in rows),
+            timestamp=max(row.published_at for row in rows),
+            prices={row.resource_name: row.price for row in rows},
+            demand={row.resource_name: row.demand for row in rows}
+        )
+
+    @staticmethod
+    def _write_snapshot(db: Session, snapshot: TickerSnapshot) -> None:
+        stmt = _dialect_insert(db)(models.AMMState)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["resource_name"],
+            set_={c: stmt.excluded[c] for c in ("price", "demand", "version", "published_at")}
+        ), [
+            {
+                "resource_name": r,
+                "price": price,
+                "demand": snapshot.demand.get(r, 0.0),
+                "version": snapshot.version,
+                "published_at": snapshot.timestamp
+            }
+            for r, price in snapshot.prices.items()
+        ])
+
+# Global instance for the microservice (None keeps the in-process AMM)
+amm_backend = DatabaseAMMBackend(SessionLocal, shared_amm) if AMM_BACKEND == "db" else None
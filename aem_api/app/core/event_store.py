@@ -0,0 +1,278 @@
+import json
+import logging
+import os
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..db import models
+from ..db.epochs import get_current_epoch
+from ..db.ledger import AGENT_OPENED
+from .wallet_cache import utc_now
+
+logger = logging.getLogger(__name__)
+
+# Seconds between ledger snapshots (0 disables the background snapshots)
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("AEM_LEDGER_SNAPSHOT_INTERVAL_SECONDS", "300"))
+# Snapshots kept (oldest pruned first); 0 keeps them all
+SNAPSHOT_RETENTION = int(os.getenv("AEM_LEDGER_SNAPSHOT_RETENTION", "0"))
+REPLAY_CHUNK_ROWS = 50_000
+# Balance difference tolerated by `verify` (float sums in a different order)
+BALANCE_TOLERANCE = 1e-6
+
+# agent_id -> [wallet_balance, skill_level, complexity]
+Wallets = Dict[str, List[float]]
+
+@dataclass
+class ReplayResult:
+    epoch: int
+    ledger_id: int
+    snapshot_id: Optional[int]
+    events_applied: int
+    agents: Wallets
+    prices: Dict[str, float] = field(default_factory=dict)
+    # Events for agents missing from the snapshot and without an AGENT_OPENED row
+    orphan_events: int = 0
+
+    @property
+    def total_balance(self) -> float:
+        return sum(state[0] for state in self.agents.values())
+
+def fold(agents: Wallets, events: Iterable) -> Tuple[int, int, int]:
+    """
+    Applies ledger rows (in id order) to `agents` in place.
+    Returns (events applied, last id seen, orphan events).
+    """
+    applied = orphans = 0
+    last_id = 0
+    # Rows unpack as (id, agent_id, net_profit, task_result, skill_level, complexity)
+    for last_id, agent_id, delta, kind, skill_level, complexity in events:
+        applied += 1
+        if kind == AGENT_OPENED:
+            agents[agent_id] = [delta, skill_level, complexity]
+            continue
+        state = agents.get(agent_id)
+        if state is None:
+            # Agent older than the event stream and not covered by a snapshot: model defaults
+            orphans += 1
+            state = agents[agent_id] = [0.0, 1.0, 1.0]
+        state[0] += delta
+        if skill_level is not None:
+            state[1], state[2] = skill_level, complexity
+    return applied, last_id, orphans
+
+def iter_events(db: Session, epoch: int, after_id: int, upto_id: Optional[int] = None,
+                chunk_rows: int = REPLAY_CHUNK_ROWS) -> Iterator:
+    """
+    Ledger rows of `epoch` (the columns `fold` needs) with after_id < id <= upto_id
+    in id order, read by keyset in chunks.
+    """
+    tx = models.LedgerTransaction
+    last_id = after_id
+    while True:
+        stmt = (
+            select(tx.id, tx.agent_id, tx.net_profit, tx.task_result, tx.skill_level, tx.complexity)
+            .where(tx.epoch == epoch, tx.id > last_id).order_by(tx.id).limit(chunk_rows)
+        )
+        if upto_id is not None:
+            stmt = stmt.where(tx.id <= upto_id)
+        rows = db.execute(stmt).all()
+        yield from rows
+        if len(rows) < chunk_rows:
+            return
+        last_id = rows[-1].id
+
+def _encode_agents(agents: Wallets) -> bytes:
+    return zlib.compress(json.dumps(agents, separators=(",", ":")).encode())
+
+def decode_agents(snapshot: models.LedgerSnapshot) -> Wallets:
+    return json.loads(zlib.decompress(snapshot.agents))
+
+def _agents_from_table(db: Session, epoch: int) -> Wallets:
+    agent = models.AgentRecord
+    return {
+        row.id: [row.wallet_balance, row.skill_level, row.complexity]
+        for row in db.execute(
+            select(agent.id, agent.wallet_balance, agent.skill_level, agent.complexity).where(agent.epoch == epoch)
+        )
+    }
+
+def _high_water(db: Session, epoch: int) -> int:
+    tx = models.LedgerTransaction
+    return db.execute(select(func.max(tx.id)).where(tx.epoch == epoch)).scalar() or 0
+
+def _stable_high_water(db: Session) -> Tuple[int, int]:
+    """
+    (current epoch, highest ledger id of that epoch below which no transaction
+    can still commit a row). SQLite commits in id order (single writer); on
+    PostgreSQL a sequence id can commit after a larger one, so a SHARE lock
+    waits out in-flight writers.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.connection().exec_driver_sql("LOCK TABLE ledger_transactions IN SHARE MODE")
+    epoch = get_current_epoch(db)
+    high_water = _high_water(db, epoch)
+    db.commit()
+    return epoch, high_water
+
+def latest_snapshot(db: Session, epoch: int, upto_id: Optional[int] = None,
+                    at: Optional[datetime] = None) -> Optional[models.LedgerSnapshot]:
+    snap = models.LedgerSnapshot
+    stmt = select(snap).where(snap.epoch == epoch).order_by(snap.ledger_id.desc()).limit(1)
+    if upto_id is not None:
+        stmt = stmt.where(snap.ledger_id <= upto_id)
+    if at is not None:
+        stmt = stmt.where(snap.taken_at <= at)
+    return db.execute(stmt).scalars().first()
+
+def _insert_snapshot(db: Session, epoch: int, ledger_id: int, agents: Wallets, prices: Dict[str, float],
+                     amm_version: Optional[int]) -> models.LedgerSnapshot:
+    snapshot = models.LedgerSnapshot(
+        epoch=epoch,
+        ledger_id=ledger_id,
+        taken_at=utc_now(),
+        agent_count=len(agents),
+        total_balance=sum(state[0] for state in agents.values()),
+        amm_version=amm_version,
+        prices=json.dumps(prices),
+        agents=_encode_agents(agents)
+    )
+    db.add(snapshot)
+    return snapshot
+
+def take_snapshot(db: Session, prices: Optional[Dict[str, float]] = None,
+                  amm_version: Optional[int] = None) -> Optional[models.LedgerSnapshot]:
+    """
+    Writes a snapshot of every wallet as of the current epoch's ledger
+    high-water mark. It is built from the ledger itself: the previous snapshot
+    plus the rows after it. Only the first snapshot of a database without one
+    for the current epoch reads agent_records, in a write transaction so no
+    event can commit between the two reads.
+    Returns None if nothing changed since the last snapshot (or another
+    worker wrote the same one).
+    """
+    epoch, high_water = _stable_high_water(db)
+    previous = latest_snapshot(db, epoch, upto_id=high_water)
+    try:
+        if previous is not None:
+            if previous.ledger_id == high_water:
+                return None
+            agents = decode_agents(previous)
+            _, _, orphans = fold(agents, iter_events(db, epoch, previous.ledger_id, high_water))
+            if orphans:
+                logger.warning("Ledger snapshot: %d events for agents without an opening balance", orphans)
+            snapshot = _insert_snapshot(db, epoch, high_water, agents, prices or {}, amm_version)
+        else:
+            # Bootstrap: the insert takes the write lock before the consistent reads
+            snapshot = _insert_snapshot(db, epoch, 0, {}, prices or {}, amm_version)
+            db.flush()
+            high_water = _high_water(db, epoch)
+            agents = _agents_from_table(db, epoch)
+            snapshot.ledger_id = high_water
+            snapshot.agent_count = len(agents)
+            snapshot.total_balance = sum(state[0] for state in agents.values())
+            snapshot.agents = _encode_agents(agents)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+    if SNAPSHOT_RETENTION > 0:
+        _prune(db, SNAPSHOT_RETENTION)
+    return snapshot
+
+def write_genesis(db: Session, epoch: int, prices: Optional[Dict[str, float]] = None,
+                  amm_version: Optional[int] = None) -> None:
+    """
+    Part of a market reset, in the caller's transaction (after it started
+    `epoch`): drops the snapshots of earlier epochs and records the empty
+    state the new epoch's ledger starts from.
+    """
+    db.execute(delete(models.LedgerSnapshot))
+    _insert_snapshot(db, epoch, 0, {}, prices or {}, amm_version)
+
+def _prune(db: Session, keep: int) -> None:
+    snap = models.LedgerSnapshot
+    cutoff = db.execute(select(snap.ledger_id).order_by(snap.ledger_id.desc()).offset(keep - 1).limit(1)).scalar()
+    if cutoff is not None:
+        db.execute(delete(snap).where(snap.ledger_id < cutoff))
+        db.commit()
+
+def _ledger_id_at(db: Session, epoch: int, at: datetime) -> int:
+    tx = models.LedgerTransaction
+    return db.execute(select(func.max(tx.id)).where(tx.epoch == epoch, tx.timestamp <= at)).scalar() or 0
+
+def prices_at(db: Session, at: Optional[datetime], fallback: Dict[str, float]) -> Dict[str, float]:
+    """Last logged price per resource at `at` (the snapshot's prices where nothing was logged)."""
+    if at is None:
+        return fallback
+    log = models.MarketLog
+    last_ids = select(func.max(log.id)).where(log.timestamp <= at).group_by(log.resource_name)
+    prices = dict(fallback)
+    prices.update(db.execute(select(log.resource_name, log.dynamic_price).where(log.id.in_(last_ids))).all())
+    return prices
+
+def restore(db: Session, ledger_id: Optional[int] = None, at: Optional[datetime] = None) -> ReplayResult:
+    """
+    State of every wallet right after ledger row `ledger_id` (or the last row
+    at or before `at`; the head of the ledger by default): the nearest snapshot
+    at or before that point plus the rows in between. Only points in the
+    current epoch can be restored (a reset drops the earlier snapshots).
+    """
+    epoch, head = _stable_high_water(db)
+    if ledger_id is None:
+        ledger_id = _ledger_id_at(db, epoch, at) if at is not None else head
+    snapshot = latest_snapshot(db, epoch, upto_id=ledger_id)
+    agents = decode_agents(snapshot) if snapshot is not None else {}
+    start = snapshot.ledger_id if snapshot is not None else 0
+    applied, _, orphans = fold(agents, iter_events(db, epoch, start, ledger_id))
+    prices = json.loads(snapshot.prices) if snapshot is not None else {}
+    return ReplayResult(
+        epoch=epoch,
+        ledger_id=ledger_id,
+        snapshot_id=snapshot.id if snapshot is not None else None,
+        events_applied=applied,
+        agents=agents,
+        prices=prices_at(db, at, prices),
+        orphan_events=orphans
+    )
+
+def verify(db: Session) -> List[dict]:
+    """
+    Agents whose stored state differs from the ledger replayed to its head.
+    Both sides are read separately, so run it against an idle (or stopped) API.
+    """
+    replay = restore(db)
+    stored = _agents_from_table(db, replay.epoch)
+    mismatches = []
+    for agent_id in sorted(set(stored) | set(replay.agents)):
+        expected, actual = replay.agents.get(agent_id), stored.get(agent_id)
+        if expected is None or actual is None or abs(expected[0] - actual[0]) > BALANCE_TOLERANCE \
+                or expected[1:] != actual[1:]:
+            mismatches.append({"agent_id": agent_id, "ledger": expected, "stored": actual})
+    return mismatches
+
+def apply_restore(db: Session, result: ReplayResult) -> None:
+    """
+    Rewinds the database to `result`: agent_records take the replayed state
+    and the epoch's ledger rows and snapshots after `result.ledger_id` are deleted.
+    """
+    agent, tx = models.AgentRecord, models.LedgerTransaction
+    db.execute(delete(tx).where(tx.epoch == result.epoch, tx.id > result.ledger_id))
+    db.execute(delete(models.LedgerSnapshot).where(models.LedgerSnapshot.ledger_id > result.ledger_id))
+    db.execute(delete(agent).where(agent.epoch == result.epoch, agent.id.notin_(list(result.agents))))
+    if result.agents:
+        dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        stmt = dialect_insert(agent)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[agent.id],
+            set_={c: stmt.excluded[c] for c in ("wallet_balance", "skill_level", "complexity", "epoch")}
+        ), [
+            {"id": agent_id, "wallet_balance": state[0], "skill_level": state[1], "complexity": state[2],
+             "epoch": result.epoch}
+            for agent_id, state in result.agents.items()
+        ])
+    db.commit()
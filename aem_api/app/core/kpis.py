@@ -0,0 +1,85 @@
+from typing import Tuple
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..db import models
+from ..db.epochs import current_epoch
+from ..db.ledger import BALANCE_EVENTS
+
+# Materialized macro KPIs for the dashboard. The aggregates live in the
+# kpi_counters row of the current epoch, which every ledger append updates in
+# its own transaction: all uvicorn workers read the same totals, a market
+# reset starts from an empty row, and a read is one primary-key lookup
+# regardless of ledger size. The row's `generation` versions the cached
+# dashboard response.
+
+def _read_stmt():
+    return select(models.KPICounters).where(models.KPICounters.epoch == current_epoch())
+
+def _snapshot(counters) -> Tuple[tuple, dict]:
+    """((epoch, generation), KPIs) of a counters row (an epoch without rows yet reads as zeros)."""
+    if counters is None:
+        return (None, 0), {"global_success_rate": 0.0, "avg_system_latency_ms": 0.0, "daily_usd_burn_rate": 0.0}
+    success_rate = (counters.successful_txs / counters.total_txs * 100) if counters.total_txs > 0 else 0.0
+    # L_real is in (simulated) seconds; the KPI is reported in milliseconds
+    avg_latency = (counters.latency_sum / counters.latency_count * 1000) if counters.latency_count > 0 else 0.0
+    return (counters.epoch, counters.generation), {
+        "global_success_rate": round(success_rate, 2),
+        "avg_system_latency_ms": round(avg_latency, 1),
+        "daily_usd_burn_rate": round(counters.total_balance, 2)
+    }
+
+def versioned_snapshot(db: Session) -> Tuple[tuple, dict]:
+    return _snapshot(db.execute(_read_stmt()).scalars().first())
+
+async def versioned_snapshot_async(db: AsyncSession) -> Tuple[tuple, dict]:
+    return _snapshot((await db.execute(_read_stmt())).scalars().first())
+
+def recount(db: Session) -> None:
+    """
+    Rebuilds the current epoch's counters with one scan of its rows (startup,
+    and after a journal replay or ledger restore wrote rows twice or removed
+    some). The counters row is written before the scan, so concurrent appends
+    wait for this transaction and are then added on top of the scanned totals.
+    """
+    counters, tx = models.KPICounters, models.LedgerTransaction
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(counters).values(epoch=current_epoch(), generation=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[counters.epoch], set_={"generation": counters.generation + 1}
+    ))
+    action = tx.task_result.notin_(BALANCE_EVENTS)
+    totals = db.execute(
+        select(
+            func.count(case((action, 1))),
+            func.count(case((tx.task_result == "SUCCESS", 1))),
+            func.count(case((tx.task_result == "FAILURE", 1))),
+            func.coalesce(func.sum(tx.latency), 0.0),
+            func.count(tx.latency)
+        ).where(tx.epoch == current_epoch())
+    ).one()
+    # The balance in circulation is the wallets' total (agents older than the
+    # event stream have no opening row in the ledger)
+    total_balance = db.execute(
+        select(func.coalesce(func.sum(models.AgentRecord.wallet_balance), 0.0))
+        .where(models.AgentRecord.epoch == current_epoch())
+    ).scalar()
+    db.execute(
+        update(counters).where(counters.epoch == current_epoch()).values(
+            total_txs=totals[0], successful_txs=totals[1], failed_txs=totals[2],
+            latency_sum=totals[3], latency_count=totals[4], total_balance=total_balance
+        )
+    )
+    db.commit()
+
+def ensure_counters(db: Session) -> None:
+    """Seeds the current epoch's counters if they are missing (a ledger written before they existed)."""
+    if db.execute(_read_stmt()).first() is None:
+        recount(db)
+
+def start_epoch(db: Session, epoch: int) -> None:
+    """Part of a market reset, in its transaction: drops the earlier epochs' counters and opens the new one's."""
+    db.execute(delete(models.KPICounters).where(models.KPICounters.epoch < epoch))
+    db.add(models.KPICounters(epoch=epoch, total_txs=0, successful_txs=0, failed_txs=0, total_balance=0.0,
+                              latency_sum=0.0, latency_count=0, generation=0))
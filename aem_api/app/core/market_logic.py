@@ -1,49 +1,187 @@
-from typing import Dict
+import itertools
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Dict, List, Mapping, Optional, Union
+import numpy as np
+
+# Lock shards of the per-tick usage counter (each request thread is assigned one round-robin)
+USAGE_SHARDS = int(os.getenv("AEM_USAGE_SHARDS", "16"))
+
+@dataclass(frozen=True)
+class TickerSnapshot:
+    """Immutable view of the AMM prices published at the end of a tick."""
+    version: int
+    timestamp: float
+    prices: Dict[str, float]
+    demand: Dict[str, float] = field(default_factory=dict)
+
+    def as_ticker(self) -> list:
+        return [
+            {
+                "resource_name": res,
+                "dynamic_price": price,
+                "market_demand": self.demand.get(res, 0.0)
+            }
+            for res, price in self.prices.items()
+        ]
+
+    @cached_property
+    def ticker_json(self) -> bytes:
+        """`as_ticker()` serialized once per snapshot; /market/ticker serves these bytes as-is."""
+        return json.dumps(self.as_ticker(), separators=(",", ":")).encode()
+
+UsageInput = Union[Mapping[str, float], np.ndarray]
 
 class AutomatedMarketMaker:
     """
     Automated Market Maker (AMM)
     Orchestrates dynamic prices for computational resources based on 
     concurrent demand and base capacity.
+
+    The price book is array-backed: `resources` fixes a stable index and the
+    base prices, capacities and current prices are NumPy vectors in that
+    order, so a tick is one vectorized update regardless of the number of
+    resources.
     """
     def __init__(self, base_prices: Dict[str, float], capacities: Dict[str, float], k: float = 0.1, omega: float = 0.8):
         self.base_prices = base_prices
         self.capacities = capacities
         self.k = k
         self.omega = omega  # Smoothing factor to avoid high volatility
-        self.current_prices = base_prices.copy()
-        
-    def update_prices(self, usage: Dict[str, float]) -> Dict[str, float]:
+        self.resources: List[str] = list(base_prices)
+        self.index: Dict[str, int] = {r: i for i, r in enumerate(self.resources)}
+        self.base_vector = np.array([base_prices[r] for r in self.resources], dtype=np.float64)
+        self.capacity_vector = np.array([capacities.get(r, 1.0) for r in self.resources], dtype=np.float64)  # Avoid division by zero
+        self.price_vector = self.base_vector.copy()
+        self.snapshot = TickerSnapshot(version=0, timestamp=time.time(), prices=self.current_prices)
+
+    @property
+    def current_prices(self) -> Dict[str, float]:
+        return dict(zip(self.resources, self.price_vector.tolist()))
+
+    def usage_vector(self, usage: UsageInput) -> np.ndarray:
+        """Usage aligned with `resources` (accepts a vector already in that order or a name -> amount mapping)."""
+        if isinstance(usage, np.ndarray):
+            return usage
+        vector = np.zeros(len(self.resources))
+        for r, amount in usage.items():
+            i = self.index.get(r)
+            if i is not None:
+                vector[i] = amount
+        return vector
+
+    def update_prices(self, usage: UsageInput) -> np.ndarray:
         """
         Adjusts price based on usage (U_r) and capacity (L_r).
         Formula: p_{r,t+1} = p_{r,base} * (1 + k * (U_{r,t} / L_r))
         With smoothing for stability: omega * p_current + (1 - omega) * p_target
+        The new price vector replaces the old one in a single assignment, so readers never see a half-updated tick.
         """
-        for r, p_base in self.base_prices.items():
-            u_r = usage.get(r, 0.0)
-            l_r = self.capacities.get(r, 1.0) # Avoid division by zero
-            
-            # Target price based on demand
-            p_target = p_base * (1 + self.k * (u_r / l_r))
-            
-            # Smoothing to prevent violent price swings
-            self.current_prices[r] = self.omega * self.current_prices[r] + (1 - self.omega) * p_target
-            
-        return self.current_prices
+        # Target price based on demand, smoothed to prevent violent price swings
+        p_target = self.base_vector * (1 + self.k * (self.usage_vector(usage) / self.capacity_vector))
+        self.price_vector = self.omega * self.price_vector + (1 - self.omega) * p_target
+        return self.price_vector
+
+    def publish(self, demand: Optional[UsageInput] = None) -> TickerSnapshot:
+        """Publishes the current prices as a new versioned ticker snapshot."""
+        previous = self.snapshot
+        prices = self.current_prices
+        demand = dict(zip(self.resources, self.usage_vector(demand).tolist())) if demand is not None else {}
+        self.snapshot = TickerSnapshot(
+            version=previous.version + 1,
+            timestamp=time.time(),
+            prices=prices,
+            demand=demand
+        )
+        if prices == previous.prices and demand == previous.demand and "ticker_json" in previous.__dict__:
+            # Unchanged book: reuse the serialized ticker instead of rebuilding it
+            self.snapshot.__dict__["ticker_json"] = previous.ticker_json
+        return self.snapshot
+
+    def load_snapshot(self, snapshot: TickerSnapshot) -> None:
+        """Adopts a snapshot published elsewhere (e.g. by the worker that owns the shared tick)."""
+        prices = self.base_vector.copy()
+        for r, price in snapshot.prices.items():
+            if r in self.index:
+                prices[self.index[r]] = price
+        self.price_vector = prices
+        self.snapshot = snapshot
+
+    def reset(self) -> TickerSnapshot:
+        """Restores base prices and publishes them."""
+        self.price_vector = self.base_vector.copy()
+        return self.publish()
 
     def get_price(self, resource_name: str) -> float:
-        return self.current_prices.get(resource_name, self.base_prices.get(resource_name, 1.0))
+        i = self.index.get(resource_name)
+        if i is None:
+            return self.base_prices.get(resource_name, 1.0)
+        return float(self.price_vector[i])
 
     def get_prices(self) -> list:
-        """Format prices for the API response."""
-        return [
-            {
-                "resource_name": res,
-                "dynamic_price": price,
-                "market_demand": 0.0 # Placeholder, can be updated with actual state
-            }
-            for res, price in self.current_prices.items()
-        ]
+        """Format the last published snapshot for the API response."""
+        return self.snapshot.as_ticker()
+
+class UsageAccumulator:
+    """
+    Tracks cumulative usage per resource during the current tick.
+    Request handlers only do an O(1) `record`; the tick loop `swap`s the
+    accumulator for a fresh one and prices the returned totals.
+
+    Counts are sharded by thread: each worker thread increments its own
+    shard under its own lock, so concurrent requests never contend on one
+    global lock. Each shard is a vector in `resources` order, so `swap`
+    and `peek` sum the shards with one array addition per shard.
+    """
+    def __init__(self, resources, shards: int = USAGE_SHARDS):
+        self._resources = list(resources)
+        self._index = {r: i for i, r in enumerate(self._resources)}
+        self._shards = [(threading.Lock(), np.zeros(len(self._resources))) for _ in range(max(shards, 1))]
+        # Thread idents are page-aligned addresses, so `get_ident() % n` would put
+        # every thread on one shard: each thread takes the next shard on first use
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = self._shards[next(self._next_shard) % len(self._shards)]
+        return shard
+
+    def shards_in_use(self) -> int:
+        """Shards holding usage in the current tick."""
+        return sum(1 for lock, usage in self._shards if usage.any())
+
+    def record(self, resource: str, amount: float = 1.0) -> None:
+        i = self._index.get(resource)
+        if i is None:
+            return
+        lock, usage = self._shard()
+        with lock:
+            usage[i] += amount
+
+    def _collect(self, reset: bool) -> np.ndarray:
+        totals = np.zeros(len(self._resources))
+        for lock, usage in self._shards:
+            with lock:
+                totals += usage
+                if reset:
+                    usage.fill(0.0)
+        return totals
+
+    def swap_vector(self) -> np.ndarray:
+        """Drained totals in `resources` order (the layout `AutomatedMarketMaker` prices directly)."""
+        return self._collect(reset=True)
+
+    def swap(self) -> Dict[str, float]:
+        return dict(zip(self._resources, self._collect(reset=True).tolist()))
+
+    def peek(self) -> Dict[str, float]:
+        return dict(zip(self._resources, self._collect(reset=False).tolist()))
 
 # Global instance for the microservice
 BASE_PRICES = {
@@ -58,8 +196,8 @@ CAPACITIES = {
 }
 shared_amm = AutomatedMarketMaker(base_prices=BASE_PRICES, capacities=CAPACITIES)
 
-# Dictionary to track cumulative usage in the current cycle for each resource
-current_usage = {k: 0.0 for k in BASE_PRICES.keys()}
+# Cumulative usage in the current cycle for each resource
+current_usage = UsageAccumulator(BASE_PRICES.keys())
 
 def calculate_reward(
     t_base: float,
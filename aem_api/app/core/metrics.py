@@ -0,0 +1,292 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Type, Union
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from .market_logic import shared_amm
+from .response_cache import response_cache
+
+# Latency buckets in seconds (Prometheus `le` upper bounds)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Mounts the /metrics/profiler routes (off by default)
+PROFILER_ENABLED = os.getenv("AEM_PROFILER_ENABLED", "0") == "1"
+PROFILER_INTERVAL_SECONDS = float(os.getenv("AEM_PROFILER_INTERVAL_MS", "10")) / 1000.0
+PROFILER_MAX_SECONDS = float(os.getenv("AEM_PROFILER_MAX_SECONDS", "300"))
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(**labels: str) -> Labels:
+    return tuple(sorted(labels.items()))
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+class CounterMetric:
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help, self.kind = name, help_text, "counter"
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _labels(**labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in values.items():
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+class GaugeMetric:
+    """Gauge evaluated at scrape time from a callback."""
+    def __init__(self, name: str, help_text: str, callback: Callable[[], float]):
+        self.name, self.help, self.kind = name, help_text, "gauge"
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        yield f"{self.name} {_format_value(self.callback())}"
+
+class HistogramMetric:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.kind = name, help_text, "histogram"
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _labels(**labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in snapshot.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {_format_value(cumulative)}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-1])}"
+            yield f"{self.name}_count{_format_labels(labels)} {_format_value(cumulative)}"
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format."""
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, help_text: str) -> CounterMetric:
+        return self._register(CounterMetric(name, help_text))
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], float]) -> GaugeMetric:
+        return self._register(GaugeMetric(name, help_text, callback))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> HistogramMetric:
+        return self._register(HistogramMetric(name, help_text, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "aem_http_request_duration_seconds", "Time from request to response start, per route template")
+http_requests = registry.counter("aem_http_requests_total", "HTTP requests per route, method and status")
+db_query_duration = registry.histogram("aem_db_query_duration_seconds", "SQL statement execution time by statement type")
+db_commit_duration = registry.histogram("aem_db_commit_duration_seconds", "Session commit time (flush + COMMIT / fsync)")
+amm_tick_duration = registry.histogram("aem_amm_tick_duration_seconds", "Duration of one AMM price tick")
+registry.gauge("aem_ticker_version", "Version of the ticker snapshot served by this process",
+               lambda: shared_amm.snapshot.version)
+registry.gauge("aem_ticker_staleness_seconds", "Seconds since the served ticker snapshot was published",
+               lambda: time.time() - shared_amm.snapshot.timestamp)
+registry.gauge("aem_response_cache_hits", "Cached JSON responses served without re-serializing",
+               lambda: response_cache.hits)
+registry.gauge("aem_response_cache_misses", "Cached JSON responses built on demand",
+               lambda: response_cache.misses)
+
+# ---- ASGI middleware ----
+
+def _route_template(scope) -> str:
+    """
+    Path template of the matched route, router prefix included (e.g.
+    /api/v1/agents/{agent_id}/settle), so path parameters don't explode the label set.
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Recent FastAPI releases keep the router's own route in scope["route"] and the
+    # prefixed one in its effective route context; older releases copy the route with the prefix
+    effective = scope.get("fastapi", {}).get("effective_route_context")
+    return getattr(effective, "path", None) or route.path
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: observes the time until `http.response.start`, which
+    covers routing, validation, the handler and response serialization, and
+    keeps streaming endpoints (SSE) from counting their whole lifetime.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                labels = {"route": _route_template(scope), "method": scope["method"]}
+                http_request_duration.observe(time.perf_counter() - started, **labels)
+                http_requests.inc(status=str(message["status"]), **labels)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+# ---- SQLAlchemy hooks ----
+
+def instrument_database(engine: Engine, session_factory: Union[sessionmaker, Type[Session]]) -> None:
+    """
+    Times every cursor execution on `engine` and every commit of sessions from
+    `session_factory` (a sessionmaker, or the sync session class behind an
+    async_sessionmaker).
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("aem_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["aem_query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        db_query_duration.observe(time.perf_counter() - started, operation=operation)
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(context):
+        # Failed statements never reach after_cursor_execute
+        if context.connection is not None and context.connection.info.get("aem_query_start"):
+            context.connection.info["aem_query_start"].pop()
+
+    @event.listens_for(session_factory, "before_commit")
+    def _before_commit(session):
+        session.info["aem_commit_start"] = time.perf_counter()
+
+    @event.listens_for(session_factory, "after_commit")
+    def _after_commit(session):
+        started = session.info.pop("aem_commit_start", None)
+        if started is not None:
+            db_commit_duration.observe(time.perf_counter() - started)
+
+    @event.listens_for(session_factory, "after_rollback")
+    def _after_rollback(session):
+        session.info.pop("aem_commit_start", None)
+
+# ---- sampling profiler ----
+
+class SamplingProfiler:
+    """
+    Opt-in wall-clock sampler: a daemon thread reads `sys._current_frames()`
+    every interval and counts collapsed stacks (`file:function:line;...`),
+    the folded format flamegraph tools take as input. It costs nothing while
+    stopped and stops by itself after `max_seconds`.
+    """
+    def __init__(self, interval: float = PROFILER_INTERVAL_SECONDS, max_seconds: float = PROFILER_MAX_SECONDS):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: Optional[float] = None) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self.stacks = Counter()
+            self.samples = 0
+            self.started_at = time.time()
+            self._stop.clear()
+            deadline = time.monotonic() + min(duration or self.max_seconds, self.max_seconds)
+            self._thread = threading.Thread(target=self._run, args=(deadline,), name="aem-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self, deadline: float) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            sampled = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                sampled.append(";".join(reversed(stack)))
+            # Readers copy `stacks` under the same lock: no iteration while it grows
+            with self._lock:
+                self.stacks.update(sampled)
+                self.samples += 1
+
+    def folded(self, limit: Optional[int] = None) -> str:
+        with self._lock:
+            stacks = Counter(self.stacks)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common(limit))
+
+    def status(self) -> dict:
+        with self._lock:
+            samples, distinct_stacks = self.samples, len(self.stacks)
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "samples": samples,
+            "interval_ms": self.interval * 1000,
+            "distinct_stacks": distinct_stacks
+        }
+
+# Global instance for the microservice
+profiler = SamplingProfiler()
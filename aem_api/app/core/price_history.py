@@ -0,0 +1,108 @@
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+from sqlalchemy import case, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import sessionmaker
+from ..db import models
+from ..db.database import SessionLocal
+from .market_logic import TickerSnapshot
+
+# Rollup resolutions and their bucket width in seconds
+RESOLUTIONS = {"1s": 1, "1m": 60, "1h": 3600}
+
+# Ticks buffered in memory before one bulk write (1 = write every tick)
+FLUSH_EVERY_TICKS = int(os.getenv("AEM_PRICE_HISTORY_FLUSH_TICKS", "1"))
+ROLLUPS_ENABLED = os.getenv("AEM_PRICE_ROLLUPS", "1") == "1"
+
+def to_utc_naive(ts: float) -> datetime:
+    """Timestamps are stored as naive UTC, like SQLite's CURRENT_TIMESTAMP."""
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
+
+def bucket_start(ts: float, width: int) -> datetime:
+    return to_utc_naive(ts - (ts % width))
+
+class PriceHistoryRecorder:
+    """
+    Appends one market_logs row per resource per AMM tick and maintains OHLC
+    rollups at 1s/1m/1h. Rows are buffered and written with one bulk insert per
+    flush; rollups are partial bars merged into the stored bar with an upsert,
+    so a bucket may be written by several flushes (or processes) without loss.
+    """
+    def __init__(self, session_factory: sessionmaker, flush_every: int = FLUSH_EVERY_TICKS, rollups: bool = ROLLUPS_ENABLED):
+        self.session_factory = session_factory
+        self.flush_every = max(flush_every, 1)
+        self.rollups = rollups
+        self._lock = threading.Lock()
+        self._raw: List[dict] = []
+        self._bars: Dict[Tuple[str, str, datetime], dict] = {}
+        self._pending_ticks = 0
+
+    def record(self, snapshot: TickerSnapshot) -> None:
+        ts = to_utc_naive(snapshot.timestamp)
+        with self._lock:
+            for resource, price in snapshot.prices.items():
+                demand = snapshot.demand.get(resource, 0.0)
+                self._raw.append({
+                    "resource_name": resource,
+                    "dynamic_price": price,
+                    "market_demand": demand,
+                    "timestamp": ts
+                })
+                if self.rollups:
+                    for resolution, width in RESOLUTIONS.items():
+                        self._merge_bar((resource, resolution, bucket_start(snapshot.timestamp, width)), price, demand)
+            self._pending_ticks += 1
+            should_flush = self._pending_ticks >= self.flush_every
+        if should_flush:
+            self.flush()
+
+    def _merge_bar(self, key, price: float, demand: float) -> None:
+        bar = self._bars.get(key)
+        if bar is None:
+            self._bars[key] = {
+                "resource_name": key[0], "resolution": key[1], "bucket_start": key[2],
+                "open": price, "high": price, "low": price, "close": price,
+                "demand_sum": demand, "samples": 1
+            }
+            return
+        bar["high"] = max(bar["high"], price)
+        bar["low"] = min(bar["low"], price)
+        bar["close"] = price
+        bar["demand_sum"] += demand
+        bar["samples"] += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            raw, self._raw = self._raw, []
+            bars, self._bars = list(self._bars.values()), {}
+            self._pending_ticks = 0
+        if not raw and not bars:
+            return
+        with self.session_factory() as db:
+            if raw:
+                db.execute(insert(models.MarketLog), raw)
+            if bars:
+                db.execute(self._upsert_bars(db.get_bind().dialect.name), bars)
+            db.commit()
+
+    @staticmethod
+    def _upsert_bars(dialect_name: str):
+        dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+        table = models.MarketLogRollup.__table__
+        stmt = dialect_insert(table)
+        new = stmt.excluded
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.resource_name, table.c.resolution, table.c.bucket_start],
+            set_={
+                "high": case((new.high > table.c.high, new.high), else_=table.c.high),
+                "low": case((new.low < table.c.low, new.low), else_=table.c.low),
+                "close": new.close,
+                "demand_sum": table.c.demand_sum + new.demand_sum,
+                "samples": table.c.samples + new.samples
+            }
+        )
+
+# Global instance for the microservice
+price_history = PriceHistoryRecorder(SessionLocal)
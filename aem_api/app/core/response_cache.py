@@ -0,0 +1,106 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+from fastapi import Request, Response
+
+# Serialized responses kept per process (LRU); one entry per (endpoint, version, query)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("AEM_RESPONSE_CACHE_MAX_ENTRIES", "256"))
+# Clients may reuse a stored body but must revalidate it (If-None-Match) on every poll
+CACHE_CONTROL = "no-cache"
+# Distinguishes this process's in-memory counters from those of a previous run (or another worker)
+PROCESS_TOKEN = uuid.uuid4().hex[:8]
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+    headers: Dict[str, str]
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 13.1.2): W/"x" matches "x"
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+class ResponseCache:
+    """
+    Serialized JSON bodies keyed on whatever version identifies their data
+    (AMM snapshot version, KPI generation, ledger high-water mark). A hit
+    skips the query-to-JSON work entirely; a client that sends back the
+    ETag gets an empty 304. The ETag is derived from the key alone, so any
+    process that computes the same key answers with the same ETag.
+    """
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max(max_entries, 1)
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def etag_for(key: Hashable) -> str:
+        return '"' + hashlib.sha1(repr(key).encode()).hexdigest()[:20] + '"'
+
+    def _lookup(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def _store(self, key: Hashable, body: bytes, headers: Dict[str, str]) -> CachedResponse:
+        entry = CachedResponse(self.etag_for(key), body, headers)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Tuple[bytes, Dict[str, str]]]) -> CachedResponse:
+        # Built outside the lock: concurrent misses on the same key just build it twice
+        return self._lookup(key) or self._store(key, *build())
+
+    async def get_or_build_async(self, key: Hashable,
+                                 build: Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]]) -> CachedResponse:
+        return self._lookup(key) or self._store(key, *await build())
+
+    def _not_modified(self, request: Request, key: Hashable) -> Optional[Response]:
+        etag = self.etag_for(key)
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+        return None
+
+    @staticmethod
+    def _response(entry: CachedResponse, media_type: str) -> Response:
+        headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": CACHE_CONTROL}
+        return Response(content=entry.body, media_type=media_type, headers=headers)
+
+    def respond(self, request: Request, key: Hashable, build: Callable[[], Tuple[bytes, Dict[str, str]]],
+                media_type: str = "application/json") -> Response:
+        """Returns 304 if the client's If-None-Match matches `key`, else the (cached) body."""
+        return self._not_modified(request, key) or self._response(self.get_or_build(key, build), media_type)
+
+    async def respond_async(self, request: Request, key: Hashable,
+                            build: Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]],
+                            media_type: str = "application/json") -> Response:
+        """`respond` for a body built by a coroutine (queries on the async engine)."""
+        return self._not_modified(request, key) or self._response(await self.get_or_build_async(key, build), media_type)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+# Global instance for the microservice
+response_cache = ResponseCache()
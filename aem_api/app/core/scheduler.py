@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import os
+import time
+from .market_logic import shared_amm, current_usage, TickerSnapshot
+from .ticker_stream import ticker_broadcaster
+from .price_history import price_history
+from .amm_backend import amm_backend, SYNC_INTERVAL_SECONDS
+from .metrics import amm_tick_duration
+from .event_store import SNAPSHOT_INTERVAL_SECONDS, take_snapshot
+from ..db.database import SessionLocal
+from ..db.epochs import purge_stale
+
+logger = logging.getLogger(__name__)
+
+# Seconds between AMM price ticks (the paper suggests a fixed cadence, e.g. 60s)
+TICK_INTERVAL_SECONDS = float(os.getenv("AEM_TICK_INTERVAL_SECONDS", "5.0"))
+# Purge of the rows left behind by a market reset: poll interval, rows per
+# table and transaction, and pause between chunks so settlements get the write lock
+EPOCH_PURGE_INTERVAL_SECONDS = float(os.getenv("AEM_EPOCH_PURGE_INTERVAL_SECONDS", "5.0"))
+EPOCH_PURGE_CHUNK_ROWS = int(os.getenv("AEM_EPOCH_PURGE_CHUNK_ROWS", "5000"))
+EPOCH_PURGE_PAUSE_SECONDS = float(os.getenv("AEM_EPOCH_PURGE_PAUSE_SECONDS", "0.05"))
+
+def tick_market() -> TickerSnapshot:
+    """
+    Runs one AMM tick: swaps out the usage accumulated since the previous tick,
+    updates the prices, publishes a new ticker snapshot to stream subscribers
+    and appends it to the price history.
+    """
+    started = time.perf_counter()
+    usage = current_usage.swap_vector()
+    shared_amm.update_prices(usage)
+    snapshot = shared_amm.publish(demand=usage)
+    ticker_broadcaster.publish(snapshot)
+    price_history.record(snapshot)
+    amm_tick_duration.observe(time.perf_counter() - started, backend="local")
+    return snapshot
+
+def sync_shared_market(interval: float = TICK_INTERVAL_SECONDS) -> None:
+    """
+    One cycle of the multi-worker AMM: pushes local usage to the shared
+    counters, runs the tick if it is due and this worker holds the lease,
+    and otherwise adopts whatever snapshot the leader published.
+    """
+    amm_backend.report_usage(current_usage.swap())
+    if amm_backend.tick_due(interval):
+        started = time.perf_counter()
+        snapshot = amm_backend.tick(interval)
+        if snapshot is not None:
+            # Only the leader appends history, so each tick is stored once
+            ticker_broadcaster.publish(snapshot)
+            price_history.record(snapshot)
+            amm_tick_duration.observe(time.perf_counter() - started, backend="db")
+            return
+    snapshot = amm_backend.sync()
+    if snapshot is not None:
+        ticker_broadcaster.publish(snapshot)
+
+async def run_price_ticks(interval: float = TICK_INTERVAL_SECONDS) -> None:
+    """Background loop that ticks the shared AMM every `interval` seconds."""
+    if amm_backend is not None:
+        await asyncio.to_thread(amm_backend.start)
+        while True:
+            await asyncio.sleep(min(SYNC_INTERVAL_SECONDS, interval))
+            try:
+                await asyncio.to_thread(sync_shared_market, interval)
+            except Exception:
+                logger.exception("Shared AMM sync failed")
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(tick_market)
+        except Exception:
+            logger.exception("AMM price tick failed")
+
+def snapshot_ledger() -> None:
+    """Compact snapshot of every wallet and the served AMM prices at the ledger head."""
+    snapshot = shared_amm.snapshot
+    with SessionLocal() as db:
+        take_snapshot(db, snapshot.prices, snapshot.version)
+
+async def run_ledger_snapshots(interval: float = SNAPSHOT_INTERVAL_SECONDS) -> None:
+    """Background loop that snapshots the ledger every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(snapshot_ledger)
+        except Exception:
+            logger.exception("Ledger snapshot failed")
+
+def purge_stale_epochs(chunk_rows: int = EPOCH_PURGE_CHUNK_ROWS) -> int:
+    """One bounded chunk of the purge of earlier market epochs; returns the rows deleted."""
+    with SessionLocal() as db:
+        return purge_stale(db, chunk_rows)
+
+async def run_epoch_purge(interval: float = EPOCH_PURGE_INTERVAL_SECONDS) -> None:
+    """
+    Background loop that drops the ledger rows and wallets of earlier market
+    epochs chunk by chunk, so a reset never holds the write lock for long.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            while await asyncio.to_thread(purge_stale_epochs):
+                await asyncio.sleep(EPOCH_PURGE_PAUSE_SECONDS)
+        except Exception:
+            logger.exception("Epoch purge failed")
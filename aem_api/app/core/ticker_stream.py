@@ -0,0 +1,51 @@
+import asyncio
+import json
+from typing import Optional, Set
+from .market_logic import TickerSnapshot
+
+def ticker_message(snapshot: TickerSnapshot) -> dict:
+    """Wire format pushed to stream subscribers."""
+    return {
+        "sequence": snapshot.version,
+        "timestamp": snapshot.timestamp,
+        "ticker": snapshot.as_ticker()
+    }
+
+def sse_event(snapshot: TickerSnapshot) -> str:
+    return f"id: {snapshot.version}\nevent: ticker\ndata: {json.dumps(ticker_message(snapshot))}\n\n"
+
+class TickerBroadcaster:
+    """
+    Fan-out of AMM ticker snapshots to streaming subscribers (SSE / WebSocket).
+    Each subscriber owns a one-slot queue: a slow consumer only ever sees the
+    latest snapshot, and a gap in `sequence` tells it that ticks were coalesced.
+    """
+    def __init__(self):
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self, snapshot: TickerSnapshot) -> None:
+        """Thread-safe: may be called from the tick loop or from a threadpool handler."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._fan_out, snapshot)
+
+    def _fan_out(self, snapshot: TickerSnapshot) -> None:
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(snapshot)
+
+# Global instance for the microservice
+ticker_broadcaster = TickerBroadcaster()
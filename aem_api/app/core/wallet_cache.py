@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import sessionmaker
+from ..db import epochs, ledger, models
+from ..db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: the cache is authoritative, so it requires a single API process owning the ledger
+WALLET_CACHE_ENABLED = os.getenv("AEM_WALLET_CACHE", "0") == "1"
+FLUSH_INTERVAL_SECONDS = float(os.getenv("AEM_WALLET_FLUSH_INTERVAL_SECONDS", "0.5"))
+JOURNAL_DIR = os.getenv("AEM_WALLET_JOURNAL_DIR", "./aem_wallet_journal")
+# "always" fsyncs every append; "flush" fsyncs once per write-behind cycle
+JOURNAL_FSYNC = os.getenv("AEM_WALLET_JOURNAL_FSYNC", "flush")
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+@dataclass
+class CachedAgent:
+    id: str
+    wallet_balance: float
+    skill_level: float
+    complexity: float
+    # Market epoch the agent was loaded or created in
+    epoch: int = 0
+    updated_at: datetime = field(default_factory=utc_now)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def as_state(self) -> dict:
+        return {
+            "id": self.id,
+            "wallet_balance": self.wallet_balance,
+            "skill_level": self.skill_level,
+            "complexity": self.complexity,
+            "epoch": self.epoch
+        }
+
+class WalletCache:
+    """
+    Authoritative in-process cache of agent wallets and skill/complexity.
+
+    Request handlers validate funds and mutate an agent under its own lock,
+    then `commit` the change: the new agent state and its ledger row are
+    appended to a journal segment (durable append log) and queued. A
+    background thread flushes dirty agents and queued ledger rows to the
+    database in one transaction per cycle, then drops the covered journal
+    segments. The agent state queued is the one captured with its ledger
+    row, so each flush leaves agent_records equal to the ledger it wrote. On startup, leftover segments are replayed idempotently
+    (ledger ids are allocated by the cache, inserts skip existing ids).
+    A market reset flushes the cache and moves it to the new epoch
+    (`reset_epoch`): agents are then reloaded, and wallets of the previous
+    epoch reset, on their next access.
+    """
+    def __init__(self, session_factory: sessionmaker, journal_dir: str = JOURNAL_DIR,
+                 flush_interval: float = FLUSH_INTERVAL_SECONDS, fsync_mode: str = JOURNAL_FSYNC):
+        self.session_factory = session_factory
+        self.journal_dir = Path(journal_dir)
+        self.flush_interval = flush_interval
+        self.fsync_mode = fsync_mode
+        self._agents: Dict[str, CachedAgent] = {}
+        self._agents_lock = threading.Lock()
+        # Guards the pending queues, the journal segment and the ledger id sequence
+        self._pending_lock = threading.Lock()
+        self._pending_ledger: List[dict] = []
+        self._dirty: Dict[str, dict] = {}
+        self._new_agents: set = set()
+        self._next_ledger_id = 1
+        self.epoch = 0
+        self._segment = 0
+        self._journal = None
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- lifecycle ----
+
+    def start(self) -> None:
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        self._replay_journal()
+        with self.session_factory() as db:
+            max_id = db.execute(select(func.max(models.LedgerTransaction.id))).scalar() or 0
+            self.epoch = epochs.get_current_epoch(db)
+        self._next_ledger_id = max_id + 1
+        self._open_segment()
+        self._thread = threading.Thread(target=self._run, name="aem-wallet-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._segment_path(self._segment).unlink(missing_ok=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Wallet cache flush failed, will retry")
+
+    # ---- reads and writes ----
+
+    def load(self, agent_id: str) -> Optional[CachedAgent]:
+        """
+        Returns the cached agent, loading it from the database on first access
+        (None if it does not exist in the current epoch).
+        """
+        agent = self._agents.get(agent_id)
+        if agent is not None:
+            return agent
+        epoch = self.epoch
+        with self.session_factory() as db:
+            record = db.get(models.AgentRecord, agent_id)
+        if record is None or record.epoch != epoch:
+            return None
+        with self._agents_lock:
+            if epoch != self.epoch:
+                return None
+            return self._agents.setdefault(agent_id, CachedAgent(
+                id=record.id,
+                wallet_balance=record.wallet_balance,
+                skill_level=record.skill_level,
+                complexity=record.complexity,
+                epoch=epoch
+            ))
+
+    def create(self, agent_id: str, wallet_balance: float, skill_level: float, complexity: float) -> Tuple[CachedAgent, bool]:
+        """Creates an agent in the cache (persisted by the next flush); returns (agent, created)."""
+        with self._agents_lock:
+            agent = self._agents.get(agent_id)
+            if agent is not None:
+                return agent, False
+            agent = CachedAgent(id=agent_id, wallet_balance=wallet_balance, skill_level=skill_level,
+                                complexity=complexity, epoch=self.epoch)
+            # Published already locked: no other event on the agent can precede its opening row
+            agent.lock.acquire()
+            self._agents[agent_id] = agent
+        try:
+            self.commit(agent, ledger.opening_row(agent_id, wallet_balance, skill_level, complexity), created=True)
+        finally:
+            agent.lock.release()
+        return agent, True
+
+    def commit(self, agent: CachedAgent, ledger_row: Optional[dict] = None, created: bool = False) -> None:
+        """
+        Records a mutation made while holding `agent.lock`: journals the new
+        agent state (and ledger row) and queues both for the write-behind flush.
+        """
+        agent.updated_at = utc_now()
+        with self._pending_lock:
+            if agent.epoch != self.epoch:
+                # Loaded before a market reset: the mutation belongs to the epoch being dropped
+                return
+            entry = {"agent": agent.as_state()}
+            if ledger_row is not None:
+                # Same keys on every row, so the flush can bulk insert them in one executemany
+                ledger_row = dict({"skill_level": None, "complexity": None, "latency": None}, **ledger_row,
+                                  id=self._next_ledger_id, timestamp=agent.updated_at, epoch=agent.epoch)
+                self._next_ledger_id += 1
+                self._pending_ledger.append(ledger_row)
+                entry["ledger"] = dict(ledger_row, timestamp=ledger_row["timestamp"].isoformat())
+            if created:
+                self._new_agents.add(agent.id)
+            self._dirty[agent.id] = entry["agent"]
+            self._append_journal(entry)
+
+    # ---- journal ----
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.journal_dir / f"wallet-{segment:012d}.log"
+
+    def _open_segment(self) -> None:
+        existing = sorted(self.journal_dir.glob("wallet-*.log"))
+        if existing:
+            self._segment = max(self._segment, int(existing[-1].stem.split("-")[1]))
+        self._segment += 1
+        self._journal = open(self._segment_path(self._segment), "a", encoding="utf-8")
+
+    def _append_journal(self, entry: dict) -> None:
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+        if self.fsync_mode == "always":
+            os.fsync(self._journal.fileno())
+
+    def _replay_journal(self) -> None:
+        segments = sorted(self.journal_dir.glob("wallet-*.log"))
+        if not segments:
+            return
+        agents: Dict[str, dict] = {}
+        replayed: List[dict] = []
+        for path in segments:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn write at crash time: everything after it was never acknowledged
+                        break
+                    # Segments written before market epochs existed belong to epoch 0
+                    agents[entry["agent"]["id"]] = dict({"epoch": 0}, **entry["agent"])
+                    if "ledger" in entry:
+                        replayed.append(dict({"epoch": 0, "latency": None}, **entry["ledger"],
+                                           timestamp=datetime.fromisoformat(entry["ledger"]["timestamp"])))
+        with self.session_factory() as db:
+            self._write(db, list(agents.values()), replayed, upsert=True)
+            db.commit()
+        for path in segments:
+            path.unlink()
+        logger.info("Replayed %d agents and %d ledger rows from the wallet journal", len(agents), len(replayed))
+
+    # ---- write-behind ----
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._pending_lock:
+                if not self._dirty and not self._pending_ledger:
+                    return
+                pending_rows, self._pending_ledger = self._pending_ledger, []
+                dirty, self._dirty = self._dirty, {}
+                new_agents, self._new_agents = self._new_agents, set()
+                # Rotate: the closed segments hold exactly what this flush persists
+                if self.fsync_mode != "always":
+                    os.fsync(self._journal.fileno())
+                self._journal.close()
+                flushed_segment = self._segment
+                self._open_segment()
+
+            states = list(dirty.values())
+            try:
+                with self.session_factory() as db:
+                    self._write(db, states, pending_rows, new_ids=new_agents)
+                    db.commit()
+            except Exception:
+                # Requeue so the next cycle retries; the journal segments stay on disk until then
+                with self._pending_lock:
+                    self._pending_ledger[:0] = pending_rows
+                    for agent_id, state in dirty.items():
+                        self._dirty.setdefault(agent_id, state)
+                    self._new_agents |= new_agents
+                raise
+
+            for path in self.journal_dir.glob("wallet-*.log"):
+                if int(path.stem.split("-")[1]) <= flushed_segment:
+                    path.unlink()
+
+    def reset_epoch(self, epoch: int) -> None:
+        """
+        Moves the cache to a new market epoch (call after flushing and committing
+        the epoch): every cached agent is dropped and reloaded on next access.
+        """
+        with self._agents_lock, self._pending_lock:
+            self.epoch = epoch
+            self._agents.clear()
+
+    def _write(self, db, states: List[dict], ledger_rows: List[dict], new_ids=(), upsert: bool = False) -> None:
+        # New agents are upserted too: a wallet of an earlier epoch may still hold the id
+        upserts = states if upsert else [s for s in states if s["id"] in new_ids]
+        updates = [] if upsert else [s for s in states if s["id"] not in new_ids]
+        dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        if upserts:
+            stmt = dialect_insert(models.AgentRecord)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[models.AgentRecord.id],
+                set_={c: stmt.excluded[c] for c in ("wallet_balance", "skill_level", "complexity", "epoch")}
+            ), upserts)
+        if updates:
+            db.execute(update(models.AgentRecord), updates)
+        # A replay skips rows an interrupted flush already stored (startup recounts the KPIs after it)
+        ledger.append_many(db, ledger_rows, skip_existing=upsert)
+
+# Global instance for the microservice
+wallet_cache = WalletCache(SessionLocal) if WALLET_CACHE_ENABLED else None
@@ -1,12 +1,16 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./aem_ledger.db"
+# The storage factory is shared with aem_project (`pip install -e .` from the repository root)
+from aem_storage import get_database_url, create_storage_engine, create_session_factory
+from aem_storage.async_engine import create_async_storage_engine, create_async_session_factory
 
-# connect_args is needed only for SQLite
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SQLALCHEMY_DATABASE_URL = get_database_url()
+
+engine = create_storage_engine(SQLALCHEMY_DATABASE_URL)
+SessionLocal = create_session_factory(engine)
+
+# Same database for the `async def` handlers (aiosqlite / asyncpg)
+async_engine = create_async_storage_engine(SQLALCHEMY_DATABASE_URL)
+AsyncSessionLocal = create_async_session_factory(async_engine)
 
 Base = declarative_base()
@@ -0,0 +1,45 @@
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from . import models
+
+# A market reset starts a new epoch instead of deleting the ledger: live reads
+# and wallet statements only see rows of the current epoch, a wallet left
+# over from an earlier epoch is reset on its next access, and the stale rows
+# are dropped afterwards in bounded chunks (`purge_stale`).
+
+# Tables whose earlier-epoch rows are purged, in order: agents only go once none
+# of their ledger rows is left (snapshots are dropped by the reset itself)
+PURGED_MODELS = (models.LedgerTransaction, models.AgentRecord)
+
+def current_epoch():
+    """The current epoch as a scalar subquery, so wallet statements check it in the same round trip."""
+    return models.CURRENT_EPOCH
+
+def get_current_epoch(db: Session) -> int:
+    return db.execute(select(models.CURRENT_EPOCH)).scalar()
+
+def begin_epoch(db: Session) -> int:
+    """Starts a new epoch in the caller's transaction (one insert, whatever the ledger size); returns it."""
+    return db.execute(insert(models.MarketEpoch).values(started_at=func.now()).returning(models.MarketEpoch.id)).scalar_one()
+
+def purge_stale(db: Session, chunk_rows: int) -> int:
+    """
+    Deletes up to `chunk_rows` rows of earlier epochs from each purged table,
+    committing after each chunk so the write lock is only held briefly.
+    Returns the number of rows deleted.
+    """
+    epoch = get_current_epoch(db)
+    deleted = 0
+    for model in PURGED_MODELS:
+        chunk = select(model.id).where(model.epoch < epoch).limit(chunk_rows)
+        # The epoch is re-checked on the row itself: an agent reset into the
+        # current epoch since the chunk was selected is kept
+        result = db.execute(delete(model).where(model.id.in_(chunk), model.epoch < epoch))
+        db.commit()
+        deleted += result.rowcount
+        if result.rowcount == chunk_rows:
+            break
+    # Counters a late write-behind flush re-created for an earlier epoch
+    db.execute(delete(models.KPICounters).where(models.KPICounters.epoch < epoch))
+    db.commit()
+    return deleted
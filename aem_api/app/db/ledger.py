@@ -0,0 +1,106 @@
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from . import models
+from .epochs import current_epoch
+
+# The ledger is the append-only event stream behind every wallet: each row's
+# net_profit is the balance change it caused, so an agent's balance is the sum
+# of its rows. Besides market transactions (SUCCESS, FAILURE, REFACTOR_SUCCESS)
+# it records the balance movements below.
+AGENT_OPENED = "AGENT_OPENED"
+TOPUP = "TOPUP"
+# Ledger rows that move a balance without being a market transaction (left out of the KPIs)
+BALANCE_EVENTS = (AGENT_OPENED, TOPUP)
+
+def opening_row(agent_id: str, wallet_balance: float, skill_level: float, complexity: float) -> dict:
+    return {
+        "agent_id": agent_id,
+        "resource_used": None,
+        "cost_paid": 0.0,
+        "reward_earned": 0.0,
+        "net_profit": wallet_balance,
+        "task_result": AGENT_OPENED,
+        "skill_level": skill_level,
+        "complexity": complexity
+    }
+
+def topup_row(agent_id: str, amount: float) -> dict:
+    return {
+        "agent_id": agent_id,
+        "resource_used": None,
+        "cost_paid": 0.0,
+        "reward_earned": 0.0,
+        "net_profit": amount,
+        "task_result": TOPUP
+    }
+
+# Every append also adds its rows to the epoch's kpi_counters row in the same
+# transaction, so the macro KPIs are exact for every worker without a ledger scan.
+COUNTERS = ("total_txs", "successful_txs", "failed_txs", "total_balance", "latency_sum", "latency_count")
+
+def counter_deltas(rows: Sequence[dict]) -> Dict[Optional[int], dict]:
+    """KPI increments of `rows` per epoch (None: rows stamped with the current epoch by default)."""
+    deltas: Dict[Optional[int], dict] = {}
+    for row in rows:
+        delta = deltas.setdefault(row.get("epoch"), dict.fromkeys(COUNTERS, 0))
+        result = row.get("task_result")
+        delta["total_balance"] += row.get("net_profit") or 0.0
+        if result not in BALANCE_EVENTS:
+            delta["total_txs"] += 1
+        if result == "SUCCESS":
+            delta["successful_txs"] += 1
+        elif result == "FAILURE":
+            delta["failed_txs"] += 1
+        if row.get("latency") is not None:
+            delta["latency_sum"] += row["latency"]
+            delta["latency_count"] += 1
+    return deltas
+
+def _counter_stmts(dialect_name: str, rows: Sequence[dict]) -> List:
+    counters = models.KPICounters
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmts = []
+    for epoch, delta in counter_deltas(rows).items():
+        stmt = dialect_insert(counters).values(epoch=current_epoch() if epoch is None else epoch, generation=1, **delta)
+        stmts.append(stmt.on_conflict_do_update(
+            index_elements=[counters.epoch],
+            set_={c: getattr(counters, c) + stmt.excluded[c] for c in COUNTERS + ("generation",)}
+        ))
+    return stmts
+
+def _insert_stmt(dialect_name: str, skip_existing: bool):
+    if not skip_existing:
+        return insert(models.LedgerTransaction)
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    return dialect_insert(models.LedgerTransaction).on_conflict_do_nothing(index_elements=["id"])
+
+def append_many(db: Session, rows: Sequence[dict], skip_existing: bool = False) -> None:
+    """
+    Bulk inserts the events (one executemany: every row needs the same keys)
+    and counts them in kpi_counters. `skip_existing` ignores rows whose id is
+    already stored (they are counted anyway: recount after such a replay).
+    """
+    if not rows:
+        return
+    dialect_name = db.get_bind().dialect.name
+    db.execute(_insert_stmt(dialect_name, skip_existing), list(rows))
+    for stmt in _counter_stmts(dialect_name, rows):
+        db.execute(stmt)
+
+async def append_many_async(db: AsyncSession, rows: Sequence[dict]) -> None:
+    if not rows:
+        return
+    dialect_name = db.get_bind().dialect.name
+    await db.execute(_insert_stmt(dialect_name, False), list(rows))
+    for stmt in _counter_stmts(dialect_name, rows):
+        await db.execute(stmt)
+
+def append(db: Session, row: dict) -> None:
+    """Inserts the event now (not at flush), so its id orders it before the caller's later rows."""
+    append_many(db, [row])
+
+async def append_async(db: AsyncSession, row: dict) -> None:
+    await append_many_async(db, [row])
@@ -1,7 +1,19 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index, LargeBinary, Text, select
 from sqlalchemy.sql import func
 from .database import Base
 
+class MarketEpoch(Base):
+    """One row per market reset: the current epoch is the highest id (0 before the first reset)."""
+    __tablename__ = "market_epochs"
+
+    id = Column(Integer, primary_key=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# Epoch stamped on rows inserted without an explicit one
+CURRENT_EPOCH = select(func.coalesce(func.max(MarketEpoch.id), 0)).scalar_subquery()
+
+
 class AgentRecord(Base):
     __tablename__ = "agent_records"
 
@@ -10,6 +22,8 @@ class AgentRecord(Base):
     skill_level = Column(Float, default=1.0)
     complexity = Column(Float, default=1.0)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Market epoch the wallet belongs to; rows from an earlier epoch are reset on first access
+    epoch = Column(Integer, nullable=False, server_default="0", default=CURRENT_EPOCH, index=True)
 
 
 class LedgerTransaction(Base):
@@ -23,6 +37,22 @@ class LedgerTransaction(Base):
     net_profit = Column(Float, default=0.0)
     task_result = Column(String)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    # Agent state after the event, only on events that change it (AGENT_OPENED, refactors)
+    skill_level = Column(Float, nullable=True)
+    complexity = Column(Float, nullable=True)
+    epoch = Column(Integer, nullable=False, server_default="0", default=CURRENT_EPOCH)
+    # L_real of task settlements in seconds (the dashboard's average system latency, shown in ms)
+    latency = Column(Float, nullable=True)
+
+    # Keyset pagination over (timestamp, id), globally and per filter column
+    __table_args__ = (
+        Index("ix_ledger_transactions_ts_id", "timestamp", "id"),
+        Index("ix_ledger_transactions_agent_ts_id", "agent_id", "timestamp", "id"),
+        Index("ix_ledger_transactions_resource_ts_id", "resource_used", "timestamp", "id"),
+        Index("ix_ledger_transactions_result_ts_id", "task_result", "timestamp", "id"),
+        # Current-epoch high-water mark and chunked purge of earlier epochs
+        Index("ix_ledger_transactions_epoch_id", "epoch", "id"),
+    )
 
 
 class MarketLog(Base):
@@ -33,3 +63,88 @@ class MarketLog(Base):
     dynamic_price = Column(Float, default=0.0)
     market_demand = Column(Float, default=0.0)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class MarketLogRollup(Base):
+    """OHLC price bars per resource at a fixed resolution (1s, 1m, 1h), downsampled from market_logs."""
+    __tablename__ = "market_log_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    resource_name = Column(String, nullable=False)
+    resolution = Column(String, nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    open = Column(Float, default=0.0)
+    high = Column(Float, default=0.0)
+    low = Column(Float, default=0.0)
+    close = Column(Float, default=0.0)
+    demand_sum = Column(Float, default=0.0)
+    samples = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index("ux_market_log_rollups_bucket", "resource_name", "resolution", "bucket_start", unique=True),
+    )
+
+
+class KPICounters(Base):
+    """
+    Macro KPI aggregates of one market epoch, shared by every worker: each
+    ledger append adds its rows in the same transaction (see `ledger.append`).
+    """
+    __tablename__ = "kpi_counters"
+
+    epoch = Column(Integer, primary_key=True)
+    total_txs = Column(Integer, nullable=False, default=0)
+    successful_txs = Column(Integer, nullable=False, default=0)
+    failed_txs = Column(Integer, nullable=False, default=0)
+    total_balance = Column(Float, nullable=False, default=0.0)
+    latency_sum = Column(Float, nullable=False, default=0.0)
+    latency_count = Column(Integer, nullable=False, default=0)
+    # Bumped by every change; versions the cached dashboard response
+    generation = Column(Integer, nullable=False, default=0)
+
+
+class AMMState(Base):
+    """Shared AMM price book (one row per resource) for multi-worker deployments."""
+    __tablename__ = "amm_state"
+
+    resource_name = Column(String, primary_key=True)
+    price = Column(Float, nullable=False)
+    demand = Column(Float, default=0.0)
+    version = Column(Integer, nullable=False, default=0)
+    published_at = Column(Float, nullable=False)  # epoch seconds, as in TickerSnapshot
+
+
+class AMMUsage(Base):
+    """Usage reported by every worker since the last shared AMM tick."""
+    __tablename__ = "amm_usage"
+
+    resource_name = Column(String, primary_key=True)
+    amount = Column(Float, nullable=False, default=0.0)
+
+
+class AMMLease(Base):
+    """Time-bounded lease electing the worker that runs the shared AMM tick."""
+    __tablename__ = "amm_leases"
+
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False, default="")
+    expires_at = Column(Float, nullable=False, default=0.0)
+
+
+class LedgerSnapshot(Base):
+    """
+    Compact state of every wallet (and the AMM prices) of `epoch` as of ledger id
+    `ledger_id`: replaying the epoch's ledger rows after it on top of the snapshot
+    rebuilds any later state.
+    """
+    __tablename__ = "ledger_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    epoch = Column(Integer, nullable=False, server_default="0")
+    ledger_id = Column(Integer, nullable=False, unique=True)
+    taken_at = Column(DateTime(timezone=True), nullable=False)
+    agent_count = Column(Integer, nullable=False, default=0)
+    total_balance = Column(Float, nullable=False, default=0.0)
+    amm_version = Column(Integer, nullable=True)
+    prices = Column(Text, nullable=False, default="{}")  # JSON {resource: price}
+    agents = Column(LargeBinary, nullable=False)  # zlib(JSON {agent_id: [wallet, skill, complexity]})
@@ -0,0 +1,101 @@
+from typing import Optional
+from sqlalchemy import case, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from . import models
+from .epochs import current_epoch
+
+# Atomic wallet statements: the funds check and the balance change run inside one
+# conditional UPDATE, so concurrent requests (threads or uvicorn workers) can
+# neither lose an update nor overdraw a wallet. Agents outside the current market
+# epoch (see `epochs`) do not exist for these statements.
+#
+# Each statement is built once and run by a sync function (threadpool handlers)
+# and its `_async` twin (`async def` handlers on the async engine).
+
+def _ensure_agent_stmt(dialect_name: str, agent_id: str, wallet_balance: float, skill_level: float, complexity: float):
+    agent = models.AgentRecord
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(agent).values(
+        id=agent_id, wallet_balance=wallet_balance, skill_level=skill_level, complexity=complexity, epoch=current_epoch()
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[agent.id],
+        set_={c: stmt.excluded[c] for c in ("wallet_balance", "skill_level", "complexity", "epoch")},
+        where=agent.epoch < stmt.excluded.epoch
+    )
+
+def _apply_delta_stmt(agent_id: str, delta: float, min_balance: Optional[float]):
+    agent = models.AgentRecord
+    stmt = update(agent).where(agent.id == agent_id, agent.epoch == current_epoch())
+    if min_balance is not None:
+        stmt = stmt.where(agent.wallet_balance >= min_balance)
+    return stmt.values(wallet_balance=agent.wallet_balance + delta).returning(agent.wallet_balance, agent.epoch)
+
+def _apply_refactor_stmt(agent_id: str, premium_cost: float, complexity_step: float, min_complexity: float, skill_step: float):
+    agent = models.AgentRecord
+    reduced = agent.complexity - complexity_step
+    return (
+        update(agent)
+        .where(agent.id == agent_id, agent.epoch == current_epoch(), agent.wallet_balance >= premium_cost)
+        .values(
+            wallet_balance=agent.wallet_balance - premium_cost,
+            complexity=case((reduced > min_complexity, reduced), else_=min_complexity),
+            skill_level=agent.skill_level + skill_step
+        )
+        .returning(agent.wallet_balance, agent.complexity, agent.skill_level, agent.epoch)
+    )
+
+def _get_agent_stmt(agent_id: str):
+    agent = models.AgentRecord
+    return select(agent).where(agent.id == agent_id, agent.epoch == current_epoch())
+
+def ensure_agent(db: Session, agent_id: str, wallet_balance: float, skill_level: float, complexity: float) -> bool:
+    """
+    Inserts the agent unless it already exists in the current epoch (a wallet
+    left over from an earlier epoch is reset to the given state instead).
+    Returns True if this call created or reset it.
+    """
+    stmt = _ensure_agent_stmt(db.get_bind().dialect.name, agent_id, wallet_balance, skill_level, complexity)
+    return db.execute(stmt).rowcount == 1
+
+async def ensure_agent_async(db: AsyncSession, agent_id: str, wallet_balance: float, skill_level: float, complexity: float) -> bool:
+    stmt = _ensure_agent_stmt(db.get_bind().dialect.name, agent_id, wallet_balance, skill_level, complexity)
+    return (await db.execute(stmt)).rowcount == 1
+
+def apply_delta(db: Session, agent_id: str, delta: float, min_balance: Optional[float] = None) -> Optional[Row]:
+    """
+    `UPDATE ... SET wallet_balance = wallet_balance + :delta WHERE id = :id
+    [AND wallet_balance >= :min_balance] RETURNING wallet_balance, epoch`.
+    Returns None when the agent does not exist (in the current epoch) or the
+    funds check failed.
+    """
+    return db.execute(_apply_delta_stmt(agent_id, delta, min_balance)).first()
+
+async def apply_delta_async(db: AsyncSession, agent_id: str, delta: float, min_balance: Optional[float] = None) -> Optional[Row]:
+    return (await db.execute(_apply_delta_stmt(agent_id, delta, min_balance))).first()
+
+def apply_refactor(db: Session, agent_id: str, premium_cost: float,
+                   complexity_step: float = 1.5, min_complexity: float = 1.0, skill_step: float = 1.0) -> Optional[Row]:
+    """Charges the refactor premium and improves the agent in one conditional UPDATE."""
+    return db.execute(_apply_refactor_stmt(agent_id, premium_cost, complexity_step, min_complexity, skill_step)).first()
+
+async def apply_refactor_async(db: AsyncSession, agent_id: str, premium_cost: float,
+                               complexity_step: float = 1.5, min_complexity: float = 1.0, skill_step: float = 1.0) -> Optional[Row]:
+    stmt = _apply_refactor_stmt(agent_id, premium_cost, complexity_step, min_complexity, skill_step)
+    return (await db.execute(stmt)).first()
+
+def get_agent(db: Session, agent_id: str) -> Optional[models.AgentRecord]:
+    """The agent's record if it belongs to the current epoch."""
+    return db.execute(_get_agent_stmt(agent_id)).scalars().first()
+
+async def get_agent_async(db: AsyncSession, agent_id: str) -> Optional[models.AgentRecord]:
+    return (await db.execute(_get_agent_stmt(agent_id))).scalars().first()
+
+def agent_exists(db: Session, agent_id: str) -> bool:
+    return get_agent(db, agent_id) is not None
+
+async def agent_exists_async(db: AsyncSession, agent_id: str) -> bool:
+    return await get_agent_async(db, agent_id) is not None
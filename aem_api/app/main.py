@@ -1,15 +1,109 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .db.database import engine
+from sqlalchemy import inspect
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from .db.database import engine, SessionLocal, async_engine, AsyncSessionLocal
 from .db import models
-from .api.endpoints import market, agents, devops, dashboard
+from .core import kpis
+from .core.scheduler import run_price_ticks, run_ledger_snapshots, run_epoch_purge
+from .core.event_store import SNAPSHOT_INTERVAL_SECONDS
+from .core.ticker_stream import ticker_broadcaster
+from .core.price_history import price_history
+from .core.wallet_cache import wallet_cache
+from .core.metrics import MetricsMiddleware, instrument_database
+from .api.endpoints import market, agents, devops, dashboard, metrics
 
-# Crea las tablas de la base de datos de manera automática
-models.Base.metadata.create_all(bind=engine)
+def upgrade_schema() -> None:
+    """
+    create_all no altera tablas existentes: añade con ALTER TABLE las columnas
+    nuevas de los modelos y después crea sus índices que falten (los compuestos
+    del ledger y los de epoch), sin los que una base actualizada recorre la tabla
+    entera. Las columnas deben ser nullable o llevar un server_default constante,
+    que SQLite y PostgreSQL aplican sin reescribir la tabla.
+    """
+    inspector = inspect(engine)
+    for table in models.Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+            if column.server_default is not None:
+                ddl += f" NOT NULL DEFAULT {column.server_default.arg}" if not column.nullable else f" DEFAULT {column.server_default.arg}"
+            elif not column.nullable:
+                raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} without a server default")
+            with engine.begin() as conn:
+                conn.exec_driver_sql(ddl)
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def create_schema(attempts: int = 5) -> None:
+    """
+    Crea las tablas de la base de datos de manera automática.
+    Con `uvicorn --workers N` varios procesos lo hacen a la vez: si otro worker
+    gana la carrera, el reintento ya encuentra las tablas e índices creados
+    (PostgreSQL la señala como ProgrammingError, SQLite como OperationalError).
+    """
+    for attempt in range(attempts):
+        try:
+            models.Base.metadata.create_all(bind=engine)
+            upgrade_schema()
+            return
+        except (OperationalError, ProgrammingError):
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.1 * (attempt + 1))
+
+create_schema()
+
+# Tiempos de consultas y commits para /metrics
+instrument_database(engine, SessionLocal)
+instrument_database(async_engine.sync_engine, AsyncSessionLocal.kw["sync_session_class"])
+
+def load_kpis(recount: bool = False) -> None:
+    # Los KPIs materializados persisten en kpi_counters: solo se escanea el ledger
+    # si faltan (base de datos anterior) o si el journal pudo reescribir filas
+    with SessionLocal() as db:
+        if recount:
+            kpis.recount(db)
+        else:
+            kpis.ensure_counters(db)
+
+if wallet_cache is None:
+    load_kpis()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if wallet_cache is not None:
+        # Reaplica el journal pendiente antes de leer el ledger
+        wallet_cache.start()
+        load_kpis(recount=True)
+    # Bucle de ticks del AMM: el único lugar donde se recalculan los precios
+    ticker_broadcaster.attach(asyncio.get_running_loop())
+    tick_task = asyncio.create_task(run_price_ticks())
+    # Snapshots periódicos del ledger para reconstruir cualquier estado sin releer todo el historial
+    snapshot_task = asyncio.create_task(run_ledger_snapshots()) if SNAPSHOT_INTERVAL_SECONDS > 0 else None
+    # Purga por lotes de las filas de épocas anteriores a un reset del mercado
+    purge_task = asyncio.create_task(run_epoch_purge())
+    try:
+        yield
+    finally:
+        tick_task.cancel()
+        purge_task.cancel()
+        if snapshot_task is not None:
+            snapshot_task.cancel()
+        price_history.flush()
+        if wallet_cache is not None:
+            wallet_cache.stop()
+        await async_engine.dispose()
 
 app = FastAPI(
     title="AEM Microservice (Agentic Economic Market Central Bank)",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configuración CORS
@@ -19,13 +113,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Inclusión de cada router con su ruta base respectiva
 app.include_router(market.router, prefix="/api/v1/market", tags=["Market"])
 app.include_router(agents.router, prefix="/api/v1/agents", tags=["Agents"])
 app.include_router(devops.router, prefix="/api/v1/devops", tags=["DevOps"])
 app.include_router(dashboard.router, prefix="/api/v1/dashboard", tags=["Dashboard"])
+app.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
 
 @app.get("/")
 def root():
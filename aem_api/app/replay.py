@@ -0,0 +1,76 @@
+"""
+Ledger replay tool: rebuilds wallet state from the nearest snapshot plus the
+ledger rows after it.
+
+    cd aem_api
+    python -m app.replay restore                        # state at the ledger head
+    python -m app.replay restore --at 2026-10-18T12:00:00 --output state.json
+    python -m app.replay restore --ledger-id 125000 --apply
+    python -m app.replay verify
+    python -m app.replay snapshot
+
+Runs against AEM_DATABASE_URL (a database the API has already started on).
+`--apply` rewinds the database to that point (wallets rewritten, later
+ledger rows and snapshots deleted): stop the API first.
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from .db.database import SessionLocal
+from .core import kpis
+from .core.event_store import apply_restore, prices_at, restore, take_snapshot, verify
+from .core.wallet_cache import utc_now
+
+def _summary(result, elapsed: float) -> dict:
+    return {
+        "epoch": result.epoch,
+        "ledger_id": result.ledger_id,
+        "snapshot_id": result.snapshot_id,
+        "events_applied": result.events_applied,
+        "orphan_events": result.orphan_events,
+        "agents": len(result.agents),
+        "total_balance": round(result.total_balance, 6),
+        "prices": result.prices,
+        "elapsed_seconds": round(elapsed, 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Restore or verify AEM wallet state from the ledger")
+    commands = parser.add_subparsers(dest="command", required=True)
+    restore_cmd = commands.add_parser("restore", help="State at a ledger id or timestamp (head by default)")
+    point = restore_cmd.add_mutually_exclusive_group()
+    point.add_argument("--ledger-id", type=int)
+    point.add_argument("--at", type=datetime.fromisoformat, help="UTC timestamp (ISO 8601)")
+    restore_cmd.add_argument("--output", help="Write every agent's state to this JSON file")
+    restore_cmd.add_argument("--apply", action="store_true", help="Rewind the database to that point")
+    commands.add_parser("verify", help="Compare agent_records with the ledger replayed to its head")
+    commands.add_parser("snapshot", help="Take a ledger snapshot now")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.command == "snapshot":
+            snapshot = take_snapshot(db, prices_at(db, utc_now(), {}))
+            print(json.dumps({"snapshot_ledger_id": snapshot.ledger_id if snapshot else None}))
+            return
+
+        if args.command == "verify":
+            mismatches = verify(db)
+            print(json.dumps({"mismatches": len(mismatches), "agents": mismatches[:20]}, indent=2))
+            sys.exit(1 if mismatches else 0)
+
+        started = time.perf_counter()
+        result = restore(db, ledger_id=args.ledger_id, at=args.at)
+        summary = _summary(result, time.perf_counter() - started)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(dict(summary, agents=result.agents), f)
+        if args.apply:
+            apply_restore(db, result)
+            kpis.recount(db)
+            summary["applied"] = True
+        print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class SettleRequest(BaseModel):
     resource_used: str
@@ -9,6 +9,12 @@ class SettleRequest(BaseModel):
     task_quality_q: float
     is_failure: bool
 
+class BatchSettleItem(SettleRequest):
+    agent_id: str
+
+class BatchSettleRequest(BaseModel):
+    items: List[BatchSettleItem] = Field(..., min_length=1, max_length=5000)
+
 class RefactorRequest(BaseModel):
     agent_id: str
 
@@ -27,7 +33,7 @@ class AgentResponse(AgentBase):
 class LedgerTransactionResponse(BaseModel):
     id: int
     agent_id: str
-    resource_used: str
+    resource_used: Optional[str]  # None on balance events (AGENT_OPENED, TOPUP)
     cost_paid: float
     reward_earned: float
     net_profit: float
@@ -41,3 +47,13 @@ class MarketTickerResponse(BaseModel):
     resource_name: str
     dynamic_price: float
     market_demand: float
+
+class PriceHistoryPoint(BaseModel):
+    resource_name: str
+    bucket_start: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    avg_demand: float
+    samples: int
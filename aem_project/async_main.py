@@ -0,0 +1,58 @@
+import asyncio
+import sys
+
+from core.state import AgenticState, AgentEvent
+from core.market import AutomatedMarketMaker
+from core.ticker_cache import TickerCache
+from core.rng import RngStreams
+from core.bandits import make_policy
+from graph.builder import build_async_aem_graph
+from graph.async_nodes import create_async_client
+from graph.nodes import API_BASE_URL
+
+async def main(n_agents: int = 100):
+    print(f"🚀 Iniciando Simulación AEM Async ({n_agents} agentes concurrentes)...")
+    print("-" * 50)
+
+    amm = AutomatedMarketMaker(
+        base_prices={"GPT-3.5": 0.5, "GPT-4o": 5.0, "Refactor_DevOps_Resource": 15.0},
+        capacities={"GPT-3.5": 100.0, "GPT-4o": 10.0, "Refactor_DevOps_Resource": 2.0}
+    )
+    ticker_cache = TickerCache(API_BASE_URL).start()
+    ticker_cache.wait_ready(timeout=2.0)
+
+    # Streams aleatorios por agente: AEM_SEED=<semilla> reproduce la corrida
+    rng_streams = RngStreams.from_env()
+    print(f"🎲 Semilla raíz: {rng_streams.root_seed}")
+    # Política de los agentes: AEM_POLICY=softmax|ucb|thompson|exp3 (aprenden de cada /settle)
+    policy = make_policy(resources=list(amm.base_prices))
+
+    async with create_async_client() as client:
+        app = build_async_aem_graph(amm, client, ticker_cache, rng_streams, policy)
+        initial_states = [
+            AgenticState(
+                agent_id=f"Agent_{i:05d}",
+                agent_wallet=35.0,
+                skill_level=3.0,
+                complexity=5.0,
+                current_task={"type": "presupuesto_concierge", "data": "Extraer variables financieras"},
+                metrics={},
+                market_ticker=amm.base_prices.copy(),
+                task_count=0,
+                history=(AgentEvent("Inicio", "Agente instanciado en el mercado."),)
+            )
+            for i in range(n_agents)
+        ]
+        final_states = await asyncio.gather(*(app.ainvoke(state) for state in initial_states))
+    ticker_cache.stop()
+
+    wallets = [s["agent_wallet"] for s in final_states]
+    bankrupt = sum(1 for w in wallets if w <= 0.0)
+    print(f"\n🏦 Agentes: {len(wallets)} | Quiebras: {bankrupt} | Wallet medio: {sum(wallets) / len(wallets):.2f} Tk")
+    summary = policy.stats.summary()
+    print(f"🎯 Política {type(policy).__name__}: regret acumulado={summary['cumulative_regret']:.1f} Tk "
+          f"(medio por agente={summary['mean_regret']:.2f} Tk)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(a) for a in sys.argv[1:2])))
@@ -0,0 +1,32 @@
+import sys
+
+from core.market import AutomatedMarketMaker
+from core.bandits import make_policy
+from core.batch_engine import BASE_PRICES, CAPACITIES, BatchAgents, BatchMarketSimulator
+
+def main(n_agents: int = 10_000, ticks: int = 20):
+    print(f"🚀 Iniciando Simulación AEM Vectorizada ({n_agents} agentes)...")
+    print("-" * 50)
+
+    amm = AutomatedMarketMaker(base_prices=dict(BASE_PRICES), capacities=dict(CAPACITIES))
+    # Política de los agentes: AEM_POLICY=softmax|ucb|thompson|exp3
+    policy = make_policy(resources=list(amm.base_prices))
+    simulator = BatchMarketSimulator(amm, BatchAgents.uniform(n_agents), policy=policy)
+
+    for stats in simulator.run(ticks):
+        prices = ", ".join(f"{r}={p:.2f}" for r, p in stats.prices.items())
+        print(
+            f" -> Tick {stats.tick}: Activos={stats.active_agents}, Quiebras={stats.bankruptcies}, "
+            f"Fallos={stats.failures}, Refactors={stats.refactors}, Wallet medio={stats.mean_wallet:.2f}, Regret={stats.regret:.1f} | {prices}"
+        )
+
+    print("-" * 50)
+    alive = simulator.agents.alive
+    print(f"\n🏦 Agentes activos al final: {int(alive.sum())}/{n_agents}")
+    summary = policy.stats.summary()
+    print(f"🎯 Política {type(policy).__name__}: regret acumulado={summary['cumulative_regret']:.1f} "
+          f"({summary['regret_per_play']:.3f} por tarea, {summary['bytes_per_agent']} B/agente)")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,288 @@
+import os
+import random
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Hashable, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.policy import EXPECTED_REWARDS, TAU, SoftmaxPolicy, Ticker, price_vector
+
+# Política de los agentes: softmax | ucb | thompson | exp3
+POLICY_NAME = os.getenv("AEM_POLICY", "softmax")
+# Rango de la recompensa bruta R de la ecuación AEM: -P_FAIL (fallo) .. T_BASE
+REWARD_RANGE = (-15.0, 25.0)
+
+
+class BanditStats:
+    """
+    Estadísticas por agente y recurso en arrays NumPy de N x K: número de
+    elecciones liquidadas, suma de recompensas brutas (R) y suma de utilidades
+    (net_profit = R - precio pagado). La memoria por agente es O(K) y no crece
+    con el número de tareas; las filas se duplican al agotarse.
+
+    Los agentes del grafo se identifican por su agent_id (`row` les asigna
+    fila); el motor vectorizado direcciona directamente por fila (`reserve`).
+    """
+    def __init__(self, resources: Sequence[str], capacity: int = 64):
+        self.resources: Tuple[str, ...] = tuple(resources)
+        self.index: Dict[str, int] = {r: i for i, r in enumerate(self.resources)}
+        self.rows: Dict[Hashable, int] = {}
+        self.size = 0
+        self.lock = threading.Lock()
+        self._arrays = []
+        self.capacity = max(capacity, 1)
+        self.counts = self.add_array("counts", dtype=np.int64)
+        self.reward_sums = self.add_array("reward_sums")
+        self.utility_sums = self.add_array("utility_sums")
+
+    def add_array(self, name: str, dtype=np.float64) -> np.ndarray:
+        """Registra un array N x K más (p. ej. los pesos de EXP3) que crece con los demás."""
+        array = np.zeros((self.capacity, len(self.resources)), dtype=dtype)
+        setattr(self, name, array)
+        self._arrays.append(name)
+        return array
+
+    def _grow(self, n: int) -> None:
+        if n <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < n:
+            capacity *= 2
+        for name in self._arrays:
+            old = getattr(self, name)
+            array = np.zeros((capacity, old.shape[1]), dtype=old.dtype)
+            array[:self.capacity] = old
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def reserve(self, n: int) -> None:
+        """Asegura las filas 0..n-1 (motor vectorizado: fila = índice del agente)."""
+        with self.lock:
+            self._grow(n)
+            self.size = max(self.size, n)
+
+    def row(self, agent_id: Hashable) -> int:
+        row = self.rows.get(agent_id)
+        if row is None:
+            with self.lock:
+                row = self.rows.get(agent_id)
+                if row is None:
+                    row = self.size
+                    self._grow(row + 1)
+                    self.size = row + 1
+                    self.rows[agent_id] = row
+        return row
+
+    def update(self, agent_id: Hashable, resource: str, reward: float, utility: float) -> Tuple[int, int]:
+        """Suma una liquidación a las estadísticas del agente; devuelve (fila, recurso)."""
+        row, arm = self.row(agent_id), self.index[resource]
+        # Bajo el lock: un crecimiento concurrente no puede perder la actualización
+        with self.lock:
+            self.counts[row, arm] += 1
+            self.reward_sums[row, arm] += reward
+            self.utility_sums[row, arm] += utility
+        return row, arm
+
+    def cells(self, rows: np.ndarray, arms: np.ndarray) -> np.ndarray:
+        """Índices planos (fila, recurso) en los arrays N x K: np.add.at es mucho más rápido en 1-D."""
+        return rows * len(self.resources) + arms
+
+    def update_many(self, rows: np.ndarray, arms: np.ndarray, rewards: np.ndarray, utilities: np.ndarray) -> None:
+        """Versión vectorizada de `update` por filas (admite filas repetidas)."""
+        cells = self.cells(rows, arms)
+        with self.lock:
+            np.add.at(self.counts.reshape(-1), cells, 1)
+            np.add.at(self.reward_sums.reshape(-1), cells, rewards)
+            np.add.at(self.utility_sums.reshape(-1), cells, utilities)
+
+    def regrets(self) -> np.ndarray:
+        """
+        Regret empírico acumulado de cada agente (§9.3): lo que habría ganado
+        jugando siempre su mejor recurso (la mayor utilidad media observada)
+        menos la utilidad que obtuvo, n * max_k u_k - sum(u).
+        """
+        counts = self.counts[:self.size]
+        utility_sums = self.utility_sums[:self.size]
+        plays = counts.sum(axis=1)
+        means = np.where(counts > 0, utility_sums / np.maximum(counts, 1), -np.inf)
+        best = means.max(axis=1) if self.resources else np.zeros(self.size)
+        return np.where(plays > 0, plays * best - utility_sums.sum(axis=1), 0.0)
+
+    def regret(self, agent_id: Hashable) -> float:
+        row = self.rows.get(agent_id)
+        return float(self.regrets()[row]) if row is not None else 0.0
+
+    def cumulative_regret(self) -> float:
+        return float(self.regrets().sum())
+
+    def summary(self) -> Dict[str, float]:
+        regrets = self.regrets()
+        plays = int(self.counts[:self.size].sum())
+        return {
+            "agents": self.size,
+            "plays": plays,
+            "cumulative_regret": float(regrets.sum()),
+            "mean_regret": float(regrets.mean()) if self.size else 0.0,
+            "regret_per_play": float(regrets.sum() / plays) if plays else 0.0,
+            "bytes_per_agent": sum(getattr(self, name).itemsize for name in self._arrays) * len(self.resources)
+        }
+
+
+class BanditPolicy(ABC):
+    """
+    Base de las políticas que aprenden de las liquidaciones: cada agente elige
+    con sus propias estadísticas (`stats`) y el nodo evaluador le devuelve la
+    recompensa y el net_profit de /settle con `observe`.
+
+    Misma interfaz que SoftmaxPolicy: `choose` para los nodos del grafo y
+    `choose_indices` / `observe_many` para el motor vectorizado.
+    """
+    def __init__(self, resources: Optional[Sequence[str]] = None,
+                 expected_rewards: Optional[Mapping[str, float]] = None,
+                 reward_range: Tuple[float, float] = REWARD_RANGE):
+        rewards = expected_rewards or EXPECTED_REWARDS
+        self.resources: Tuple[str, ...] = tuple(resources or rewards)
+        self.expected_rewards = np.array([rewards.get(r, 0.0) for r in self.resources])
+        self.reward_range = reward_range
+        self.stats = BanditStats(self.resources)
+
+    @property
+    def reward_width(self) -> float:
+        return self.reward_range[1] - self.reward_range[0]
+
+    def choose(self, ticker: Ticker, rng=random, agent_id: Optional[Hashable] = None) -> str:
+        row = self.stats.row(agent_id)
+        return self.resources[self._choose_row(row, price_vector(self.resources, ticker), rng)]
+
+    def observe(self, agent_id: Hashable, resource: str, reward: float, utility: float) -> None:
+        row, arm = self.stats.update(agent_id, resource, reward, utility)
+        self._learn(np.array([row]), np.array([arm]), np.array([utility], dtype=float))
+
+    def observe_many(self, rows: np.ndarray, arms: np.ndarray, rewards: np.ndarray, utilities: np.ndarray) -> None:
+        self.stats.update_many(rows, arms, rewards, utilities)
+        self._learn(rows, arms, utilities)
+
+    @abstractmethod
+    def _choose_row(self, row: int, prices: np.ndarray, rng) -> int:
+        """Índice del recurso que elige el agente de la fila `row` (nodos del grafo)."""
+
+    @abstractmethod
+    def choose_indices(self, rows: np.ndarray, prices: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Índices de recurso para un lote de filas (motor vectorizado)."""
+
+    def _learn(self, rows: np.ndarray, arms: np.ndarray, utilities: np.ndarray) -> None:
+        """Estado propio de la política además de los contadores (EXP3)."""
+
+
+class UCBPolicy(BanditPolicy):
+    """
+    UCB1: cada recurso sin probar primero; después el de mayor
+    media(R) - precio + c * ancho(R) * sqrt(2 ln t / n). La recompensa bruta se
+    aprende y el precio del ticker se resta en cada elección, porque el AMM lo
+    mueve y es conocido.
+    """
+    def __init__(self, resources: Optional[Sequence[str]] = None, exploration: float = 1.0, **kwargs):
+        super().__init__(resources, **kwargs)
+        self.exploration = exploration
+
+    def _scores(self, counts: np.ndarray, reward_sums: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        plays = np.maximum(counts.sum(axis=-1, keepdims=True), 1)
+        n = np.maximum(counts, 1)
+        bonus = self.exploration * self.reward_width * np.sqrt(2.0 * np.log(plays) / n)
+        return np.where(counts == 0, np.inf, reward_sums / n - prices + bonus)
+
+    def _choose_row(self, row: int, prices: np.ndarray, rng) -> int:
+        stats = self.stats
+        return int(np.argmax(self._scores(stats.counts[row], stats.reward_sums[row], prices)))
+
+    def choose_indices(self, rows: np.ndarray, prices: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        stats = self.stats
+        return np.argmax(self._scores(stats.counts[rows], stats.reward_sums[rows], prices), axis=1)
+
+
+class ThompsonPolicy(BanditPolicy):
+    """
+    Thompson sampling gaussiano sobre la recompensa media de cada recurso:
+    a priori E[R] (EXPECTED_REWARDS) con peso de una observación; la posterior
+    tiene media (E[R] + suma(R)) / (n + 1) y desviación noise_std / sqrt(n + 1).
+    Elige el recurso de mayor muestra - precio.
+    """
+    def __init__(self, resources: Optional[Sequence[str]] = None, noise_std: Optional[float] = None, **kwargs):
+        super().__init__(resources, **kwargs)
+        self.noise_std = noise_std if noise_std is not None else self.reward_width / 4.0
+
+    def _posterior(self, counts: np.ndarray, reward_sums: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        n = counts + 1.0
+        return (self.expected_rewards + reward_sums) / n, self.noise_std / np.sqrt(n)
+
+    def _choose_row(self, row: int, prices: np.ndarray, rng) -> int:
+        mean, std = self._posterior(self.stats.counts[row], self.stats.reward_sums[row])
+        noise = np.array([rng.gauss(0.0, 1.0) for _ in self.resources])
+        return int(np.argmax(mean + std * noise - prices))
+
+    def choose_indices(self, rows: np.ndarray, prices: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        mean, std = self._posterior(self.stats.counts[rows], self.stats.reward_sums[rows])
+        return np.argmax(mean + std * rng.standard_normal(mean.shape) - prices, axis=1)
+
+
+class EXP3Policy(BanditPolicy):
+    """
+    EXP3 (bandido adversarial) sobre la utilidad net_profit normalizada a
+    [0, 1] con el rango de R: p = (1 - gamma) * softmax(log w) + gamma / K y
+    log w_k += gamma * u / (p_k * K) para el recurso liquidado. No supone
+    recompensas estacionarias, así que tolera precios que el AMM mueve.
+    """
+    def __init__(self, resources: Optional[Sequence[str]] = None, gamma: float = 0.1, **kwargs):
+        super().__init__(resources, **kwargs)
+        self.gamma = gamma
+        self.stats.add_array("log_weights")
+
+    def _probabilities(self, log_weights: np.ndarray) -> np.ndarray:
+        w = np.exp(log_weights - log_weights.max(axis=-1, keepdims=True))
+        k = len(self.resources)
+        return (1.0 - self.gamma) * w / w.sum(axis=-1, keepdims=True) + self.gamma / k
+
+    def probabilities(self, agent_id: Hashable) -> Dict[str, float]:
+        probs = self._probabilities(self.stats.log_weights[self.stats.row(agent_id)])
+        return dict(zip(self.resources, probs.tolist()))
+
+    def _choose_row(self, row: int, prices: np.ndarray, rng) -> int:
+        cdf = np.cumsum(self._probabilities(self.stats.log_weights[row]))
+        return min(int(np.searchsorted(cdf, rng.random() * cdf[-1], side="right")), len(self.resources) - 1)
+
+    def choose_indices(self, rows: np.ndarray, prices: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        cdf = np.cumsum(self._probabilities(self.stats.log_weights[rows]), axis=1)
+        u = rng.random(len(rows)) * cdf[:, -1]
+        return np.minimum((cdf <= u[:, None]).sum(axis=1), len(self.resources) - 1)
+
+    def _learn(self, rows: np.ndarray, arms: np.ndarray, utilities: np.ndarray) -> None:
+        lo, _ = self.reward_range
+        x = np.clip((utilities - lo) / self.reward_width, 0.0, 1.0)
+        k = len(self.resources)
+        cells = self.stats.cells(rows, arms)
+        with self.stats.lock:
+            log_weights = self.stats.log_weights
+            p = self._probabilities(log_weights[rows])[np.arange(len(rows)), arms]
+            np.add.at(log_weights.reshape(-1), cells, self.gamma * x / (p * k))
+            # Solo importan las diferencias: se recentran para no desbordar
+            log_weights[rows] -= log_weights[rows].max(axis=1, keepdims=True)
+
+
+BANDIT_POLICIES = {"ucb": UCBPolicy, "thompson": ThompsonPolicy, "exp3": EXP3Policy}
+
+
+def make_policy(name: Optional[str] = None, resources: Optional[Sequence[str]] = None,
+                expected_rewards: Optional[Mapping[str, float]] = None, tau: float = TAU, **kwargs):
+    """
+    Construye la política `name` (AEM_POLICY por defecto). Softmax se crea con
+    un BanditStats para medir su regret igual que el de las que aprenden.
+    """
+    name = (name or POLICY_NAME).lower()
+    if name == "softmax":
+        policy = SoftmaxPolicy(expected_rewards, tau, resources)
+        policy.stats = BanditStats(policy.resources)
+        return policy
+    if name not in BANDIT_POLICIES:
+        raise ValueError(f"Política desconocida: {name} (opciones: softmax, {', '.join(BANDIT_POLICIES)})")
+    return BANDIT_POLICIES[name](resources, expected_rewards=expected_rewards, **kwargs)
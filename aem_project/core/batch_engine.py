@@ -0,0 +1,210 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.market import AutomatedMarketMaker
+from core.policy import EXPECTED_REWARDS, TAU, SoftmaxPolicy
+
+# Constantes compartidas con los nodos del grafo (operative/evaluator) y con la API central
+# Rangos (min, max) de consumo real C_real y latencia L_real por recurso
+COST_RANGES = {
+    "GPT-3.5": (1.0, 3.0),
+    "GPT-4o": (5.0, 10.0),
+    "Refactor_DevOps_Resource": (15.0, 20.0)
+}
+LATENCY_RANGES = {
+    "GPT-3.5": (0.5, 1.5),
+    "GPT-4o": (1.0, 3.0),
+    "Refactor_DevOps_Resource": (3.0, 6.0)
+}
+PREMIUM_RESOURCE = "GPT-4o"
+# Mercado por defecto de las simulaciones locales
+BASE_PRICES = {"GPT-3.5": 0.5, "GPT-4o": 5.0, "Refactor_DevOps_Resource": 15.0}
+CAPACITIES = {"GPT-3.5": 100.0, "GPT-4o": 10.0, "Refactor_DevOps_Resource": 2.0}
+REFACTOR_RESOURCE = "Refactor_DevOps_Resource"
+
+# Ecuación de recompensa AEM (idéntica a settle_transaction en la API)
+T_BASE = 25.0
+ALPHA, BETA, GAMMA = 0.5, 0.3, 0.2
+C_MAX = 20.0
+L_MAX = 6.0
+P_FAIL = 15.0
+
+
+@dataclass
+class TickStats:
+    """Resumen agregado de un tick del motor vectorizado."""
+    tick: int
+    active_agents: int
+    bankruptcies: int
+    failures: int
+    refactors: int
+    usage: Dict[str, float]
+    prices: Dict[str, float]
+    mean_wallet: float
+    # Regret acumulado de la flota (None si la política no lleva estadísticas)
+    regret: Optional[float] = None
+
+
+@dataclass
+class BatchAgents:
+    """
+    Estado columnar de N agentes: cada atributo del AgenticState
+    que interviene en la simulación es un vector NumPy de longitud N.
+    """
+    wallet: np.ndarray
+    skill_level: np.ndarray
+    complexity: np.ndarray
+    alive: np.ndarray
+    task_count: Optional[np.ndarray] = None
+
+    def __post_init__(self):
+        if self.task_count is None:
+            self.task_count = np.zeros(self.wallet.shape[0], dtype=np.int64)
+
+    @classmethod
+    def uniform(cls, n_agents: int, wallet: float = 35.0, skill_level: float = 3.0, complexity: float = 5.0) -> "BatchAgents":
+        """Crea N agentes idénticos al estado inicial de main.py."""
+        return cls(
+            wallet=np.full(n_agents, wallet, dtype=np.float64),
+            skill_level=np.full(n_agents, skill_level, dtype=np.float64),
+            complexity=np.full(n_agents, complexity, dtype=np.float64),
+            alive=np.ones(n_agents, dtype=bool)
+        )
+
+    def __len__(self) -> int:
+        return self.wallet.shape[0]
+
+
+class BatchMarketSimulator:
+    """
+    Motor de simulación vectorizado:
+    Ejecuta el ciclo operative -> evaluator -> (devops) -> broker para todos los
+    agentes a la vez, compitiendo por el mismo AutomatedMarketMaker. Cada tick
+    aplica la política (Softmax por defecto), el modelo de calidad/fallo y la
+    ecuación de recompensa como operaciones NumPy sobre el lote completo.
+    Una política de `core.bandits` usa la fila de cada agente en sus
+    estadísticas y aprende de las liquidaciones del tick.
+    """
+    def __init__(
+        self,
+        amm: AutomatedMarketMaker,
+        agents: BatchAgents,
+        expected_rewards: Optional[Dict[str, float]] = None,
+        tau: float = TAU,
+        seed: Optional[int] = None,
+        policy=None
+    ):
+        self.amm = amm
+        self.agents = agents
+        self.tau = tau
+        self.rng = np.random.default_rng(seed)
+        self.tick_count = 0
+
+        # Índice estable de recursos, en el orden del AMM
+        self.resources: List[str] = list(amm.base_prices.keys())
+        self.policy = policy or SoftmaxPolicy(expected_rewards or EXPECTED_REWARDS, tau, self.resources)
+        if tuple(self.policy.resources) != tuple(self.resources):
+            raise ValueError(f"La política debe usar los recursos del AMM en su orden: {self.resources}")
+        self.expected_rewards = self.policy.expected_rewards
+        if getattr(self.policy, "stats", None) is not None:
+            self.policy.stats.reserve(len(agents))
+        self.cost_lo, self.cost_hi = self._range_vectors(COST_RANGES)
+        self.latency_lo, self.latency_hi = self._range_vectors(LATENCY_RANGES)
+        self.quality_multiplier = np.where(np.array(self.resources) == PREMIUM_RESOURCE, 1.2, 1.0)
+        self.fail_multiplier = np.where(np.array(self.resources) == PREMIUM_RESOURCE, 0.5, 1.0)
+        self.refactor_idx = self.resources.index(REFACTOR_RESOURCE) if REFACTOR_RESOURCE in self.resources else -1
+
+    def _range_vectors(self, ranges: Dict[str, Tuple[float, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        # Los recursos desconocidos usan el rango del recurso de refactorización (rama `else` del nodo)
+        default = ranges[REFACTOR_RESOURCE]
+        lo = np.array([ranges.get(r, default)[0] for r in self.resources])
+        hi = np.array([ranges.get(r, default)[1] for r in self.resources])
+        return lo, hi
+
+    def prices(self) -> np.ndarray:
+        return np.array([self.amm.current_prices[r] for r in self.resources])
+
+    def choice_probabilities(self, prices: np.ndarray) -> np.ndarray:
+        """Política Softmax sobre la utilidad esperada E[R] - Precio (solo con SoftmaxPolicy)."""
+        return self.policy.distribution(prices).probs
+
+    def step(self) -> TickStats:
+        """Ejecuta una tarea para cada agente activo y actualiza el AMM con la demanda agregada."""
+        agents = self.agents
+        idx = np.flatnonzero(agents.alive)
+        n = idx.shape[0]
+        prices = self.prices()
+
+        # 1. Nodo operativo: la política elige por agente (Softmax: método alias, igual que el nodo)
+        choice = self.policy.choose_indices(idx, prices, self.rng)
+        c_real = self.rng.uniform(self.cost_lo[choice], self.cost_hi[choice])
+        l_real = self.rng.uniform(self.latency_lo[choice], self.latency_hi[choice])
+        cost = prices[choice]
+
+        # 2. Nodo evaluador: calidad Q y probabilidad de fallo
+        skill = agents.skill_level[idx]
+        complexity = agents.complexity[idx]
+        q_base = (skill / (complexity + 0.1)) * self.quality_multiplier[choice]
+        q = np.clip(q_base + self.rng.uniform(-0.1, 0.1, n), 0.0, 1.0)
+        fail_prob = np.minimum(complexity * 0.1 + l_real * 0.05, 0.9) * self.fail_multiplier[choice]
+        is_failure = self.rng.random(n) < fail_prob
+
+        # 3. Liquidación: misma semántica que settle_transaction (sin fondos -> se rechaza)
+        wallet = agents.wallet[idx]
+        settled = is_failure | (wallet >= cost)
+        reward = T_BASE * (
+            ALPHA * q
+            + BETA * np.maximum(1.0 - c_real / C_MAX, 0.0)
+            + GAMMA * np.maximum((L_MAX - l_real) / L_MAX, 0.0)
+        )
+        reward = np.where(is_failure, -P_FAIL, reward)
+        cost_paid = np.where(is_failure, 0.0, cost)
+        wallet = wallet + np.where(settled, reward - cost_paid, 0.0)
+        # El nodo evaluador devuelve a la política cada liquidación aceptada
+        self.policy.observe_many(idx[settled], choice[settled], reward[settled], (reward - cost_paid)[settled])
+
+        # 4. Router: bancarrota o refactorización (DevOps cobra el precio premium)
+        bankrupt = wallet <= 0.0
+        refactor = np.zeros(n, dtype=bool)
+        if self.refactor_idx >= 0:
+            premium = prices[self.refactor_idx]
+            refactor = ~bankrupt & (choice == self.refactor_idx) & (wallet >= premium)
+            wallet = np.where(refactor, wallet - premium, wallet)
+            agents.complexity[idx] = np.where(refactor, np.maximum(complexity - 1.5, 1.0), complexity)
+            agents.skill_level[idx] = np.where(refactor, skill + 1.0, skill)
+
+        agents.wallet[idx] = wallet
+        agents.alive[idx] = ~bankrupt
+        agents.task_count[idx] += 1
+
+        # 5. Broker: la demanda agregada del tick mueve los precios del AMM
+        counts = np.bincount(choice, minlength=len(self.resources)).astype(np.float64)
+        if self.refactor_idx >= 0:
+            counts[self.refactor_idx] += refactor.sum()
+        usage = dict(zip(self.resources, counts.tolist()))
+        new_prices = self.amm.update_prices(usage)
+
+        self.tick_count += 1
+        stats = getattr(self.policy, "stats", None)
+        return TickStats(
+            tick=self.tick_count,
+            active_agents=int(n - bankrupt.sum()),
+            bankruptcies=int(bankrupt.sum()),
+            failures=int(is_failure.sum()),
+            refactors=int(refactor.sum()),
+            usage=usage,
+            prices=dict(new_prices),
+            mean_wallet=float(wallet.mean()) if n else 0.0,
+            regret=stats.cumulative_regret() if stats is not None else None
+        )
+
+    def run(self, ticks: int) -> List[TickStats]:
+        """Ejecuta `ticks` pasos o hasta que no queden agentes activos."""
+        stats = []
+        for _ in range(ticks):
+            if not self.agents.alive.any():
+                break
+            stats.append(self.step())
+        return stats
@@ -0,0 +1,157 @@
+import random
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Hashable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from core.bandits import BanditStats
+
+# Constantes de la política compartidas con los nodos del grafo y el motor vectorizado
+TAU = 2.0
+EXPECTED_REWARDS = {
+    "GPT-3.5": 5.0,
+    "GPT-4o": 15.0,
+    "Refactor_DevOps_Resource": 20.0
+}
+
+Ticker = Union[Mapping[str, float], np.ndarray]
+
+
+def price_vector(resources: Sequence[str], ticker: Ticker) -> np.ndarray:
+    """Precios en el orden de `resources` (los que faltan en el ticker valen 0)."""
+    if isinstance(ticker, np.ndarray):
+        return ticker
+    return np.array([ticker.get(r, 0.0) for r in resources], dtype=float)
+
+
+def _alias_tables(probs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tablas del método alias (Vose): la columna i se queda con su índice con
+    probabilidad `accept[i]` y si no cede a `alias[i]`. Se construyen en O(K).
+    """
+    k = len(probs)
+    scaled = probs * k
+    accept = np.ones(k)
+    alias = np.arange(k)
+    small = [i for i in range(k) if scaled[i] < 1.0]
+    large = [i for i in range(k) if scaled[i] >= 1.0]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        accept[s] = scaled[s]
+        alias[s] = l
+        scaled[l] += scaled[s] - 1.0
+        (small if scaled[l] < 1.0 else large).append(l)
+    # Lo que queda pendiente vale 1 salvo error de redondeo: acepta siempre
+    return accept, alias
+
+
+@dataclass(frozen=True)
+class SoftmaxDistribution:
+    """Distribución Softmax de un ticker, con sus tablas alias para muestrear en O(1)."""
+    resources: Tuple[str, ...]
+    prices: np.ndarray
+    probs: np.ndarray
+    accept: np.ndarray
+    alias: np.ndarray
+    # Copias en listas de Python: el muestreo escalar evita escalares de NumPy
+    _accept: List[float] = field(init=False, repr=False, compare=False)
+    _alias: List[int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_accept", self.accept.tolist())
+        object.__setattr__(self, "_alias", self.alias.tolist())
+
+    @classmethod
+    def build(cls, resources: Sequence[str], prices: np.ndarray, probs: np.ndarray) -> "SoftmaxDistribution":
+        accept, alias = _alias_tables(probs)
+        return cls(tuple(resources), prices, probs, accept, alias)
+
+    def probabilities(self) -> Dict[str, float]:
+        return dict(zip(self.resources, self.probs.tolist()))
+
+    def sample_index(self, rng=random) -> int:
+        """Un índice con una sola extracción uniforme: la parte entera elige la columna y la fraccionaria decide."""
+        u = rng.random() * len(self._accept)
+        i = int(u)
+        return i if u - i < self._accept[i] else self._alias[i]
+
+    def sample(self, rng=random) -> str:
+        return self.resources[self.sample_index(rng)]
+
+    def sample_indices(self, n: int, rng: np.random.Generator) -> np.ndarray:
+        """N índices de una vez (una uniforme por elección), para flotas que comparten ticker."""
+        u = rng.random(n) * len(self.resources)
+        i = u.astype(np.intp)
+        return np.where(u - i < self.accept[i], i, self.alias[i])
+
+    def sample_n(self, n: int, rng: np.random.Generator) -> List[str]:
+        return [self.resources[i] for i in self.sample_indices(n, rng).tolist()]
+
+
+class SoftmaxPolicy:
+    """
+    Política Softmax sobre la utilidad esperada E[R] - Precio, con la
+    distribución cacheada por ticker.
+
+    Los precios solo cambian con el ticker, así que la distribución (y sus
+    tablas alias) se calcula una vez por ticker y todos los agentes que lo
+    comparten muestrean de ella en O(1). La cache es la última distribución:
+    acierta por identidad con el dict del ticker (TickerCache lo reemplaza en
+    cada snapshot y nunca lo muta; un ticker no debe mutarse tras pasarlo) o,
+    si llega un ticker nuevo, por igualdad de precios. Se reemplaza de forma
+    atómica, apta para varios hilos.
+
+    No aprende de las liquidaciones: con `stats` (un BanditStats) solo las
+    registra, para medir su regret como línea base de las políticas de
+    `core.bandits`.
+    """
+    def __init__(self, expected_rewards: Optional[Mapping[str, float]] = None, tau: float = TAU,
+                 resources: Optional[Sequence[str]] = None, stats: Optional["BanditStats"] = None):
+        rewards = expected_rewards or EXPECTED_REWARDS
+        self.resources: Tuple[str, ...] = tuple(resources or rewards)
+        self.expected_rewards = np.array([rewards.get(r, 0.0) for r in self.resources])
+        self.tau = tau
+        self.stats = stats
+        # (ticker del que salió, distribución)
+        self._cached: Optional[Tuple[object, SoftmaxDistribution]] = None
+
+    def price_vector(self, ticker: Ticker) -> np.ndarray:
+        return price_vector(self.resources, ticker)
+
+    def distribution(self, ticker: Ticker) -> SoftmaxDistribution:
+        cached = self._cached
+        if cached is not None and cached[0] is ticker:
+            return cached[1]
+        prices = self.price_vector(ticker)
+        if cached is not None and np.array_equal(cached[1].prices, prices):
+            dist = cached[1]
+        else:
+            utilities = self.expected_rewards - prices
+            exp_u = np.exp((utilities - utilities.max()) / self.tau)
+            dist = SoftmaxDistribution.build(self.resources, prices.copy(), exp_u / exp_u.sum())
+        self._cached = (ticker, dist)
+        return dist
+
+    def choose(self, ticker: Ticker, rng=random, agent_id: Optional[Hashable] = None) -> str:
+        return self.distribution(ticker).sample(rng)
+
+    def choose_n(self, ticker: Ticker, n: int, rng: np.random.Generator) -> List[str]:
+        """API por lotes: N elecciones sobre el mismo ticker sin recalcular la distribución."""
+        return self.distribution(ticker).sample_n(n, rng)
+
+    def choose_indices(self, rows: np.ndarray, prices: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Una elección por fila de agente (motor vectorizado); todas comparten la distribución."""
+        return self.distribution(prices).sample_indices(len(rows), rng)
+
+    def observe(self, agent_id: Hashable, resource: str, reward: float, utility: float) -> None:
+        if self.stats is not None:
+            self.stats.update(agent_id, resource, reward, utility)
+
+    def observe_many(self, rows: np.ndarray, arms: np.ndarray, rewards: np.ndarray, utilities: np.ndarray) -> None:
+        if self.stats is not None:
+            self.stats.update_many(rows, arms, rewards, utilities)
+
+
+# Política por defecto de los nodos del grafo
+default_policy = SoftmaxPolicy()
@@ -1,8 +1,12 @@
 import math
+import os
 import random
-from typing import TypedDict, Dict, Any, Literal, Annotated
+from typing import TypedDict, Dict, Any, Literal, Annotated, NamedTuple, Tuple
 import operator
 
+# Capacidad del ring buffer de eventos por agente (memoria constante en simulaciones largas)
+HISTORY_MAX_EVENTS = int(os.getenv("AEM_HISTORY_MAX_EVENTS", "64"))
+
 def merge_dicts(a: dict, b: dict) -> dict:
     """Función reducer para diccionarios."""
     c = a.copy()
@@ -13,6 +17,25 @@ def merge_lists(a: list, b: list) -> list:
     """Función reducer para listas."""
     return a + b
 
+class AgentEvent(NamedTuple):
+    """Registro compacto del historial: nodo que lo emite y mensaje."""
+    source: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.source}: {self.message}"
+
+def append_events(a: Tuple[AgentEvent, ...], b: list) -> Tuple[AgentEvent, ...]:
+    """
+    Función reducer para el historial: añade los eventos nuevos y conserva solo
+    los últimos HISTORY_MAX_EVENTS, de modo que el coste por actualización y la
+    memoria por agente están acotados por la capacidad y no por la duración.
+    """
+    events = tuple(a or ()) + tuple(b or ())
+    if len(events) > HISTORY_MAX_EVENTS:
+        events = events[-HISTORY_MAX_EVENTS:]
+    return events
+
 class AgenticState(TypedDict):
     """
     Estado del sistema distribuido a lo largo del LangGraph para representar
@@ -25,4 +48,5 @@ class AgenticState(TypedDict):
     current_task: Dict[str, Any]
     metrics: Annotated[Dict[str, Any], merge_dicts]
     market_ticker: Dict[str, float] # Se sobrescribe el ticker
-    history: Annotated[list[str], merge_lists]
+    task_count: Annotated[int, operator.add] # Tareas liquidadas (contador O(1) para los routers)
+    history: Annotated[Tuple[AgentEvent, ...], append_events]
@@ -0,0 +1,192 @@
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core.market import AutomatedMarketMaker
+from core.batch_engine import BASE_PRICES, CAPACITIES, TAU, BatchAgents, BatchMarketSimulator
+
+# Ejes del barrido y su valor por defecto (el mercado de batch_main.py)
+DEFAULT_GRID = {
+    "k": [0.1],
+    "omega": [0.8],
+    "tau": [TAU],
+    "capacity_scale": [1.0],  # multiplica todas las capacidades L_r
+    "initial_wallet": [35.0]
+}
+
+
+@dataclass(frozen=True)
+class SweepRun:
+    """Una corrida Monte Carlo: un punto de la rejilla de parámetros más una semilla."""
+    k: float
+    omega: float
+    tau: float
+    capacity_scale: float
+    initial_wallet: float
+    seed: int
+    n_agents: int
+    ticks: int
+
+    @property
+    def run_id(self) -> str:
+        """Identificador determinista: la misma configuración produce siempre el mismo id (reanudación)."""
+        payload = json.dumps(asdict(self), sort_keys=True)
+        return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def expand_grid(grid: Dict[str, Sequence[float]], seeds: Sequence[int], n_agents: int, ticks: int) -> List[SweepRun]:
+    """Producto cartesiano de la rejilla (ejes ausentes = valor por defecto) por la lista de semillas."""
+    unknown = set(grid) - set(DEFAULT_GRID)
+    if unknown:
+        raise ValueError(f"Parámetros de barrido desconocidos: {sorted(unknown)}")
+    axes = {**DEFAULT_GRID, **grid}
+    names = list(DEFAULT_GRID)
+    return [
+        SweepRun(**dict(zip(names, values)), seed=seed, n_agents=n_agents, ticks=ticks)
+        for values in itertools.product(*(axes[name] for name in names))
+        for seed in seeds
+    ]
+
+
+def price_volatility(prices: np.ndarray) -> np.ndarray:
+    """H_r = Var(P_r) / E[P_r] por recurso sobre la serie de precios (ticks x recursos)."""
+    mean = prices.mean(axis=0)
+    return np.divide(prices.var(axis=0), mean, out=np.zeros_like(mean), where=mean > 0)
+
+
+def gini(values: np.ndarray) -> float:
+    """Coeficiente de Gini de la distribución de wallets (saldos negativos cuentan como 0)."""
+    x = np.sort(np.maximum(values, 0.0))
+    total = x.sum()
+    if x.size == 0 or total <= 0:
+        return 0.0
+    ranks = np.arange(1, x.size + 1)
+    return float((2 * (ranks * x).sum()) / (x.size * total) - (x.size + 1) / x.size)
+
+
+def run_single(run: SweepRun) -> Dict:
+    """Ejecuta una corrida con el motor vectorizado y devuelve su fila de resumen."""
+    started = time.perf_counter()
+    amm = AutomatedMarketMaker(
+        base_prices=dict(BASE_PRICES),
+        capacities={r: c * run.capacity_scale for r, c in CAPACITIES.items()},
+        k=run.k,
+        omega=run.omega
+    )
+    simulator = BatchMarketSimulator(amm, BatchAgents.uniform(run.n_agents, wallet=run.initial_wallet), tau=run.tau, seed=run.seed)
+
+    history = [simulator.prices()]
+    for _ in range(run.ticks):
+        if not simulator.agents.alive.any():
+            break
+        simulator.step()
+        history.append(simulator.prices())
+    prices = np.vstack(history)
+    volatility = price_volatility(prices)
+    wallet = simulator.agents.wallet
+    p10, p50, p90 = np.percentile(wallet, [10, 50, 90])
+
+    row = {
+        "run_id": run.run_id,
+        **asdict(run),
+        "ticks_run": simulator.tick_count,
+        "bankruptcy_rate": float(1.0 - simulator.agents.alive.mean()),
+        "wallet_mean": float(wallet.mean()),
+        "wallet_std": float(wallet.std()),
+        "wallet_min": float(wallet.min()),
+        "wallet_p10": float(p10),
+        "wallet_p50": float(p50),
+        "wallet_p90": float(p90),
+        "wallet_max": float(wallet.max()),
+        "wallet_gini": gini(wallet),
+        "volatility_mean": float(volatility.mean())
+    }
+    for r, vol, price in zip(simulator.resources, volatility, prices[-1]):
+        row[f"volatility_{r}"] = float(vol)
+        row[f"final_price_{r}"] = float(price)
+    row["elapsed_seconds"] = time.perf_counter() - started
+    return row
+
+
+class SweepWriter:
+    """
+    Vuelca los resúmenes a un directorio de partes Parquet (`part-00000.parquet`, ...).
+    Cada parte se escribe a un temporal oculto y se renombra, así una interrupción
+    nunca deja una parte a medias; el directorio se lee entero con `pq.read_table(dir)`.
+    Con `batch_size=1` cada resumen queda en disco al llegar; con N > 1 un SIGKILL
+    u OOM pierde hasta N - 1 resúmenes en memoria, que la reanudación vuelve a ejecutar.
+    """
+    def __init__(self, out_dir: Path, batch_size: int = 1):
+        self.out_dir = Path(out_dir)
+        self.batch_size = max(batch_size, 1)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self._rows: List[Dict] = []
+        parts = self._parts()
+        self._next_part = int(parts[-1].stem.split("-")[1]) + 1 if parts else 0
+
+    def _parts(self) -> List[Path]:
+        return sorted(self.out_dir.glob("part-*.parquet"))
+
+    def completed_run_ids(self) -> Set[str]:
+        done = set()
+        for path in self._parts():
+            done.update(pq.read_table(path, columns=["run_id"]).column("run_id").to_pylist())
+        return done
+
+    def append(self, row: Dict) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        path = self.out_dir / f"part-{self._next_part:05d}.parquet"
+        tmp = self.out_dir / f".{path.name}.tmp"
+        pq.write_table(pa.Table.from_pylist(self._rows), tmp)
+        os.replace(tmp, path)
+        self._next_part += 1
+        self._rows = []
+
+
+def run_sweep(
+    runs: Sequence[SweepRun],
+    out_dir: Path,
+    workers: Optional[int] = None,
+    batch_size: int = 1,
+    on_result: Optional[Callable[[Dict, int, int], None]] = None
+) -> int:
+    """
+    Reparte las corridas pendientes en un pool de procesos y escribe cada
+    resumen en cuanto termina. Las corridas cuyo run_id ya está en `out_dir`
+    se omiten, de modo que relanzar el mismo barrido lo reanuda.
+    Devuelve el número de corridas ejecutadas.
+    """
+    writer = SweepWriter(out_dir, batch_size)
+    done = writer.completed_run_ids()
+    pending = [run for run in runs if run.run_id not in done]
+    completed = 0
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(run_single, run) for run in pending]
+        for future in as_completed(futures):
+            row = future.result()
+            writer.append(row)
+            completed += 1
+            if on_result is not None:
+                on_result(row, completed, len(pending))
+    finally:
+        # Ante una interrupción descarta lo pendiente pero conserva lo ya calculado
+        pool.shutdown(cancel_futures=True)
+        writer.flush()
+    return completed
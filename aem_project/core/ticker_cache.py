@@ -0,0 +1,91 @@
+import json
+import logging
+import threading
+from typing import Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+class TickerCache:
+    """
+    Cache local del ticker del AEM Central Server.
+    Un hilo en segundo plano se suscribe al stream SSE `/market/ticker/stream`
+    y reemplaza el ticker en cada evento, de modo que los nodos leen los precios
+    en memoria sin hacer una petición HTTP por tarea.
+    Mientras no hay conexión `ready` es False y los nodos vuelven a `fetch_ticker`.
+    """
+    def __init__(self, api_base_url: str, reconnect_delay: float = 1.0, stale_after: float = 60.0):
+        self.stream_url = f"{api_base_url}/market/ticker/stream"
+        self.reconnect_delay = reconnect_delay
+        # Segundos sin ningún evento (el servidor envía keep-alive cada 15 s) antes de dar el stream por caído
+        self.stale_after = stale_after
+        self._ticker: Dict[str, float] = {}
+        self._sequence = -1
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def sequence(self) -> int:
+        """Número de secuencia del último snapshot recibido (-1 si aún no hay ninguno)."""
+        return self._sequence
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def get(self) -> Dict[str, float]:
+        """Devuelve el último ticker recibido (el dict se reemplaza, nunca se muta)."""
+        return self._ticker
+
+    def start(self) -> "TickerCache":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="aem-ticker-cache", daemon=True)
+            self._thread.start()
+        return self
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def apply(self, message: dict) -> None:
+        """Aplica un mensaje del stream; ignora snapshots más antiguos que el actual."""
+        sequence = message.get("sequence", -1)
+        if sequence <= self._sequence:
+            return
+        self._ticker = {item["resource_name"]: item["dynamic_price"] for item in message.get("ticker", [])}
+        self._sequence = sequence
+        self._ready.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with requests.get(self.stream_url, stream=True, timeout=(5, self.stale_after)) as resp:
+                    resp.raise_for_status()
+                    # Cada conexión empieza con el snapshot vigente (el servidor pudo reiniciarse)
+                    self._sequence = -1
+                    self._consume(resp)
+            except Exception as e:
+                logger.warning("Ticker stream %s caído (%r); reconectando", self.stream_url, e)
+            finally:
+                # Sin conexión el ticker en memoria está congelado: los nodos deben pedirlo por HTTP
+                self._ready.clear()
+            # Reconexión tras caída del servidor o del stream
+            self._stop.wait(self.reconnect_delay)
+
+    def _consume(self, resp: requests.Response) -> None:
+        data_lines = []
+        for line in resp.iter_lines(decode_unicode=True):
+            if self._stop.is_set():
+                return
+            if line is None:
+                continue
+            if line == "":
+                if data_lines:
+                    self.apply(json.loads("\n".join(data_lines)))
+                    data_lines = []
+            elif line.startswith("data:"):
+                data_lines.append(line[5:].strip())
@@ -1,11 +1,11 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./aem_ledger.db"
+# El factory de almacenamiento se comparte con aem_api (`pip install -e .` desde la raíz del repositorio)
+from aem_storage import get_database_url, create_storage_engine, create_session_factory
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SQLALCHEMY_DATABASE_URL = get_database_url()
+
+engine = create_storage_engine(SQLALCHEMY_DATABASE_URL)
+SessionLocal = create_session_factory(engine)
 
 Base = declarative_base()
@@ -0,0 +1,67 @@
+from typing import Dict, Any
+import httpx
+from core.state import AgenticState, AgentEvent
+from graph.nodes import (
+    API_BASE_URL, DEFAULT_TICKER, parse_ticker, agent_rng,
+    operative_update, evaluate_task, observe_settlement, evaluator_update, devops_update
+)
+
+def create_async_client(max_connections: int = 200, max_keepalive: int = 100, timeout: float = 5.0) -> httpx.AsyncClient:
+    """
+    Cliente HTTP asíncrono compartido por todos los agentes del proceso.
+    El pool mantiene conexiones keep-alive con el AEM Central Server.
+    """
+    return httpx.AsyncClient(
+        base_url=API_BASE_URL,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+        timeout=timeout
+    )
+
+async def fetch_ticker_async(client: httpx.AsyncClient) -> Dict[str, float]:
+    try:
+        resp = await client.get("/market/ticker")
+        if resp.status_code == 200:
+            return parse_ticker(resp.json())
+    except Exception:
+        pass
+    return DEFAULT_TICKER.copy()
+
+
+def get_async_operative_node(client: httpx.AsyncClient, amm=None, ticker_cache=None, rng_streams=None, policy=None):
+    async def operative_node(state: AgenticState) -> Dict[str, Any]:
+        """Nodo Operativo (Cliente HTTP async): igual que operative_node sin bloquear el hilo."""
+        if ticker_cache is not None and ticker_cache.ready:
+            ticker = ticker_cache.get()
+        else:
+            ticker = await fetch_ticker_async(client)
+        return operative_update(ticker, agent_rng(rng_streams, state), policy, state.get("agent_id", "Agent_007"))
+    return operative_node
+
+
+def get_async_evaluator_node(client: httpx.AsyncClient, rng_streams=None, policy=None):
+    async def evaluator_node(state: AgenticState) -> Dict[str, Any]:
+        """Nodo Evaluador (Cliente HTTP async): liquida la tarea en el servidor central."""
+        agent_id = state.get("agent_id", "Agent_007")
+        q, is_failure, payload = evaluate_task(state, agent_rng(rng_streams, state))
+        try:
+            resp = await client.post(f"/agents/{agent_id}/settle", json=payload)
+            data = resp.json() if resp.status_code == 200 else {}
+        except Exception:
+            data = {}
+        observe_settlement(policy, state, data)
+        return evaluator_update(state, q, is_failure, data)
+    return evaluator_node
+
+
+def get_async_devops_node(client: httpx.AsyncClient):
+    async def devops_node(state: AgenticState) -> Dict[str, Any]:
+        """Nodo DevOps (Cliente HTTP async): Pide un refactor a la API."""
+        agent_id = state.get("agent_id", "Agent_007")
+        try:
+            resp = await client.post("/devops/refactor", json={"agent_id": agent_id})
+            if resp.status_code == 200:
+                return devops_update(state, resp.json())
+            return {"history": [AgentEvent("DevOps (API)", f"Fallo al refactorizar - HTTP {resp.status_code}")]}
+        except Exception as e:
+            return {"history": [AgentEvent("DevOps (API)", f"Error de conexion - {e}")]}
+    return devops_node
@@ -1,21 +1,47 @@
+from typing import Optional
+import httpx
 from langgraph.graph import StateGraph, START, END
 from core.state import AgenticState
 from core.market import AutomatedMarketMaker
+from core.ticker_cache import TickerCache
+from core.rng import RngStreams
 from graph.nodes import get_operative_node, get_evaluator_node, get_broker_node, get_devops_node, bankruptcy_node
+from graph.async_nodes import get_async_operative_node, get_async_evaluator_node, get_async_devops_node
 from graph.edges import router_broker_or_devops, router_continue
 
-def build_aem_graph(amm: AutomatedMarketMaker) -> StateGraph:
+def build_aem_graph(amm: AutomatedMarketMaker, ticker_cache: Optional[TickerCache] = None, session=None,
+                    rng_streams: Optional[RngStreams] = None, policy=None) -> StateGraph:
     """
     Construye y compila el StateGraph para la simulación AEM,
     inyectando la instancia de AMM. (Sin base de datos, 100% cliente HTTP).
+    Con `ticker_cache` el nodo operativo lee el ticker del stream en vez de pedirlo por tarea.
+    Con `rng_streams` las decisiones de cada agente son reproducibles a partir de la semilla raíz.
+    Con `policy` (ver `core.bandits.make_policy`) los agentes eligen con ella y aprenden de cada liquidación.
     """
-    graph = StateGraph(AgenticState)
-    
     # Inyectar dependencias a los nodos mediante factories
-    operative = get_operative_node(amm)
-    evaluator = get_evaluator_node()
-    broker = get_broker_node(amm)
-    devops = get_devops_node()
+    return _compile_graph(
+        operative=get_operative_node(amm, ticker_cache, session, rng_streams, policy),
+        evaluator=get_evaluator_node(session, rng_streams, policy),
+        broker=get_broker_node(amm),
+        devops=get_devops_node(session)
+    )
+
+def build_async_aem_graph(amm: AutomatedMarketMaker, client: httpx.AsyncClient, ticker_cache: Optional[TickerCache] = None,
+                          rng_streams: Optional[RngStreams] = None, policy=None) -> StateGraph:
+    """
+    Variante asíncrona del grafo AEM para `ainvoke`: los nodos HTTP comparten
+    un único httpx.AsyncClient con pool de conexiones keep-alive, de modo que
+    un proceso puede conducir miles de agentes concurrentes en un solo event loop.
+    """
+    return _compile_graph(
+        operative=get_async_operative_node(client, amm, ticker_cache, rng_streams, policy),
+        evaluator=get_async_evaluator_node(client, rng_streams, policy),
+        broker=get_broker_node(amm),
+        devops=get_async_devops_node(client)
+    )
+
+def _compile_graph(operative, evaluator, broker, devops) -> StateGraph:
+    graph = StateGraph(AgenticState)
     
     # Añadiendo nodos
     graph.add_node("operative", operative)
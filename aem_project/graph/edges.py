@@ -1,6 +1,8 @@
 from typing import Literal
 from core.state import AgenticState
 
+MAX_TASKS = 5
+
 def router_broker_or_devops(state: AgenticState) -> Literal["bancarrota", "devops", "broker"]:
     """
     Post-Evaluation Router:
@@ -21,9 +23,8 @@ def router_broker_or_devops(state: AgenticState) -> Literal["bancarrota", "devop
 
 def router_continue(state: AgenticState) -> Literal["siguiente_tarea", "fin"]:
     """Decides whether to execute the next simulated iteration or end."""
-    # We now check for 'Evaluador (API)' instead of 'Evaluador:'
-    task_count = len([h for h in state.get("history", []) if h.startswith("Evaluador (API)")])
+    task_count = state.get("task_count", 0)
     
-    if task_count >= 5: # Ends after simulating 5 tasks
+    if task_count >= MAX_TASKS: # Ends after simulating 5 tasks
         return "fin"
     return "siguiente_tarea"
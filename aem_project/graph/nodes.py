@@ -1,137 +1,185 @@
 import random
-import math
 import requests
-from typing import Dict, Any
-from core.state import AgenticState
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Optional, Tuple
+from core.policy import default_policy
+from core.state import AgenticState, AgentEvent
 
 API_BASE_URL = "http://localhost:8000/api/v1"
+DEFAULT_TICKER = {"GPT-3.5": 1.0, "GPT-4o": 5.0, "Refactor_DevOps_Resource": 10.0}
 
-def get_operative_node(amm=None):
+# Sesión HTTP compartida: reutiliza conexiones keep-alive en lugar de abrir una TCP por llamada
+http_session = requests.Session()
+http_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=64))
+http_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=64))
+
+
+def parse_ticker(ticker_data: list) -> Dict[str, float]:
+    return {item["resource_name"]: item["dynamic_price"] for item in ticker_data}
+
+def fetch_ticker(session=None) -> Dict[str, float]:
+    """Lee el ticker por HTTP (fallback cuando no hay cache alimentada por stream)."""
+    session = session or http_session
+    try:
+        resp = session.get(f"{API_BASE_URL}/market/ticker", timeout=5)
+        if resp.status_code == 200:
+            return parse_ticker(resp.json())
+    except Exception:
+        pass
+    return DEFAULT_TICKER.copy()
+
+def agent_rng(rng_streams, state: AgenticState):
+    """Stream propio del agente si se inyectó un RngStreams; si no, el generador global de `random`."""
+    if rng_streams is None:
+        return random
+    return rng_streams.for_agent(state.get("agent_id", "Agent_007"))
+
+
+# ==========================================
+# Lógica pura de los nodos (compartida por las variantes sync y async)
+# ==========================================
+
+def choose_resource(ticker: Dict[str, float], rng=random, policy=None, agent_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Elige recurso con la política del agente y simula su consumo real (muestreando de `rng`).
+    Por defecto `default_policy`: Softmax sobre E[R] - Precio, cacheada por ticker.
+    Las políticas de `core.bandits` eligen con las estadísticas de `agent_id`.
+    """
+    chosen_resource = (policy or default_policy).choose(ticker, rng, agent_id)
+
+    cost_paid = ticker.get(chosen_resource, 1.0)
+
+    if chosen_resource == "GPT-3.5":
+        c_real = rng.uniform(1.0, 3.0)
+        l_real = rng.uniform(0.5, 1.5)
+    elif chosen_resource == "GPT-4o":
+        c_real = rng.uniform(5.0, 10.0)
+        l_real = rng.uniform(1.0, 3.0)
+    else:
+        c_real = rng.uniform(15.0, 20.0)
+        l_real = rng.uniform(3.0, 6.0)
+
+    return {
+        "C_real": c_real,
+        "L_real": l_real,
+        "chosen_resource": chosen_resource,
+        "cost_paid": cost_paid
+    }
+
+def operative_update(ticker: Dict[str, float], rng=random, policy=None, agent_id: Optional[str] = None) -> Dict[str, Any]:
+    metrics_update = choose_resource(ticker, rng, policy, agent_id)
+    return {
+        "metrics": metrics_update,
+        "market_ticker": ticker,
+        "history": [AgentEvent("Operativo (API)", f"Eligió {metrics_update['chosen_resource']} (Precio Ticker: {metrics_update['cost_paid']:.2f})")]
+    }
+
+def evaluate_task(state: AgenticState, rng=random) -> Tuple[float, bool, Dict[str, Any]]:
+    """
+    Calcula Q(calidad) y Fallo (Lógica local simulada de interacción).
+    Devuelve (q, is_failure, payload de liquidación para el servidor central).
+    """
+    metrics = state["metrics"]
+    chosen_resource = metrics.get("chosen_resource", "GPT-3.5")
+
+    resource_multiplier = 1.2 if chosen_resource == "GPT-4o" else 1.0
+    q_base = (state["skill_level"] / (state["complexity"] + 0.1)) * resource_multiplier
+    q = min(max(q_base + rng.uniform(-0.1, 0.1), 0.0), 1.0)
+
+    l_real = metrics.get("L_real", 1.0)
+    c_real = metrics.get("C_real", 1.0)
+
+    fail_prob = min((state["complexity"] * 0.1) + (l_real * 0.05), 0.9)
+    if chosen_resource == "GPT-4o":
+        fail_prob *= 0.5
+
+    is_failure = rng.random() < fail_prob
+
+    payload = {
+        "resource_used": chosen_resource,
+        "c_real": c_real,
+        "l_real": l_real,
+        "task_quality_q": q,
+        "is_failure": is_failure
+    }
+    return q, is_failure, payload
+
+def observe_settlement(policy, state: AgenticState, data: Dict[str, Any]) -> None:
+    """Devuelve a la política la recompensa y el net_profit de una liquidación aceptada por /settle."""
+    if policy is None or "reward" not in data:
+        return
+    policy.observe(
+        state.get("agent_id", "Agent_007"),
+        state["metrics"].get("chosen_resource", "GPT-3.5"),
+        data["reward"],
+        data.get("net_profit", 0.0)
+    )
+
+def evaluator_update(state: AgenticState, q: float, is_failure: bool, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Construye la actualización del estado a partir de la respuesta de /settle (vacía si falló)."""
+    new_wallet = data.get("wallet_balance", state["agent_wallet"])
+    reward = data.get("reward", 0.0)
+    net_profit = data.get("net_profit", 0.0)
+
+    result_str = "FALLO" if is_failure else "EXITO"
+    history_entry = AgentEvent("Evaluador (API)", f"Tarea {result_str}. Q={q:.2f}. Resp API -> Wallet={new_wallet:.2f}, Beneficio={net_profit:.2f}")
+
+    return {
+        "agent_wallet": new_wallet,
+        "metrics": {"Q": q, "is_failure": is_failure, "reward": reward, "net_profit": net_profit},
+        "task_count": 1,
+        "history": [history_entry]
+    }
+
+def devops_update(state: AgenticState, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "complexity": data.get("new_complexity", state["complexity"]),
+        "skill_level": data.get("new_skill_level", state["skill_level"]),
+        "agent_wallet": data.get("wallet_balance", state.get("agent_wallet")),
+        "history": [AgentEvent("DevOps (API)", "!Refactorización Exitosa delegada al servidor!")]
+    }
+
+
+# ==========================================
+# Factories de nodos (cliente HTTP síncrono)
+# ==========================================
+
+def get_operative_node(amm=None, ticker_cache=None, session=None, rng_streams=None, policy=None):
     def operative_node(state: AgenticState) -> AgenticState:
         """
         Nodo Operativo (Cliente HTTP):
-        Obtiene precios del AEM Central Server y elige recurso con Softmax.
+        Obtiene precios del AEM Central Server y elige recurso con la política (Softmax por defecto).
+        Si recibe un TickerCache lee los precios en memoria (actualizados por stream).
+        Con `rng_streams` cada agente muestrea de su propio stream reproducible.
         """
-        tau = 2.0
-        try:
-            resp = requests.get(f"{API_BASE_URL}/market/ticker", timeout=5)
-            if resp.status_code == 200:
-                ticker_data = resp.json()
-                ticker = {item["resource_name"]: item["dynamic_price"] for item in ticker_data}
-            else:
-                ticker = {"GPT-3.5": 1.0, "GPT-4o": 5.0, "Refactor_DevOps_Resource": 10.0}
-        except Exception:
-            ticker = {"GPT-3.5": 1.0, "GPT-4o": 5.0, "Refactor_DevOps_Resource": 10.0}
-            
-        expected_rewards = {
-            "GPT-3.5": 5.0,
-            "GPT-4o": 15.0, 
-            "Refactor_DevOps_Resource": 20.0
-        }
-        
-        utilities = {}
-        for r, expected_r in expected_rewards.items():
-            price_r = ticker.get(r, 0.0)
-            utilities[r] = expected_r - price_r
-            
-        max_u = max(utilities.values()) if utilities else 0
-        exp_u = {r: math.exp((u - max_u) / tau) for r, u in utilities.items()}
-        sum_exp = sum(exp_u.values()) if exp_u else 1
-        probs = {r: e / sum_exp for r, e in exp_u.items()}
-        
-        rand_val = random.random()
-        cumulative = 0.0
-        chosen_resource = "GPT-3.5"
-        for r, p in probs.items():
-            cumulative += p
-            if rand_val <= cumulative:
-                chosen_resource = r
-                break
-                
-        cost_paid = ticker.get(chosen_resource, 1.0)
-        
-        if chosen_resource == "GPT-3.5":
-            c_real = random.uniform(1.0, 3.0)
-            l_real = random.uniform(0.5, 1.5)
-        elif chosen_resource == "GPT-4o":
-            c_real = random.uniform(5.0, 10.0)
-            l_real = random.uniform(1.0, 3.0)
+        if ticker_cache is not None and ticker_cache.ready:
+            ticker = ticker_cache.get()
         else:
-            c_real = random.uniform(15.0, 20.0)
-            l_real = random.uniform(3.0, 6.0)
-            
-        metrics_update = {
-            "C_real": c_real,
-            "L_real": l_real,
-            "chosen_resource": chosen_resource,
-            "cost_paid": cost_paid
-        }
-        
-        return {
-            "metrics": metrics_update, 
-            "market_ticker": ticker,
-            "history": [f"Operativo (API): Eligió {chosen_resource} (Precio Ticker: {cost_paid:.2f})"]
-        }
+            ticker = fetch_ticker(session)
+        return operative_update(ticker, agent_rng(rng_streams, state), policy, state.get("agent_id", "Agent_007"))
     return operative_node
 
 
-def get_evaluator_node():
+def get_evaluator_node(session=None, rng_streams=None, policy=None):
+    http = session or http_session
+
     def evaluator_node(state: AgenticState) -> Dict[str, Any]:
         """
         Nodo Evaluador (Cliente HTTP):
         Evalúa Q(calidad) localmente y envía liquidación al AEM Central Server.
+        Con `policy` le devuelve el resultado de la liquidación para que aprenda.
         """
-        metrics = state["metrics"]
-        chosen_resource = metrics.get("chosen_resource", "GPT-3.5")
         agent_id = state.get("agent_id", "Agent_007")
-        
-        # Calcular Q y Fallo (Lógica local simulada de interacción)
-        resource_multiplier = 1.2 if chosen_resource == "GPT-4o" else 1.0
-        q_base = (state["skill_level"] / (state["complexity"] + 0.1)) * resource_multiplier
-        q = min(max(q_base + random.uniform(-0.1, 0.1), 0.0), 1.0)
-        
-        l_real = metrics.get("L_real", 1.0)
-        c_real = metrics.get("C_real", 1.0)
-        
-        fail_prob = min((state["complexity"] * 0.1) + (l_real * 0.05), 0.9)
-        if chosen_resource == "GPT-4o":
-            fail_prob *= 0.5 
-            
-        is_failure = random.random() < fail_prob
-        
+        q, is_failure, payload = evaluate_task(state, agent_rng(rng_streams, state))
+
         # Payload de Liquidación al Servidor Central
-        payload = {
-            "resource_used": chosen_resource,
-            "c_real": c_real,
-            "l_real": l_real,
-            "task_quality_q": q,
-            "is_failure": is_failure
-        }
-        
         try:
-            resp = requests.post(f"{API_BASE_URL}/agents/{agent_id}/settle", json=payload, timeout=5)
-            if resp.status_code == 200:
-                data = resp.json()
-                new_wallet = data.get("wallet_balance", state["agent_wallet"])
-                reward = data.get("reward", 0.0)
-                net_profit = data.get("net_profit", 0.0)
-            else:
-                new_wallet = state["agent_wallet"]
-                reward = 0.0
-                net_profit = 0.0
+            resp = http.post(f"{API_BASE_URL}/agents/{agent_id}/settle", json=payload, timeout=5)
+            data = resp.json() if resp.status_code == 200 else {}
         except Exception:
-            new_wallet = state["agent_wallet"]
-            reward = 0.0
-            net_profit = 0.0
-            
-        result_str = "FALLO" if is_failure else "EXITO"
-        history_entry = f"Evaluador (API): Tarea {result_str}. Q={q:.2f}. Resp API -> Wallet={new_wallet:.2f}, Beneficio={net_profit:.2f}"
-        
-        return {
-            "agent_wallet": new_wallet,
-            "metrics": {"Q": q, "is_failure": is_failure, "reward": reward, "net_profit": net_profit},
-            "history": [history_entry]
-        }
+            data = {}
+        observe_settlement(policy, state, data)
+        return evaluator_update(state, q, is_failure, data)
     return evaluator_node
 
 
@@ -141,38 +189,34 @@ def get_broker_node(amm=None):
         Nodo Broker Deprecado: Actúa de pasarela. El mercado se actualiza en el server con su propio update_prices.
         """
         return {
-            "history": ["Broker: Omitido. El mercado operado centralmente en la AEM API."]
+            "history": [AgentEvent("Broker", "Omitido. El mercado operado centralmente en la AEM API.")]
         }
     return broker_node
 
 
-def get_devops_node():
+def get_devops_node(session=None):
+    http = session or http_session
+
     def devops_node(state: AgenticState) -> Dict[str, Any]:
         """
         Nodo DevOps (Cliente HTTP): Pide un refactor a la API.
         """
         agent_id = state.get("agent_id", "Agent_007")
         try:
-            resp = requests.post(
-                f"{API_BASE_URL}/devops/refactor", 
+            resp = http.post(
+                f"{API_BASE_URL}/devops/refactor",
                 json={"agent_id": agent_id},
                 timeout=5
             )
             if resp.status_code == 200:
-                data = resp.json()
-                return {
-                    "complexity": data.get("new_complexity", state["complexity"]),
-                    "skill_level": data.get("new_skill_level", state["skill_level"]),
-                    "agent_wallet": data.get("wallet_balance", state.get("agent_wallet")),
-                    "history": ["DevOps (API): !Refactorización Exitosa delegada al servidor!"]
-                }
+                return devops_update(state, resp.json())
             else:
-                 return {"history": [f"DevOps (API): Fallo al refactorizar - HTTP {resp.status_code}"]}
+                 return {"history": [AgentEvent("DevOps (API)", f"Fallo al refactorizar - HTTP {resp.status_code}")]}
         except Exception as e:
-            return {"history": [f"DevOps (API): Error de conexion - {e}"]}
+            return {"history": [AgentEvent("DevOps (API)", f"Error de conexion - {e}")]}
     return devops_node
 
 
 def bankruptcy_node(state: AgenticState) -> Dict[str, Any]:
     """Nodo final cuando un agente quiebra por falta de fondos."""
-    return {"history": ["Bancarrota: El agente se quedó sin fondos y ha sido liquidado del mercado."]}
+    return {"history": [AgentEvent("Bancarrota", "El agente se quedó sin fondos y ha sido liquidado del mercado.")]}
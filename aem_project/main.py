@@ -1,6 +1,10 @@
-from core.state import AgenticState
+from core.state import AgenticState, AgentEvent
 from core.market import AutomatedMarketMaker
+from core.ticker_cache import TickerCache
+from core.rng import RngStreams
+from core.bandits import make_policy
 from graph.builder import build_aem_graph
+from graph.nodes import API_BASE_URL
 
 def main():
     print("🚀 Iniciando Simulación AEM (Agentic Economic Market) Client...")
@@ -21,14 +25,23 @@ def main():
         current_task={"type": "presupuesto_concierge", "data": "Extraer variables financieras"},
         metrics={},
         market_ticker=amm.base_prices.copy(),
-        history=["Inicio: Agente instanciado en el mercado."]
+        task_count=0,
+        history=(AgentEvent("Inicio", "Agente instanciado en el mercado."),)
     )
 
-    # 3. Construir grafo con Inyección de Dependencia (AMM)
-    app = build_aem_graph(amm)
+    # 3. Suscribirse al stream del ticker y construir grafo con Inyección de Dependencia (AMM)
+    ticker_cache = TickerCache(API_BASE_URL).start()
+    ticker_cache.wait_ready(timeout=2.0)
+    # Streams aleatorios por agente: AEM_SEED=<semilla> reproduce la corrida
+    rng_streams = RngStreams.from_env()
+    print(f"🎲 Semilla raíz: {rng_streams.root_seed}")
+    # Política de los agentes: AEM_POLICY=softmax|ucb|thompson|exp3 (aprenden de cada /settle)
+    policy = make_policy(resources=list(amm.base_prices))
+    app = build_aem_graph(amm, ticker_cache, rng_streams=rng_streams, policy=policy)
     
     # 4. Ejecutar la Simulación
     final_state = app.invoke(initial_state)
+    ticker_cache.stop()
     
     # 5. Imprimir Resultados
     print("\n📈 Historial de Transacciones y Tareas:")
@@ -43,6 +56,7 @@ def main():
     print(f"Precios Finales AMM:")
     for res, price in final_state['market_ticker'].items():
         print(f" - {res}: {price:.4f}")
+    print(f"Regret acumulado ({type(policy).__name__}): {policy.stats.regret(initial_state['agent_id']):.2f} Tk")
 
     print("\n💾 Los registros han sido auditados en 'aem_ledger.db'.")
 
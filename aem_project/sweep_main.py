@@ -0,0 +1,73 @@
+"""
+Barrido Monte Carlo de parámetros del AMM sobre el motor vectorizado.
+
+    python sweep_main.py --k 0.05,0.1,0.2 --omega 0.5,0.8,0.95 --seeds 0-9 --output sweep_results
+    python sweep_main.py --grid grid.json --seeds 0-99 --agents 5000 --ticks 100 --workers 8
+
+`grid.json` admite los ejes k, omega, tau, capacity_scale e initial_wallet
+(listas de valores). Relanzar el mismo comando reanuda un barrido interrumpido.
+"""
+import argparse
+import json
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+from core.sweep import DEFAULT_GRID, expand_grid, run_sweep
+
+
+def parse_floats(text: str):
+    return [float(v) for v in text.split(",") if v]
+
+
+def parse_seeds(text: str):
+    """'0-9' -> 0..9; '1,5,7' -> [1, 5, 7]."""
+    seeds = []
+    for part in text.split(","):
+        if "-" in part:
+            lo, hi = part.split("-")
+            seeds.extend(range(int(lo), int(hi) + 1))
+        elif part:
+            seeds.append(int(part))
+    return seeds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido Monte Carlo de parámetros del AMM")
+    parser.add_argument("--grid", help="Fichero JSON con la rejilla de parámetros")
+    for axis in DEFAULT_GRID:
+        parser.add_argument(f"--{axis.replace('_', '-')}", dest=axis, type=parse_floats, help=f"Valores de {axis} separados por comas")
+    parser.add_argument("--seeds", type=parse_seeds, default=[0], help="Semillas: '0-9' o '1,2,3'")
+    parser.add_argument("--agents", type=int, default=10_000)
+    parser.add_argument("--ticks", type=int, default=50)
+    parser.add_argument("--workers", type=int, help="Procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Resúmenes por parte Parquet (1: cada corrida se persiste al terminar; "
+                             "con N > 1 una caída pierde hasta N - 1 corridas terminadas)")
+    parser.add_argument("--output", default="sweep_results", help="Directorio de salida (Parquet)")
+    args = parser.parse_args()
+
+    grid = json.loads(Path(args.grid).read_text()) if args.grid else {}
+    for axis in DEFAULT_GRID:
+        if getattr(args, axis):
+            grid[axis] = getattr(args, axis)
+    runs = expand_grid(grid, args.seeds, args.agents, args.ticks)
+
+    print(f"🚀 Barrido AEM: {len(runs)} corridas ({args.agents} agentes x {args.ticks} ticks) -> {args.output}")
+    print("-" * 50)
+
+    def progress(row, done, total):
+        print(
+            f" -> [{done}/{total}] k={row['k']}, omega={row['omega']}, tau={row['tau']}, seed={row['seed']}: "
+            f"Quiebras={row['bankruptcy_rate']:.1%}, Volatilidad={row['volatility_mean']:.4f}, Wallet medio={row['wallet_mean']:.2f}"
+        )
+
+    executed = run_sweep(runs, Path(args.output), workers=args.workers, batch_size=args.batch_size, on_result=progress)
+
+    print("-" * 50)
+    total = pq.read_table(args.output).num_rows
+    print(f"\n📊 Corridas ejecutadas: {executed} (omitidas por reanudación: {len(runs) - executed}); filas en {args.output}: {total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 import math
-import random
 from typing import TypedDict, Dict, Any, Literal, Annotated
 import operator
 from langgraph.graph import StateGraph, START, END
+from aem_project.core.rng import RngStreams
 
 # ==========================================
 # 1. Definición del Estado de la Simulación
@@ -74,6 +74,10 @@ amm = AutomatedMarketMaker(
     capacities={"GPT-3.5": 100.0, "GPT-4o": 10.0, "Refactor_DevOps_Resource": 2.0}
 )
 
+# Streams aleatorios de la simulación (uno por agente y uno para el mercado).
+# AEM_SEED=<semilla> reproduce exactamente una corrida.
+rng_streams = RngStreams.from_env()
+
 
 # ==========================================
 # 3. Nodos del LangGraph
@@ -86,6 +90,7 @@ def operative_node(state: AgenticState) -> AgenticState:
     que evalúa la Utilidad Esperada (E[R] - Precio).
     """
     tau = 2.0 # Temperatura paramétrica para el softmax
+    rng = rng_streams.for_agent(state["agent_id"])
     ticker = state.get("market_ticker", amm.base_prices)
     
     # Expectativas heurísticas del agente (cuánto cree que ganará usando X recurso)
@@ -109,7 +114,7 @@ def operative_node(state: AgenticState) -> AgenticState:
     sum_exp = sum(exp_u.values())
     probs = {r: e / sum_exp for r, e in exp_u.items()}
     
-    rand_val = random.random()
+    rand_val = rng.random()
     cumulative = 0.0
     chosen_resource = "GPT-3.5"
     for r, p in probs.items():
@@ -122,14 +127,14 @@ def operative_node(state: AgenticState) -> AgenticState:
     cost_paid = ticker.get(chosen_resource, 1.0)
     
     if chosen_resource == "GPT-3.5":
-        c_real = random.uniform(1.0, 3.0)
-        l_real = random.uniform(0.5, 1.5)
+        c_real = rng.uniform(1.0, 3.0)
+        l_real = rng.uniform(0.5, 1.5)
     elif chosen_resource == "GPT-4o":
-        c_real = random.uniform(5.0, 10.0)
-        l_real = random.uniform(1.0, 3.0)
+        c_real = rng.uniform(5.0, 10.0)
+        l_real = rng.uniform(1.0, 3.0)
     else: # Refactor_DevOps_Resource
-        c_real = random.uniform(15.0, 20.0) # Alto consumo
-        l_real = random.uniform(3.0, 6.0)   # Alta latencia
+        c_real = rng.uniform(15.0, 20.0) # Alto consumo
+        l_real = rng.uniform(3.0, 6.0)   # Alta latencia
         
     metrics_update = {
         "C_real": c_real,
@@ -151,12 +156,13 @@ def evaluator_node(state: AgenticState) -> AgenticState:
     """
     metrics = state["metrics"]
     chosen_resource = metrics.get("chosen_resource", "GPT-3.5")
+    rng = rng_streams.for_agent(state["agent_id"])
     
     # 1. Función de Calidad (Q) en [0, 1]
     # Modificado por la skill del agente, la complejidad de la tarea y el LLM
     resource_multiplier = 1.2 if chosen_resource == "GPT-4o" else 1.0
     q_base = (state["skill_level"] / (state["complexity"] + 0.1)) * resource_multiplier
-    q = min(max(q_base + random.uniform(-0.1, 0.1), 0.0), 1.0)
+    q = min(max(q_base + rng.uniform(-0.1, 0.1), 0.0), 1.0)
     
     # 2. Función de Falla (Golden Dataset)
     # Probabilidad de fallar aumenta con la complejidad de la tarea y la alta latencia
@@ -166,7 +172,7 @@ def evaluator_node(state: AgenticState) -> AgenticState:
     if chosen_resource == "GPT-4o":
         fail_prob *= 0.5 
         
-    is_failure = random.random() < fail_prob
+    is_failure = rng.random() < fail_prob
     
     # 3. Cálculo de Recompensa Ecuación AEM
     t_base = 25.0  # Recompensa base
@@ -205,7 +211,8 @@ def broker_node(state: AgenticState) -> AgenticState:
     chosen = state["metrics"].get("chosen_resource")
     
     # Simula el uso base del mercado para dar ruido orgánico a la demanda
-    market_usage = {r: random.uniform(0.0, cap * 0.5) for r, cap in amm.capacities.items()}
+    market_rng = rng_streams.for_market()
+    market_usage = {r: market_rng.uniform(0.0, cap * 0.5) for r, cap in amm.capacities.items()}
     
     # Se agrega el impacto de la decisión particular de nuestro agente
     if chosen in market_usage:
@@ -340,6 +347,7 @@ if __name__ == "__main__":
     app = build_aem_graph()
     
     print("🚀 Iniciando Simulación AEM (Agentic Economic Market)...")
+    print(f"🎲 Semilla raíz: {rng_streams.root_seed}")
     print("-" * 50)
     
     # Ejecuta el grafo de forma síncrona
@@ -0,0 +1,11 @@
+"""
+Storage factory shared by aem_api and aem_project (engine, sessions, export
+and analytics). It is installed from the repository root, which
+`pip install -r requirements.txt` already does:
+
+    pip install -e .
+    cd aem_api && uvicorn app.main:app
+"""
+from .engine import DEFAULT_DATABASE_URL, get_database_url, create_storage_engine, create_session_factory
+
+__all__ = ["DEFAULT_DATABASE_URL", "get_database_url", "create_storage_engine", "create_session_factory"]
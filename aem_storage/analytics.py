@@ -0,0 +1,283 @@
+"""
+Evaluation metrics of the AEM paper (section 9) over a Parquet ledger export.
+
+    python -m aem_storage.analytics ledger_export
+    python -m aem_storage.analytics ledger_export --agents-output agent_metrics.parquet
+
+Reads only the files written by `aem_storage.export`, one record batch at a
+time: memory grows with the number of agents and resources, not with the
+number of ledger rows, and the live database is never touched.
+
+A market reset starts a new epoch, so one export can hold several unrelated
+markets: the metrics cover a single epoch, the latest by default (`--epoch`).
+Prices are taken from the epoch's time window in `market_logs`.
+"""
+import argparse
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+BATCH_ROWS = 1_000_000
+# Ledger rows produced by task execution (refactors are capital purchases, not actions)
+ACTION_RESULTS = ("SUCCESS", "FAILURE")
+# Balance movements that are not market transactions (app.db.ledger.BALANCE_EVENTS);
+# they carry no resource and are left out of every metric
+BALANCE_EVENTS = ("AGENT_OPENED", "TOPUP")
+
+
+# Columns added to the export later, with the value their rows had in older parts
+LEDGER_DEFAULTS = {"epoch": pa.scalar(0, pa.int64())}
+
+
+def iter_batches(directory: Path, columns: Sequence[str], batch_rows: int = BATCH_ROWS,
+                 defaults: Optional[Mapping[str, pa.Scalar]] = None) -> Iterator[pa.RecordBatch]:
+    """
+    Batches of the exported parts in id order (parts are named by id range).
+    Columns missing from a part (exported before they existed) take their value in `defaults`.
+    """
+    defaults = defaults or {}
+    for path in sorted(Path(directory).glob("part-*.parquet")):
+        parquet = pq.ParquetFile(path)
+        missing = [c for c in columns if c in defaults and c not in parquet.schema_arrow.names]
+        present = [c for c in columns if c not in missing]
+        for batch in parquet.iter_batches(batch_size=batch_rows, columns=present):
+            if missing:
+                arrays = {c: batch.column(c) for c in present}
+                arrays.update({c: pa.array([defaults[c].as_py()] * batch.num_rows, defaults[c].type) for c in missing})
+                batch = pa.RecordBatch.from_arrays([arrays[c] for c in columns], names=list(columns))
+            yield batch
+
+
+def latest_epoch(ledger_dir: Path, batch_rows: int = BATCH_ROWS) -> int:
+    """Highest market epoch in the exported ledger (0 when it is empty)."""
+    latest = 0
+    for batch in iter_batches(ledger_dir, ["epoch"], batch_rows, LEDGER_DEFAULTS):
+        if batch.num_rows:
+            latest = max(latest, pc.max(batch.column("epoch")).as_py())
+    return latest
+
+
+def epoch_window(epochs_dir: Path, epoch: int) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    [start, end) of `epoch` from the exported market_epochs: from its reset to
+    the next one (open-ended for epoch 0 and for the current epoch).
+    """
+    started = {}
+    for batch in iter_batches(epochs_dir, ["id", "started_at"]):
+        started.update(zip(batch.column("id").to_pylist(), batch.column("started_at").to_pylist()))
+    later = [epoch_id for epoch_id in started if epoch_id > epoch]
+    return started.get(epoch), started[min(later)] if later else None
+
+
+@dataclass
+class _Moments:
+    """Running count / mean / M2, merged per batch with Chan et al.'s parallel update."""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def merge(self, count: int, mean: float, m2: float) -> None:
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0.0
+
+
+@dataclass
+class LedgerAccumulator:
+    """Per (agent, resource) utility sums, outcome counts and resource switches."""
+    sums: Dict[Tuple[str, str], float] = field(default_factory=lambda: defaultdict(float))
+    counts: Dict[Tuple[str, str], int] = field(default_factory=lambda: defaultdict(int))
+    results: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    spend: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    switches: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    transitions: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    last_resource: Dict[str, str] = field(default_factory=dict)
+    total_reward: float = 0.0
+    total_cost: float = 0.0
+
+    def add(self, batch: pa.RecordBatch) -> None:
+        table = pa.Table.from_batches([batch])
+        table = table.filter(pc.invert(pc.is_in(table.column("task_result"), pa.array(BALANCE_EVENTS))))
+        for row in table.group_by("task_result").aggregate([("task_result", "count")]).to_pylist():
+            self.results[row["task_result"]] += row["task_result_count"]
+        for row in table.group_by("resource_used").aggregate([("cost_paid", "sum")]).to_pylist():
+            self.spend[row["resource_used"]] += row["cost_paid_sum"]
+        self.total_reward += float(np.sum(table.column("reward_earned").to_numpy()))
+        self.total_cost += float(np.sum(table.column("cost_paid").to_numpy()))
+
+        actions = table.filter(pc.is_in(table.column("task_result"), pa.array(ACTION_RESULTS)))
+        grouped = actions.group_by(["agent_id", "resource_used"]).aggregate([("net_profit", "sum"), ("net_profit", "count")])
+        for row in grouped.to_pylist():
+            key = (row["agent_id"], row["resource_used"])
+            self.sums[key] += row["net_profit_sum"]
+            self.counts[key] += row["net_profit_count"]
+        self._add_switches(actions)
+
+    def _add_switches(self, actions: pa.Table) -> None:
+        if actions.num_rows == 0:
+            return
+        agents = actions.column("agent_id").to_numpy(zero_copy_only=False)
+        resources = actions.column("resource_used").to_numpy(zero_copy_only=False)
+        # Stable sort keeps each agent's actions in ledger order
+        order = np.argsort(agents, kind="stable")
+        agents, resources = agents[order], resources[order]
+        same_agent = agents[1:] == agents[:-1]
+        changed = (resources[1:] != resources[:-1]) & same_agent
+        starts = np.flatnonzero(np.concatenate(([True], ~same_agent)))
+        ends = np.append(starts[1:], len(agents))
+        for start, end in zip(starts, ends):
+            agent = agents[start]
+            previous = self.last_resource.get(agent)
+            within = end - start - 1
+            self.transitions[agent] += within + (previous is not None)
+            self.switches[agent] += int(changed[start:end - 1].sum()) + (previous is not None and previous != resources[start])
+            self.last_resource[agent] = resources[end - 1]
+
+
+def price_volatility(directory: Path, batch_rows: int = BATCH_ROWS,
+                     window: Tuple[Optional[datetime], Optional[datetime]] = (None, None)) -> Dict[str, Dict[str, float]]:
+    """
+    Macroeconomic health per resource (section 9.4): H_r = Var(P_r) / E[P_r]
+    over every tick logged in `window` ([start, end), open ends by default),
+    plus the mean demand.
+    """
+    prices: Dict[str, _Moments] = defaultdict(_Moments)
+    demand: Dict[str, _Moments] = defaultdict(_Moments)
+    start, end = window
+    for batch in iter_batches(directory, ["resource_name", "dynamic_price", "market_demand", "timestamp"], batch_rows):
+        table = pa.Table.from_batches([batch])
+        if start is not None:
+            table = table.filter(pc.greater_equal(table.column("timestamp"), pa.scalar(start, table.schema.field("timestamp").type)))
+        if end is not None:
+            table = table.filter(pc.less(table.column("timestamp"), pa.scalar(end, table.schema.field("timestamp").type)))
+        grouped = table.group_by("resource_name").aggregate([
+            ("dynamic_price", "count"), ("dynamic_price", "mean"), ("dynamic_price", "variance", pc.VarianceOptions(ddof=0)),
+            ("market_demand", "mean"), ("market_demand", "variance", pc.VarianceOptions(ddof=0)),
+        ])
+        for row in grouped.to_pylist():
+            n = row["dynamic_price_count"]
+            prices[row["resource_name"]].merge(n, row["dynamic_price_mean"], row["dynamic_price_variance"] * n)
+            demand[row["resource_name"]].merge(n, row["market_demand_mean"], row["market_demand_variance"] * n)
+    return {
+        resource: {
+            "ticks": m.count,
+            "price_mean": m.mean,
+            "price_variance": m.variance,
+            "volatility_h": m.variance / m.mean if m.mean > 0 else 0.0,
+            "demand_mean": demand[resource].mean
+        }
+        for resource, m in sorted(prices.items())
+    }
+
+
+def agent_metrics(acc: LedgerAccumulator) -> pa.Table:
+    """
+    One row per agent, over its task settlements:
+    - regret (section 9.3): actions x best per-action mean utility in hindsight
+      minus realised utility, with `a*` the agent's best resource by its own
+      empirical mean net profit;
+    - agency (section 9.1, undiscounted): realised utility minus the expected
+      utility of a uniform allocator over the resources the agent used;
+    - switching rate: share of consecutive actions that changed resource.
+    """
+    per_agent: Dict[str, List[Tuple[str, float, int]]] = defaultdict(list)
+    for (agent, resource), total in acc.sums.items():
+        per_agent[agent].append((resource, total, acc.counts[(agent, resource)]))
+
+    rows = []
+    for agent, stats in sorted(per_agent.items()):
+        actions = sum(n for _, _, n in stats)
+        utility = sum(total for _, total, _ in stats)
+        means = {resource: total / n for resource, total, n in stats}
+        best = max(means, key=means.get)
+        transitions = acc.transitions.get(agent, 0)
+        rows.append({
+            "agent_id": agent,
+            "actions": actions,
+            "utility": utility,
+            "best_resource": best,
+            "regret": actions * means[best] - utility,
+            "agency_vs_uniform": utility - actions * float(np.mean(list(means.values()))),
+            "switching_rate": acc.switches.get(agent, 0) / transitions if transitions else 0.0
+        })
+    schema = pa.schema([
+        ("agent_id", pa.string()), ("actions", pa.int64()), ("utility", pa.float64()), ("best_resource", pa.string()),
+        ("regret", pa.float64()), ("agency_vs_uniform", pa.float64()), ("switching_rate", pa.float64())
+    ])
+    return pa.Table.from_pylist(rows, schema=schema)
+
+
+def analyze_export(export_dir: Path, batch_rows: int = BATCH_ROWS, epoch: Optional[int] = None) -> Tuple[Dict, pa.Table]:
+    """
+    Section 9 summary of one market epoch of an export directory (the latest
+    by default) and its per-agent metrics table.
+    """
+    export_dir = Path(export_dir)
+    ledger_dir = export_dir / "ledger_transactions"
+    if epoch is None:
+        epoch = latest_epoch(ledger_dir, batch_rows)
+    acc = LedgerAccumulator()
+    ledger_columns = ["agent_id", "resource_used", "cost_paid", "reward_earned", "net_profit", "task_result", "epoch"]
+    for batch in iter_batches(ledger_dir, ledger_columns, batch_rows, LEDGER_DEFAULTS):
+        acc.add(batch.filter(pc.equal(batch.column("epoch"), epoch)))
+    agents = agent_metrics(acc)
+    window = epoch_window(export_dir / "market_epochs", epoch)
+    volatility = price_volatility(export_dir / "market_logs", batch_rows, window)
+
+    total = sum(acc.results.values())
+    actions = sum(acc.results.get(r, 0) for r in ACTION_RESULTS)
+    regret = agents.column("regret").to_numpy() if agents.num_rows else np.zeros(0)
+    switches = sum(acc.switches.values())
+    transitions = sum(acc.transitions.values())
+    summary = {
+        "epoch": epoch,
+        "transactions": total,
+        "results": dict(sorted(acc.results.items())),
+        "success_rate": acc.results.get("SUCCESS", 0) / actions if actions else 0.0,
+        "total_cost": acc.total_cost,
+        "total_reward": acc.total_reward,
+        "net_flow": acc.total_reward - acc.total_cost,
+        "spend_by_resource": dict(sorted(acc.spend.items())),
+        "agents": agents.num_rows,
+        "regret_total": float(regret.sum()),
+        "regret_mean": float(regret.mean()) if regret.size else 0.0,
+        "regret_p90": float(np.percentile(regret, 90)) if regret.size else 0.0,
+        "switching_rate": switches / transitions if transitions else 0.0,
+        "volatility": volatility,
+        "volatility_mean": float(np.mean([v["volatility_h"] for v in volatility.values()])) if volatility else 0.0
+    }
+    return summary, agents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AEM section 9 metrics over a Parquet ledger export")
+    parser.add_argument("export_dir", help="Directory written by `python -m aem_storage.export`")
+    parser.add_argument("--agents-output", help="Write the per-agent metrics table to this Parquet file")
+    parser.add_argument("--epoch", type=int, help="Market epoch to analyze (default: the latest in the export)")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    summary, agents = analyze_export(Path(args.export_dir), args.batch_rows, args.epoch)
+    if args.agents_output:
+        pq.write_table(agents, args.agents_output)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Async engine and sessions over the same ledger database, for `async def`
+handlers. Kept apart from `engine` because it needs the asyncio extras
+(greenlet plus aiosqlite or asyncpg), which the simulation client does not.
+"""
+from typing import Optional
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from .engine import _apply_sqlite_pragmas, _server_pool_defaults, get_database_url
+
+# Async DBAPI driver used for each sync backend (psycopg 3 serves both APIs)
+_ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+def async_database_url(url: Optional[str] = None) -> URL:
+    """The same database as `url` (AEM_DATABASE_URL by default) through an asyncio driver."""
+    url = make_url(url or get_database_url())
+    if url.get_driver_name() in ("aiosqlite", "asyncpg", "psycopg"):
+        return url
+    backend = url.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r} databases")
+    return url.set(drivername=f"{backend}+{_ASYNC_DRIVERS[backend]}")
+
+def create_async_storage_engine(url: Optional[str] = None, **engine_kwargs) -> AsyncEngine:
+    """
+    Async counterpart of `create_storage_engine` for `async def` handlers:
+    same database, pragmas and pool settings, through aiosqlite or asyncpg
+    (see `async_database_url`).
+    """
+    url = async_database_url(url)
+    if url.get_backend_name() == "sqlite":
+        engine = create_async_engine(url, **engine_kwargs)
+        _apply_sqlite_pragmas(engine.sync_engine, url)
+        return engine
+
+    _server_pool_defaults(engine_kwargs)
+    return create_async_engine(url, **engine_kwargs)
+
+def create_async_session_factory(engine: AsyncEngine) -> async_sessionmaker:
+    """
+    Sessions for the async engine. Objects stay loaded after commit (async
+    sessions cannot lazy-load), and the sessions get a sync class of their
+    own, the target for session events (`factory.kw["sync_session_class"]`).
+    """
+    return async_sessionmaker(
+        bind=engine, autoflush=False, expire_on_commit=False,
+        sync_session_class=type("AsyncBackedSession", (Session,), {})
+    )
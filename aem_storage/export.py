@@ -0,0 +1,169 @@
+"""
+Streaming export of the ledger tables to Parquet for offline analytics.
+
+    python -m aem_storage.export --output ledger_export
+    python -m aem_storage.export --tables ledger_transactions --chunk-rows 500000
+
+Each table is exported to `<output>/<table>/part-<first_id>-<last_id>.parquet`.
+Rows are read by primary-key keyset (`WHERE id > :last ORDER BY id LIMIT n`),
+one short query per chunk, so memory stays at one chunk and the export never
+holds a long read transaction on the live database. Re-running the command
+appends only the rows past the last exported id. A market reset keeps ids
+growing but purges the previous epoch's rows in the background, so export
+before resetting to keep them. Ledger rows carry their market epoch and
+`market_epochs` is exported alongside, so the analytics can keep one market
+apart from the next.
+"""
+import argparse
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import DateTime, Float, Integer, String, column, select, table
+from sqlalchemy.engine import Engine
+
+from .engine import create_storage_engine
+
+DEFAULT_CHUNK_ROWS = 100_000
+# Rows per Parquet file before rolling over to the next part
+DEFAULT_ROWS_PER_FILE = 10_000_000
+
+_ARROW_TYPES = {Integer: pa.int64(), Float: pa.float64(), String: pa.string(), DateTime: pa.timestamp("us")}
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    name: str
+    columns: Tuple[Tuple[str, type], ...]
+
+    @property
+    def schema(self) -> pa.Schema:
+        return pa.schema([(name, _ARROW_TYPES[sql_type]) for name, sql_type in self.columns])
+
+    def select_after(self, last_id: int, limit: int):
+        cols = [column(name, sql_type()) for name, sql_type in self.columns]
+        source = table(self.name, *cols)
+        return select(*cols).select_from(source).where(source.c.id > last_id).order_by(source.c.id).limit(limit)
+
+
+EXPORT_TABLES: Dict[str, ExportTable] = {
+    t.name: t for t in (
+        ExportTable("ledger_transactions", (
+            ("id", Integer), ("agent_id", String), ("resource_used", String), ("cost_paid", Float),
+            ("reward_earned", Float), ("net_profit", Float), ("task_result", String), ("timestamp", DateTime),
+            ("epoch", Integer),
+        )),
+        ExportTable("market_logs", (
+            ("id", Integer), ("resource_name", String), ("dynamic_price", Float),
+            ("market_demand", Float), ("timestamp", DateTime),
+        )),
+        ExportTable("market_epochs", (("id", Integer), ("started_at", DateTime))),
+    )
+}
+
+
+def iter_chunks(engine: Engine, spec: ExportTable, after_id: int = 0,
+                chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pa.RecordBatch]:
+    """Record batches of at most `chunk_rows` rows with id > `after_id`, in id order."""
+    schema = spec.schema
+    last_id = after_id
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(spec.select_after(last_id, chunk_rows)).all()
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        )
+        last_id = rows[-1][0]
+        if len(rows) < chunk_rows:
+            return
+
+
+def _parts(directory: Path) -> List[Path]:
+    return sorted(directory.glob("part-*.parquet"))
+
+
+def last_exported_id(directory: Path) -> int:
+    """Highest id already exported to `directory` (encoded in the part file names)."""
+    parts = _parts(directory)
+    return int(parts[-1].stem.split("-")[2]) if parts else 0
+
+
+def export_table(engine: Engine, spec: ExportTable, out_dir: Path, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                 rows_per_file: int = DEFAULT_ROWS_PER_FILE) -> int:
+    """
+    Appends the rows of `spec` not yet in `out_dir` as new Parquet parts (one
+    row group per chunk). Each part is written to a hidden temporary file and
+    renamed once closed, so an interrupted export never leaves a partial part.
+    Returns the number of rows exported.
+    """
+    directory = Path(out_dir) / spec.name
+    directory.mkdir(parents=True, exist_ok=True)
+    exported = 0
+    writer: Optional[pq.ParquetWriter] = None
+    tmp = directory / ".part.parquet.tmp"
+    first_id = last_id = 0
+    file_rows = 0
+
+    def close_part():
+        nonlocal writer
+        writer.close()
+        writer = None
+        os.replace(tmp, directory / f"part-{first_id:012d}-{last_id:012d}.parquet")
+
+    try:
+        for batch in iter_chunks(engine, spec, last_exported_id(directory), chunk_rows):
+            ids = batch.column(0)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, spec.schema)
+                first_id, file_rows = ids[0].as_py(), 0
+            writer.write_batch(batch)
+            last_id = ids[-1].as_py()
+            file_rows += batch.num_rows
+            exported += batch.num_rows
+            if file_rows >= rows_per_file:
+                close_part()
+        if writer is not None:
+            close_part()
+    finally:
+        if writer is not None:
+            # Interrupted mid-part: drop it, the next run resumes from the last complete part
+            writer.close()
+            tmp.unlink(missing_ok=True)
+    return exported
+
+
+def export_database(out_dir: Path, url: Optional[str] = None, tables: Sequence[str] = tuple(EXPORT_TABLES),
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS, rows_per_file: int = DEFAULT_ROWS_PER_FILE) -> Dict[str, int]:
+    engine = create_storage_engine(url)
+    try:
+        return {name: export_table(engine, EXPORT_TABLES[name], out_dir, chunk_rows, rows_per_file) for name in tables}
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the AEM ledger tables to Parquet")
+    parser.add_argument("--output", default="ledger_export", help="Output directory (one subdirectory per table)")
+    parser.add_argument("--url", help="Database URL (default: AEM_DATABASE_URL)")
+    parser.add_argument("--tables", default=",".join(EXPORT_TABLES), help="Comma-separated tables to export")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per query / row group")
+    parser.add_argument("--rows-per-file", type=int, default=DEFAULT_ROWS_PER_FILE)
+    args = parser.parse_args()
+
+    tables = [t for t in args.tables.split(",") if t]
+    unknown = set(tables) - set(EXPORT_TABLES)
+    if unknown:
+        parser.error(f"unknown tables: {sorted(unknown)}")
+    counts = export_database(Path(args.output), args.url, tables, args.chunk_rows, args.rows_per_file)
+    for name, rows in counts.items():
+        print(f"{name}: {rows} new rows -> {Path(args.output) / name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+AEM benchmark suite (runs fully in-process, no server or network needed).
+
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --ledger-sizes 10000 --scale 0.1 --only api
+
+Covers the API write paths through the ASGI app, the AMM price update, the
+reward equation, the agents' Softmax policy, one full LangGraph cycle and the dashboard queries at several
+ledger sizes. Results are emitted as JSON (ops/s, p50/p99 latency, peak RSS) so
+runs can be diffed release over release.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import warnings
+from datetime import datetime, timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(REPO_ROOT), str(REPO_ROOT / "aem_api"), str(REPO_ROOT / "aem_project")]
+
+from harness import measure, environment
+
+SETTLE_PAYLOAD = {"resource_used": "GPT-3.5", "c_real": 2.0, "l_real": 1.0, "task_quality_q": 0.8, "is_failure": False}
+RESOURCES = ["GPT-3.5", "GPT-4o", "Refactor_DevOps_Resource"]
+
+
+def populate_ledger(db_path: Path, rows: int, n_agents: int = 1000, chunk: int = 100_000) -> None:
+    """Bulk loads a synthetic ledger of `rows` transactions into a fresh SQLite file."""
+    from sqlalchemy import create_engine
+    from app.db import models
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    models.Base.metadata.create_all(bind=engine)
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("PRAGMA journal_mode=OFF")
+        cur.execute("PRAGMA synchronous=OFF")
+        cur.executemany(
+            "INSERT INTO agent_records (id, wallet_balance, skill_level, complexity) VALUES (?, ?, ?, ?)",
+            [(f"Agent_{i:05d}", 35.0, 3.0, 5.0) for i in range(n_agents)]
+        )
+        start = datetime(2025, 1, 1)
+        for offset in range(0, rows, chunk):
+            batch = []
+            for i in range(offset, min(offset + chunk, rows)):
+                failure = i % 7 == 0
+                batch.append((
+                    f"Agent_{i % n_agents:05d}",
+                    RESOURCES[i % 3],
+                    0.0 if failure else 1.0,
+                    -15.0 if failure else 20.0,
+                    -15.0 if failure else 19.0,
+                    "FAILURE" if failure else "SUCCESS",
+                    (start + timedelta(milliseconds=i)).isoformat(sep=" ")
+                ))
+            cur.executemany(
+                "INSERT INTO ledger_transactions (agent_id, resource_used, cost_paid, reward_earned, net_profit, task_result, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                batch
+            )
+            raw.commit()
+    finally:
+        raw.close()
+        engine.dispose()
+
+
+def bench_api_writes(client, scale: float):
+    results = []
+    agent_ids = itertools.count()
+
+    def settle():
+        client.post(f"/api/v1/agents/Bench_{next(agent_ids) % 100}/settle", json=SETTLE_PAYLOAD)
+    results.append(measure("api.settle_transaction", settle, iterations=int(2000 * scale) or 1, warmup=20))
+
+    client.post("/api/v1/agents/Bench_Refactor/settle", json=SETTLE_PAYLOAD)
+    client.post("/api/v1/agents/Bench_Refactor/topup", params={"amount": 1e12})
+
+    def refactor():
+        client.post("/api/v1/devops/refactor", json={"agent_id": "Bench_Refactor"})
+    results.append(measure("api.refactor_agent", refactor, iterations=int(1000 * scale) or 1, warmup=10))
+    return results
+
+
+def bench_amm(scale: float):
+    from app.core.market_logic import AutomatedMarketMaker
+
+    results = []
+    for n_resources in (3, 1000, 10_000):
+        base = {f"res_{i}": 1.0 + i % 10 for i in range(n_resources)}
+        caps = {r: 100.0 for r in base}
+        usage = {r: float(i % 50) for i, r in enumerate(base)}
+        amm = AutomatedMarketMaker(base_prices=base, capacities=caps)
+        iterations = max(int(20_000 * scale / max(n_resources / 100, 1)), 10)
+        results.append(measure(
+            "amm.update_prices", lambda: amm.update_prices(usage),
+            iterations=iterations, warmup=5, params={"resources": n_resources}
+        ))
+        usage_vector = amm.usage_vector(usage)
+        results.append(measure(
+            "amm.update_prices_vector", lambda: amm.update_prices(usage_vector),
+            iterations=iterations, warmup=5, params={"resources": n_resources}
+        ))
+        results.append(measure(
+            "amm.publish_ticker_json", lambda: amm.publish(demand=usage_vector).ticker_json,
+            iterations=max(iterations // 10, 10), warmup=2, params={"resources": n_resources}
+        ))
+    return results
+
+
+def bench_reward(scale: float):
+    from app.core.market_logic import calculate_reward
+
+    def reward():
+        calculate_reward(
+            t_base=25.0, alpha=0.5, beta=0.3, gamma=0.2, q=0.8, c_real=2.0, c_max=20.0,
+            l_real=1.0, l_max=6.0, p_fail=15.0, is_failure=False
+        )
+    return [measure("core.calculate_reward", reward, iterations=int(200_000 * scale) or 1, warmup=1000)]
+
+
+def bench_policy(scale: float):
+    import random
+    import numpy as np
+    from core.bandits import make_policy
+    from core.policy import SoftmaxPolicy
+
+    policy = SoftmaxPolicy()
+    ticker = {"GPT-3.5": 0.5, "GPT-4o": 5.0, "Refactor_DevOps_Resource": 15.0}
+    rng, np_rng = random.Random(0), np.random.default_rng(0)
+    fleet = 100_000
+    return [
+        measure("policy.choose_cached", lambda: policy.choose(ticker, rng), iterations=int(200_000 * scale) or 1, warmup=1000),
+        measure("policy.choose_new_ticker", lambda: policy.choose(dict(ticker), rng), iterations=int(50_000 * scale) or 1, warmup=100),
+        measure("policy.choose_n", lambda: policy.choose_n(ticker, fleet, np_rng), iterations=max(int(200 * scale), 5),
+                warmup=2, params={"agents": fleet}),
+    ] + [
+        result
+        for name in ("ucb", "thompson", "exp3")
+        for result in bench_bandit(make_policy(name), name, ticker, rng, np_rng, fleet, scale)
+    ]
+
+
+def bench_bandit(policy, name: str, ticker, rng, np_rng, fleet: int, scale: float):
+    import numpy as np
+    from core.policy import price_vector
+
+    policy.stats.reserve(fleet)
+    rows = np.arange(fleet)
+    prices = price_vector(policy.resources, ticker)
+    rewards = np_rng.uniform(-15.0, 25.0, fleet)
+    agent_ids = itertools.cycle(range(1000))
+
+    def choose_observe():
+        agent_id = next(agent_ids)
+        resource = policy.choose(ticker, rng, agent_id)
+        policy.observe(agent_id, resource, 10.0, 10.0 - ticker[resource])
+
+    def batch_tick():
+        arms = policy.choose_indices(rows, prices, np_rng)
+        policy.observe_many(rows, arms, rewards, rewards - prices[arms])
+
+    return [
+        measure(f"policy.{name}.choose_observe", choose_observe, iterations=int(20_000 * scale) or 1, warmup=100),
+        measure(f"policy.{name}.batch_tick", batch_tick, iterations=max(int(100 * scale), 5),
+                warmup=2, params={"agents": fleet}),
+    ]
+
+
+def bench_graph(client, scale: float):
+    from core.market import AutomatedMarketMaker
+    from core.state import AgenticState, AgentEvent
+    from graph.builder import build_aem_graph
+
+    amm = AutomatedMarketMaker(
+        base_prices={"GPT-3.5": 0.5, "GPT-4o": 5.0, "Refactor_DevOps_Resource": 15.0},
+        capacities={"GPT-3.5": 100.0, "GPT-4o": 10.0, "Refactor_DevOps_Resource": 2.0}
+    )
+    graph = build_aem_graph(amm, session=client)
+    agent_ids = itertools.count()
+
+    def cycle():
+        graph.invoke(AgenticState(
+            agent_id=f"Bench_Graph_{next(agent_ids)}",
+            agent_wallet=35.0,
+            skill_level=3.0,
+            complexity=5.0,
+            current_task={"type": "benchmark"},
+            metrics={},
+            market_ticker=amm.base_prices.copy(),
+            task_count=0,
+            history=(AgentEvent("Inicio", "Agente de benchmark."),)
+        ))
+    return [measure("graph.invoke", cycle, iterations=int(200 * scale) or 1, warmup=3)]
+
+
+def bench_dashboard(client, app, workdir: Path, ledger_sizes, scale: float):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import NullPool
+    from aem_storage.async_engine import create_async_session_factory, create_async_storage_engine
+    from app.api.dependencies import get_async_db, get_db
+    from app.core import kpis
+
+    results = []
+    for rows in ledger_sizes:
+        db_path = workdir / f"ledger_{rows}.db"
+        populate_ledger(db_path, rows)
+        engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        # No pooling: without a `with` block TestClient runs each request on a new event loop
+        async_engine = create_async_storage_engine(f"sqlite:///{db_path}", poolclass=NullPool)
+        AsyncSession = create_async_session_factory(async_engine)
+
+        def override_db():
+            db = Session()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        async def override_async_db():
+            async with AsyncSession() as db:
+                yield db
+        app.dependency_overrides[get_db] = override_db
+        app.dependency_overrides[get_async_db] = override_async_db
+
+        def kpi_load():
+            with Session() as db:
+                kpis.recount(db)
+
+        params = {"ledger_rows": rows}
+        iterations = max(int(200 * scale), 5)
+        results.append(measure("dashboard.kpi_seed_scan", kpi_load, iterations=3, warmup=1, params=params))
+        results.append(measure("dashboard.macro", lambda: client.get("/api/v1/dashboard/macro"), iterations=iterations, warmup=2, params=params))
+        results.append(measure("dashboard.ledger", lambda: client.get("/api/v1/dashboard/ledger"), iterations=iterations, warmup=2, params=params))
+
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_async_db, None)
+        engine.dispose()
+        db_path.unlink()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AEM benchmark suite")
+    parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--ledger-sizes", default="10000,1000000,10000000", help="Comma separated ledger row counts for dashboard benchmarks")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for iteration counts")
+    parser.add_argument("--only", help="Run only benchmark groups whose name contains this string (api, amm, reward, policy, graph, dashboard)")
+    args = parser.parse_args()
+
+    ledger_sizes = [int(s) for s in args.ledger_sizes.split(",") if s]
+    output = Path(args.output).resolve() if args.output else None
+
+    with tempfile.TemporaryDirectory(prefix="aem_bench_") as tmp:
+        workdir = Path(tmp)
+        # The API creates its SQLite file relative to the working directory on import
+        os.chdir(workdir)
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        # The graph nodes pass `timeout=` like they do to requests; TestClient ignores it
+        warnings.filterwarnings("ignore", message="You should not use the 'timeout' argument")
+        client = TestClient(app)
+        groups = [
+            ("api", lambda: bench_api_writes(client, args.scale)),
+            ("amm", lambda: bench_amm(args.scale)),
+            ("reward", lambda: bench_reward(args.scale)),
+            ("policy", lambda: bench_policy(args.scale)),
+            ("graph", lambda: bench_graph(client, args.scale)),
+            ("dashboard", lambda: bench_dashboard(client, app, workdir, ledger_sizes, args.scale)),
+        ]
+
+        results = []
+        for name, run in groups:
+            if args.only and args.only not in name:
+                continue
+            results.extend(run())
+        client.close()
+
+    report = json.dumps({"environment": environment(), "results": results}, indent=2)
+    if output:
+        output.write_text(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
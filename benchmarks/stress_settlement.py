@@ -0,0 +1,194 @@
+"""
+Concurrency stress test for wallet settlement and refactor.
+
+    python benchmarks/stress_settlement.py --workers 4 --requests 2000
+
+Starts the API with several uvicorn worker processes on a fresh SQLite ledger,
+fires concurrent settle and refactor requests at a few agents and then checks
+the invariants that lost updates or overdrafts would break:
+
+- every wallet equals the sum of its ledger rows (opening balance and top-ups included);
+- the refactor agent never goes below zero and exactly floor(wallet / price)
+  refactors succeed;
+- concurrent request threads spread their usage over several lock shards;
+- every worker serves the same dashboard macro KPIs, and their burn rate is the
+  total of the wallets;
+- the Parquet export and its section 9 analytics run on the resulting ledger
+  (opening balances and top-ups included) and count every market transaction.
+
+Prices are frozen (the tick interval is set to an hour) so every worker charges
+the same cost. Exits with status 1 if any invariant fails.
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(REPO_ROOT), str(REPO_ROOT / "aem_api")]
+
+SETTLE_PAYLOAD = {"resource_used": "GPT-3.5", "c_real": 2.0, "l_real": 1.0, "task_quality_q": 0.8, "is_failure": False}
+REFACTOR_PRICE = 10.0
+
+
+def start_server(workdir: Path, port: int, workers: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        AEM_DATABASE_URL=f"sqlite:///{workdir / 'stress.db'}",
+        AEM_TICK_INTERVAL_SECONDS="3600",
+        AEM_WALLET_CACHE="0",
+        # The workers import aem_storage from the repository root
+        PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.getenv("PYTHONPATH")])),
+        # SQLite serialises writers and its busy handler is not fair: with dozens of
+        # in-flight requests a writer can wait longer than the 5 s default
+        AEM_SQLITE_BUSY_TIMEOUT_MS=os.getenv("AEM_SQLITE_BUSY_TIMEOUT_MS", "30000"),
+    )
+    # Create the schema up front so the workers don't race on create_all
+    os.environ["AEM_DATABASE_URL"] = env["AEM_DATABASE_URL"]
+    from app.db import models
+    from app.db.database import engine
+    models.Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--app-dir", str(REPO_ROOT / "aem_api"),
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env=env
+    )
+
+
+def wait_ready(client: httpx.Client, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if client.get("/").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("API did not start in time")
+
+
+def ledger_totals(workdir: Path):
+    from sqlalchemy import create_engine, func, select
+    from app.db import models
+
+    engine = create_engine(f"sqlite:///{workdir / 'stress.db'}")
+    tx = models.LedgerTransaction
+    with engine.connect() as conn:
+        wallets = dict(conn.execute(select(models.AgentRecord.id, models.AgentRecord.wallet_balance)).all())
+        profits = dict(conn.execute(select(tx.agent_id, func.sum(tx.net_profit)).group_by(tx.agent_id)).all())
+        refactors = conn.execute(select(func.count()).where(tx.task_result == "REFACTOR_SUCCESS")).scalar()
+    engine.dispose()
+    return wallets, profits, refactors
+
+
+def usage_shards_used(threads: int, records: int = 400) -> int:
+    """Records usage from a thread pool in-process and counts the shards it landed on."""
+    from app.core.market_logic import UsageAccumulator
+
+    usage = UsageAccumulator(["GPT-3.5"])
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda _: (usage.record("GPT-3.5"), time.sleep(0.001)), range(records)))
+    return usage.shards_in_use()
+
+
+def export_analytics(workdir: Path) -> dict:
+    """Exports the stress ledger to Parquet and runs the section 9 analytics over it."""
+    from aem_storage.analytics import analyze_export
+    from aem_storage.export import export_database
+
+    export_dir = workdir / "export"
+    export_database(export_dir, f"sqlite:///{workdir / 'stress.db'}")
+    summary, _ = analyze_export(export_dir)
+    return summary
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="aem_stress_") as tmp:
+        workdir = Path(tmp)
+        agents = [f"Stress_{i}" for i in range(args.agents)]
+        server = start_server(workdir, args.port, args.workers)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=30.0) as client:
+                wait_ready(client)
+
+                # Concurrent settlements spread over a few hot agents
+                started = time.perf_counter()
+                with ThreadPoolExecutor(args.concurrency) as pool:
+                    statuses = list(pool.map(
+                        lambda i: client.post(f"/api/v1/agents/{agents[i % len(agents)]}/settle", json=SETTLE_PAYLOAD).status_code,
+                        range(args.requests)
+                    ))
+                settle_seconds = time.perf_counter() - started
+
+                # Concurrent refactors against one wallet that can afford only some of them
+                client.post("/api/v1/agents/Stress_Refactor/settle", json=SETTLE_PAYLOAD)
+                client.post("/api/v1/agents/Stress_Refactor/topup", params={"amount": REFACTOR_PRICE * args.refactors / 2})
+                wallet = client.get("/api/v1/agents/Stress_Refactor/wallet").json()["wallet_balance"]
+                with ThreadPoolExecutor(args.concurrency) as pool:
+                    refactor_statuses = list(pool.map(
+                        lambda _: client.post("/api/v1/devops/refactor", json={"agent_id": "Stress_Refactor"}).status_code,
+                        range(args.refactors)
+                    ))
+
+                # Requests land on different workers; all of them must read the shared counters
+                macros = [client.get("/api/v1/dashboard/macro").json() for _ in range(4 * args.workers)]
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+        wallets, profits, refactors = ledger_totals(workdir)
+        analytics = export_analytics(workdir)
+
+    drift = {a: wallets[a] - profits.get(a, 0.0) for a in agents + ["Stress_Refactor"]}
+    expected_refactors = min(math.floor(wallet / REFACTOR_PRICE + 1e-9), args.refactors)
+    checks = {
+        "all_settles_ok": statuses.count(200) == args.requests,
+        "no_lost_updates": all(abs(d) < 1e-6 for d in drift.values()),
+        "refactors_match_funds": refactor_statuses.count(200) == expected_refactors == refactors,
+        "no_overdraft": wallets["Stress_Refactor"] >= 0,
+        "macro_kpis_shared": all(m == macros[0] for m in macros)
+            and abs(macros[0]["daily_usd_burn_rate"] - round(sum(wallets.values()), 2)) < 0.011,
+        "usage_sharded": usage_shards_used(args.concurrency) > 1,
+        # Every settle (plus the refactor agent's opening one) and every refactor; no balance events
+        "analytics_count_transactions": analytics["transactions"] == statuses.count(200) + 1 + refactors,
+    }
+    return {
+        "workers": args.workers,
+        "requests": args.requests,
+        "settle_ops_per_sec": args.requests / settle_seconds if settle_seconds > 0 else 0.0,
+        "refactors_succeeded": refactor_statuses.count(200),
+        "refactors_expected": expected_refactors,
+        "max_wallet_drift": max((abs(d) for d in drift.values()), default=0.0),
+        "checks": checks,
+        "passed": all(checks.values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AEM settlement concurrency stress test")
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn worker processes")
+    parser.add_argument("--agents", type=int, default=4, help="Agents receiving the concurrent settlements")
+    parser.add_argument("--requests", type=int, default=2000, help="Total settle requests")
+    parser.add_argument("--refactors", type=int, default=200, help="Concurrent refactor requests on one wallet")
+    parser.add_argument("--concurrency", type=int, default=64, help="Client threads")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()